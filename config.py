@@ -28,6 +28,9 @@ CHANNEL_ID = os.getenv("CHANNEL_ID", "")
 # URL базы данных
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///data/database.db")
 
+# URL Redis для общих лимитов запросов нескольких процессов (необязательно)
+REDIS_URL = os.getenv("REDIS_URL", "")
+
 # ====================
 # ИГРОВЫЕ КОНСТАНТЫ
 # ====================
@@ -47,6 +50,68 @@ MAX_BUSINESSES_PER_USER = 10
 # Интервал обновления цен акций (в минутах)
 STOCK_UPDATE_INTERVAL_MINUTES = 15
 
+# Глубина пула ликвидности акции (в акциях) - чем больше, тем меньше
+# крупные сделки сдвигают цену. Можно переопределить полем "liquidity"
+# в configs/stocks.json
+STOCK_POOL_DEPTH = 10000
+
+# Срок жизни открытого предложения работы и ожидания в очереди соискателей (в часах)
+JOB_OFFER_TTL_HOURS = 24
+
+# Длительности контрактов на рынке труда (в часах)
+JOB_DURATIONS = (8, 24, 72)
+
+# Максимум открытых предложений работы у одного работодателя
+MAX_OPEN_JOB_OFFERS = 5
+
+# Интервал, за который мелкие события канала собираются в один пост (в секундах)
+CHANNEL_BATCH_INTERVAL_SECONDS = 60
+
+# Режим дайджеста: события канала (сделки, уровни, достижения, движение
+# рынка) публикуются одним сводным постом за окно
+CHANNEL_DIGEST = os.getenv("CHANNEL_DIGEST", "1") == "1"
+
+# Окно дайджеста канала (в минутах)
+CHANNEL_DIGEST_INTERVAL_MINUTES = int(os.getenv("CHANNEL_DIGEST_INTERVAL_MINUTES", "60"))
+
+# Максимальная длина сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+# ====================
+# ДИАГНОСТИКА
+# ====================
+
+# Блокировка цикла событий дольше этого времени (в секундах) считается
+# зависанием: в лог пишется стек и источник
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.25"))
+
+# Порог медленного колбэка asyncio в секундах (0 - отладочный режим выключен)
+SLOW_CALLBACK_DURATION = float(os.getenv("SLOW_CALLBACK_DURATION", "0"))
+
+# Файл с гистограммой задержки цикла событий
+LOOP_STATS_FILE = "logs/loop_lag.json"
+
+# Бюджет времени холодного запуска в секундах: при превышении отчет
+# о фазах запуска пишется предупреждением
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "5"))
+
+# ====================
+# ЛОГИРОВАНИЕ
+# ====================
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Файл лога в формате JSON, ротируется в полночь и при превышении размера
+LOG_FILE = "logs/bot.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 7
+
+# Доля сохраняемых записей ниже WARNING для шумных логгеров
+LOG_SAMPLING = {
+    "aiogram.event": 0.1,                 # строка на каждый апдейт
+    "apscheduler.executors.default": 0.05,  # запуск задачи расчета сделок каждые 5 секунд
+}
+
 # ====================
 # ПУТИ К КОНФИГУРАЦИОННЫМ ФАЙЛАМ
 # ====================
@@ -68,11 +133,29 @@ class ConfigClass:
         self.ADMIN_IDS = ADMIN_IDS
         self.CHANNEL_ID = CHANNEL_ID
         self.DATABASE_URL = DATABASE_URL
+        self.REDIS_URL = REDIS_URL
         self.STARTING_BALANCE = STARTING_BALANCE
         self.TAX_RATE = TAX_RATE
         self.DAILY_BONUS_BASE = DAILY_BONUS_BASE
         self.MAX_BUSINESSES_PER_USER = MAX_BUSINESSES_PER_USER
         self.STOCK_UPDATE_INTERVAL_MINUTES = STOCK_UPDATE_INTERVAL_MINUTES
+        self.STOCK_POOL_DEPTH = STOCK_POOL_DEPTH
+        self.JOB_OFFER_TTL_HOURS = JOB_OFFER_TTL_HOURS
+        self.JOB_DURATIONS = JOB_DURATIONS
+        self.MAX_OPEN_JOB_OFFERS = MAX_OPEN_JOB_OFFERS
+        self.CHANNEL_BATCH_INTERVAL_SECONDS = CHANNEL_BATCH_INTERVAL_SECONDS
+        self.CHANNEL_DIGEST = CHANNEL_DIGEST
+        self.CHANNEL_DIGEST_INTERVAL_MINUTES = CHANNEL_DIGEST_INTERVAL_MINUTES
+        self.MESSAGE_LIMIT = MESSAGE_LIMIT
+        self.LOOP_STALL_THRESHOLD = LOOP_STALL_THRESHOLD
+        self.SLOW_CALLBACK_DURATION = SLOW_CALLBACK_DURATION
+        self.LOOP_STATS_FILE = LOOP_STATS_FILE
+        self.STARTUP_BUDGET = STARTUP_BUDGET
+        self.LOG_LEVEL = LOG_LEVEL
+        self.LOG_FILE = LOG_FILE
+        self.LOG_MAX_BYTES = LOG_MAX_BYTES
+        self.LOG_BACKUP_COUNT = LOG_BACKUP_COUNT
+        self.LOG_SAMPLING = LOG_SAMPLING
         self.BUSINESSES_CONFIG = BUSINESSES_CONFIG
         self.STOCKS_CONFIG = STOCKS_CONFIG
         self.LEVELS_CONFIG = LEVELS_CONFIG
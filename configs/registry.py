@@ -0,0 +1,471 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import typing
+from dataclasses import MISSING, dataclass, fields
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from utils.templates import Template
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigError(Exception):
+    """Ошибки проверки конфигов (все найденные сразу)"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("Ошибки в конфигах:\n" + "\n".join(f"- {e}" for e in errors))
+
+
+# ====================
+# ТИПИЗИРОВАННЫЕ КОНФИГИ
+# ====================
+
+@dataclass(frozen=True)
+class BusinessConfig:
+    id: str
+    name: str
+    description: str
+    base_price: float
+    base_profit_per_hour: float
+    upgrade_multiplier: float
+    max_level: int
+    category: str
+    icon: str
+
+
+@dataclass(frozen=True)
+class StockConfig:
+    symbol: str
+    name: str
+    base_price: float
+    volatility: float
+    description: str
+    liquidity: Optional[float] = None  # Глубина пула ликвидности, по умолчанию STOCK_POOL_DEPTH
+
+
+@dataclass(frozen=True)
+class LevelRequirement:
+    level: int
+    exp_required: float
+    business_limit: int
+
+
+@dataclass(frozen=True)
+class LevelsConfig:
+    requirements: Tuple[LevelRequirement, ...]
+    exp_for_business_purchase: float
+    exp_for_upgrade: float
+    exp_for_stock_trade: float
+
+
+@dataclass(frozen=True)
+class EventConfig:
+    min_amount: Optional[float] = None
+    min_level: Optional[int] = None
+    message_template: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class DailyBonusConfig:
+    base_amount: float
+    streak_multiplier: float
+    level_multiplier: float
+    max_streak: int
+
+
+@dataclass(frozen=True)
+class AchievementConfig:
+    id: str
+    name: str
+    description: str
+    reward: float
+    icon: str
+
+
+@dataclass(frozen=True)
+class BonusesConfig:
+    daily_bonus: DailyBonusConfig
+    achievements: Tuple[AchievementConfig, ...]
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Согласованный набор всех конфигов одной версии"""
+    version: int
+    businesses: Tuple[BusinessConfig, ...]
+    stocks: Tuple[StockConfig, ...]
+    levels: LevelsConfig
+    events: Mapping[str, EventConfig]
+    event_templates: Mapping[str, Template]
+    bonuses: BonusesConfig
+    businesses_by_id: Mapping[str, BusinessConfig]
+    stocks_by_symbol: Mapping[str, StockConfig]
+
+
+# Поля, доступные в шаблонах сообщений событий
+EVENT_TEMPLATE_FIELDS = {
+    "business_purchase": {"username", "type", "business_name", "amount"},
+    "stock_purchase": {"username", "type", "stock_name", "amount"},
+    "level_up": {"username", "level"},
+}
+
+# Значения полей для пробного форматирования шаблонов при загрузке
+# (те же типы, что передает EventService)
+EVENT_TEMPLATE_SAMPLE = {
+    "username": "Игрок",
+    "type": "Покупка",
+    "business_name": "Бизнес",
+    "stock_name": "Акция",
+    "amount": 12345.67,
+    "level": 10,
+}
+
+# Поля, без которых сообщение события теряет смысл
+EVENT_TEMPLATE_REQUIRED = {
+    "business_purchase": {"username", "amount"},
+    "stock_purchase": {"username", "amount"},
+    "level_up": {"username", "level"},
+}
+
+# Шаблоны событий, для которых в events.json нет message_template
+DEFAULT_EVENT_TEMPLATES = {
+    "business_purchase": "🎉 КРУПНАЯ СДЕЛКА!\n\n👤 Игрок: {username}\n💼 Тип: {type}\n💰 Сумма: ${amount:,.2f}",
+    "stock_purchase": (
+        "📈 КРУПНАЯ СДЕЛКА С АКЦИЯМИ!\n\n👤 Игрок: {username}\n🏦 Акция: {stock_name}\n"
+        "💼 Тип: {type}\n💰 Сумма: ${amount:,.2f}"
+    ),
+    "level_up": "🚀 НОВЫЙ УРОВЕНЬ!\n\n👤 Игрок: {username}\n🎯 Достиг уровня: {level}",
+}
+
+
+# ====================
+# ПРОВЕРКА ПО СХЕМЕ
+# ====================
+
+def _matches(value: Any, expected: Any) -> bool:
+    if typing.get_origin(expected) is typing.Union:
+        return any(_matches(value, arg) for arg in typing.get_args(expected))
+    if expected is type(None):
+        return value is None
+    if isinstance(value, bool):
+        return expected is bool
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def _build(cls, data: Any, path: str, errors: List[str], **nested):
+    """Создание объекта конфига из словаря с проверкой полей
+
+    Схемой служит сам dataclass: проверяются обязательные поля, типы
+    скалярных значений и лишние ключи (частая причина - опечатка).
+    Вложенные значения передаются уже собранными через nested.
+    """
+    if not isinstance(data, dict):
+        errors.append(f"{path}: ожидается объект")
+        return None
+
+    hints = typing.get_type_hints(cls)
+    known = {f.name for f in fields(cls)}
+    kwargs = {}
+    ok = True
+
+    for key in data:
+        if key not in known:
+            errors.append(f"{path}.{key}: неизвестное поле")
+            ok = False
+
+    for f in fields(cls):
+        if f.name in nested:
+            kwargs[f.name] = nested[f.name]
+            continue
+
+        if f.name not in data:
+            if f.default is MISSING:
+                errors.append(f"{path}.{f.name}: обязательное поле")
+                ok = False
+            continue
+
+        value = data[f.name]
+        if not _matches(value, hints[f.name]):
+            errors.append(f"{path}.{f.name}: неверный тип {type(value).__name__}")
+            ok = False
+            continue
+
+        kwargs[f.name] = float(value) if hints[f.name] is float else value
+
+    return cls(**kwargs) if ok else None
+
+
+def _build_list(cls, data: Any, path: str, errors: List[str], key: str) -> Tuple:
+    """Список объектов с проверкой уникальности ключа"""
+    if not isinstance(data, list):
+        errors.append(f"{path}: ожидается список")
+        return ()
+
+    items = []
+    seen = set()
+    for i, raw in enumerate(data):
+        item = _build(cls, raw, f"{path}[{i}]", errors)
+        if item is None:
+            continue
+        value = getattr(item, key)
+        if value in seen:
+            errors.append(f"{path}[{i}].{key}: повтор значения {value!r}")
+        seen.add(value)
+        items.append(item)
+
+    return tuple(items)
+
+
+def _check(condition: bool, message: str, errors: List[str]):
+    if not condition:
+        errors.append(message)
+
+
+def _parse_businesses(data: Dict, errors: List[str]) -> Tuple[BusinessConfig, ...]:
+    businesses = _build_list(BusinessConfig, data.get("businesses"), "businesses.json:businesses", errors, "id")
+    for b in businesses:
+        path = f"businesses.json:{b.id}"
+        _check(b.base_price > 0, f"{path}: base_price должна быть больше 0", errors)
+        _check(b.base_profit_per_hour >= 0, f"{path}: base_profit_per_hour не может быть отрицательной", errors)
+        _check(b.upgrade_multiplier >= 1, f"{path}: upgrade_multiplier должен быть не меньше 1", errors)
+        _check(b.max_level >= 1, f"{path}: max_level должен быть не меньше 1", errors)
+    return businesses
+
+
+def _parse_stocks(data: Dict, errors: List[str]) -> Tuple[StockConfig, ...]:
+    stocks = _build_list(StockConfig, data.get("stocks"), "stocks.json:stocks", errors, "symbol")
+    for s in stocks:
+        path = f"stocks.json:{s.symbol}"
+        _check(s.base_price > 0, f"{path}: base_price должна быть больше 0", errors)
+        _check(0 < s.volatility <= 1, f"{path}: volatility должна быть в диапазоне (0, 1]", errors)
+        _check(s.liquidity is None or s.liquidity > 0, f"{path}: liquidity должна быть больше 0", errors)
+    return stocks
+
+
+def _parse_levels(data: Dict, errors: List[str]) -> Optional[LevelsConfig]:
+    requirements = _build_list(
+        LevelRequirement, data.get("level_up_requirements"), "levels.json:level_up_requirements", errors, "level"
+    )
+    for i, req in enumerate(requirements):
+        path = f"levels.json:level {req.level}"
+        _check(req.level == i + 1, f"{path}: уровни должны идти подряд с 1", errors)
+        _check(req.business_limit >= 1, f"{path}: business_limit должен быть не меньше 1", errors)
+        if i:
+            _check(
+                req.exp_required >= requirements[i - 1].exp_required,
+                f"{path}: exp_required не может убывать", errors
+            )
+    _check(bool(requirements), "levels.json: нужен хотя бы один уровень", errors)
+
+    rest = {k: v for k, v in data.items() if k != "level_up_requirements"}
+    return _build(LevelsConfig, rest, "levels.json", errors, requirements=requirements)
+
+
+def _parse_events(data: Dict, errors: List[str]) -> Tuple[Mapping[str, EventConfig], Mapping[str, Template]]:
+    """События и их шаблоны, скомпилированные один раз на версию конфигов"""
+    templates = {name: Template(text) for name, text in DEFAULT_EVENT_TEMPLATES.items()}
+
+    raw_events = data.get("events", {})
+    if not isinstance(raw_events, dict):
+        errors.append("events.json:events: ожидается объект")
+        return MappingProxyType({}), MappingProxyType(templates)
+
+    events = {}
+    for name, raw in raw_events.items():
+        event = _build(EventConfig, raw, f"events.json:{name}", errors)
+        if event is None:
+            continue
+        events[name] = event
+
+        # Шаблон должен использовать только поля, которые передает EventService,
+        # и содержать обязательные
+        if event.message_template:
+            try:
+                templates[name] = Template(
+                    event.message_template,
+                    allowed=EVENT_TEMPLATE_FIELDS.get(name),
+                    required=EVENT_TEMPLATE_REQUIRED.get(name, ()),
+                    sample=EVENT_TEMPLATE_SAMPLE
+                )
+            except ValueError as e:
+                errors.append(f"events.json:{name}.message_template: {e}")
+
+    return MappingProxyType(events), MappingProxyType(templates)
+
+
+def _parse_bonuses(data: Dict, errors: List[str]) -> Optional[BonusesConfig]:
+    daily = _build(DailyBonusConfig, data.get("daily_bonus"), "bonuses.json:daily_bonus", errors)
+    if daily is not None:
+        _check(daily.base_amount >= 0, "bonuses.json:daily_bonus.base_amount не может быть отрицательной", errors)
+        _check(daily.max_streak >= 1, "bonuses.json:daily_bonus.max_streak должен быть не меньше 1", errors)
+
+    achievements = _build_list(
+        AchievementConfig, data.get("achievements", []), "bonuses.json:achievements", errors, "id"
+    )
+    if daily is None:
+        return None
+    return BonusesConfig(daily_bonus=daily, achievements=achievements)
+
+
+# ====================
+# РЕЕСТР
+# ====================
+
+class ConfigRegistry:
+    """Реестр игровых конфигов с горячей перезагрузкой
+
+    Все пять файлов читаются и проверяются вместе и собираются в один
+    неизменяемый ConfigSnapshot. Текущий снимок заменяется одним
+    присваиванием, поэтому читатель всегда видит согласованный набор
+    конфигов одной версии. Если новая версия файлов не прошла проверку,
+    остается прежний снимок, а ошибки пишутся в лог.
+    """
+
+    def __init__(self, businesses: str, stocks: str, levels: str, events: str, bonuses: str):
+        self.paths = {
+            "businesses": businesses,
+            "stocks": stocks,
+            "levels": levels,
+            "events": events,
+            "bonuses": bonuses,
+        }
+        # Файлы, без которых бот работает со значениями по умолчанию
+        self.optional = {"events"}
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._mtimes: Dict[str, Optional[float]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[ConfigSnapshot], None]] = []
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def current(self) -> ConfigSnapshot:
+        """Текущий снимок конфигов (загружается при первом обращении)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.load()
+        return snapshot
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot], None]):
+        """Подписка на успешную перезагрузку конфигов"""
+        self._listeners.append(callback)
+
+    def load(self) -> ConfigSnapshot:
+        """Чтение и проверка всех конфигов, при ошибке - ConfigError"""
+        with self._lock:
+            mtimes = self._read_mtimes()
+            snapshot = self._parse(self._version + 1)
+            self._version = snapshot.version
+            self._mtimes = mtimes
+            self._snapshot = snapshot
+            return snapshot
+
+    def reload(self) -> bool:
+        """Перезагрузка конфигов, если файлы изменились
+
+        Возвращает True, если новая версия применена.
+        """
+        if self._read_mtimes() == self._mtimes:
+            return False
+
+        try:
+            snapshot = self.load()
+        except ConfigError as e:
+            # Запоминаем время изменения, чтобы не повторять ошибку каждый опрос
+            self._mtimes = self._read_mtimes()
+            logger.error(f"Config reload rejected, keeping version {self._version}: {e}")
+            return False
+
+        logger.info(f"Configs reloaded, version {snapshot.version}")
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.exception(f"Error in config reload listener: {e}")
+        return True
+
+    def start_watching(self, interval: float = 2.0):
+        """Опрос времени изменения файлов в фоновой задаче"""
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.get_running_loop().create_task(self._watch(interval))
+
+    def stop_watching(self):
+        if self._watcher:
+            self._watcher.cancel()
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            # Разбор и слушатели (ресинк акций) выполняются вне цикла событий
+            await asyncio.to_thread(self.reload)
+
+    def _read_mtimes(self) -> Dict[str, Optional[float]]:
+        mtimes = {}
+        for name, path in self.paths.items():
+            try:
+                mtimes[name] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[name] = None
+        return mtimes
+
+    def _read_json(self, name: str, errors: List[str]) -> Dict:
+        path = self.paths[name]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            if name not in self.optional:
+                errors.append(f"{path}: файл не найден")
+            return {}
+        except json.JSONDecodeError as e:
+            errors.append(f"{path}: некорректный JSON ({e})")
+            return {}
+
+        if not isinstance(data, dict):
+            errors.append(f"{path}: ожидается объект верхнего уровня")
+            return {}
+        return data
+
+    def _parse(self, version: int) -> ConfigSnapshot:
+        errors: List[str] = []
+        businesses = _parse_businesses(self._read_json("businesses", errors), errors)
+        stocks = _parse_stocks(self._read_json("stocks", errors), errors)
+        levels = _parse_levels(self._read_json("levels", errors), errors)
+        events, event_templates = _parse_events(self._read_json("events", errors), errors)
+        bonuses = _parse_bonuses(self._read_json("bonuses", errors), errors)
+
+        if errors:
+            raise ConfigError(errors)
+
+        return ConfigSnapshot(
+            version=version,
+            businesses=businesses,
+            stocks=stocks,
+            levels=levels,
+            events=events,
+            event_templates=event_templates,
+            bonuses=bonuses,
+            businesses_by_id=MappingProxyType({b.id: b for b in businesses}),
+            stocks_by_symbol=MappingProxyType({s.symbol: s for s in stocks}),
+        )
+
+
+def _create_registry() -> ConfigRegistry:
+    from config import config
+    return ConfigRegistry(
+        businesses=config.BUSINESSES_CONFIG,
+        stocks=config.STOCKS_CONFIG,
+        levels=config.LEVELS_CONFIG,
+        events=config.EVENTS_CONFIG,
+        bonuses=config.BONUSES_CONFIG,
+    )
+
+
+# Общий реестр конфигов
+config_registry = _create_registry()
@@ -1,8 +1,12 @@
 from sqlalchemy import create_engine # type: ignore
 from sqlalchemy.orm import sessionmaker # type: ignore
 from .models import Base
+from .migrations import MigrationRunner
 from config import config
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Database:
     def __init__(self):
@@ -15,7 +19,12 @@ class Database:
         os.makedirs("data", exist_ok=True)
         
         Base.metadata.create_all(bind=self.engine)
-        print("Database tables created successfully")
+        logger.info("Database tables created successfully")
+        
+        # Применяем миграции схемы (индексы, новые колонки, backfill)
+        applied = MigrationRunner(self.engine).run()
+        if applied:
+            logger.info(f"Applied migrations: {applied}")
     
     def get_session(self):
         """Получение сессии базы данных"""
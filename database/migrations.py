@@ -0,0 +1,216 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+from sqlalchemy import inspect, text # type: ignore
+from sqlalchemy.engine import Engine # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Размер пачки для фоновых backfill-операций
+BACKFILL_BATCH_SIZE = 5000
+
+# Пауза между пачками, чтобы не держать блокировку записи SQLite подряд
+BACKFILL_PAUSE_SECONDS = 0.05
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Одна миграция схемы"""
+    version: int
+    name: str
+    upgrade: Callable[[Engine], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """Декоратор регистрации миграции"""
+    def decorator(func: Callable[[Engine], None]) -> Callable[[Engine], None]:
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Миграция с версией {version} уже зарегистрирована")
+        MIGRATIONS.append(Migration(version=version, name=name, upgrade=func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+
+# ====================
+# ВСПОМОГАТЕЛЬНЫЕ ОПЕРАЦИИ
+# ====================
+
+def create_index(engine: Engine, name: str, table: str, columns: Iterable[str], unique: bool = False):
+    """Создание индекса без остановки бота
+
+    Операция идемпотентна. В PostgreSQL индекс строится через
+    CREATE INDEX CONCURRENTLY, что не блокирует запись в таблицу.
+    """
+    columns_sql = ", ".join(columns)
+    unique_sql = "UNIQUE " if unique else ""
+
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY нельзя выполнять внутри транзакции
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(
+                f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns_sql})"
+            ))
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({columns_sql})"
+        ))
+
+
+def add_column(engine: Engine, table: str, column: str, ddl: str):
+    """Добавление колонки, если её ещё нет
+
+    ddl - описание типа колонки, например "FLOAT DEFAULT 0". Значение
+    по умолчанию должно быть константой, чтобы операция оставалась
+    быстрой на больших таблицах.
+    """
+    existing = {c['name'] for c in inspect(engine).get_columns(table)}
+    if column in existing:
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def backfill(engine: Engine, table: str, set_sql: str, where_sql: str = "1 = 1",
+             batch_size: int = BACKFILL_BATCH_SIZE, params: Optional[dict] = None) -> int:
+    """Пакетное заполнение данных по диапазонам первичного ключа
+
+    Каждая пачка выполняется в отдельной короткой транзакции, поэтому
+    обработчики бота успевают писать в базу между пачками. Повторный
+    запуск безопасен, если where_sql отбирает только незаполненные строки.
+    """
+    params = params or {}
+
+    with engine.connect() as conn:
+        bounds = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {table}")).first()
+
+    if not bounds or bounds[0] is None:
+        return 0
+
+    min_id, max_id = bounds
+    updated = 0
+
+    for start in range(min_id, max_id + 1, batch_size):
+        with engine.begin() as conn:
+            result = conn.execute(
+                text(
+                    f"UPDATE {table} SET {set_sql} "
+                    f"WHERE id >= :_start AND id < :_end AND ({where_sql})"
+                ),
+                {**params, "_start": start, "_end": start + batch_size}
+            )
+            updated += result.rowcount or 0
+
+        if BACKFILL_PAUSE_SECONDS:
+            time.sleep(BACKFILL_PAUSE_SECONDS)
+
+    return updated
+
+
+# ====================
+# ЗАПУСК МИГРАЦИЙ
+# ====================
+
+class MigrationRunner:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def _ensure_version_table(self):
+        """Создание таблицы применённых миграций"""
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INTEGER PRIMARY KEY, "
+                "name VARCHAR(200) NOT NULL, "
+                "applied_at TIMESTAMP NOT NULL)"
+            ))
+
+    def get_applied_versions(self) -> set[int]:
+        """Получение номеров применённых миграций"""
+        self._ensure_version_table()
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("SELECT version FROM schema_migrations")).all()
+        return {row[0] for row in rows}
+
+    def run(self) -> List[int]:
+        """Применение всех новых миграций по порядку"""
+        applied = self.get_applied_versions()
+        newly_applied = []
+
+        for m in MIGRATIONS:
+            if m.version in applied:
+                continue
+
+            started = time.monotonic()
+            logger.info(f"Применение миграции {m.version}: {m.name}")
+            m.upgrade(self.engine)
+
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text(
+                        "INSERT INTO schema_migrations (version, name, applied_at) "
+                        "VALUES (:version, :name, :applied_at)"
+                    ),
+                    {"version": m.version, "name": m.name, "applied_at": datetime.utcnow()}
+                )
+
+            newly_applied.append(m.version)
+            logger.info(f"Миграция {m.version} применена за {time.monotonic() - started:.2f} сек")
+
+        return newly_applied
+
+
+# ====================
+# МИГРАЦИИ
+# ====================
+
+@migration(1, "transactions_created_at_index")
+def _transactions_created_at_index(engine: Engine):
+    # check_events и статистика выбирают транзакции за последние сутки/час
+    create_index(engine, "ix_transactions_created_at", "transactions", ["created_at"])
+
+
+@migration(2, "users_balance_index")
+def _users_balance_index(engine: Engine):
+    # Рейтинг игроков и топы сортируют по балансу
+    create_index(engine, "ix_users_balance", "users", ["balance"])
+
+
+@migration(3, "stock_orders_status_index")
+def _stock_orders_status_index(engine: Engine):
+    # При запуске в стакан загружаются только открытые заявки
+    create_index(engine, "ix_stock_orders_status_symbol", "stock_orders", ["status", "symbol"])
+
+
+@migration(4, "achievements_user_type_unique")
+def _achievements_user_type_unique(engine: Engine):
+    # Каждое достижение выдается игроку один раз
+    create_index(engine, "ux_achievements_user_type", "achievements", ["user_id", "achievement_type"], unique=True)
+
+
+@migration(5, "job_offers_market_indexes")
+def _job_offers_market_indexes(engine: Engine):
+    add_column(engine, "job_offers", "accepted_at", "DATETIME")
+    # Список открытых предложений сортируется по зарплате,
+    # очистка просроченных идет по времени создания
+    create_index(engine, "ix_job_offers_status_salary", "job_offers", ["status", "salary"])
+    create_index(engine, "ix_job_offers_status_created_at", "job_offers", ["status", "created_at"])
+    # Предложения работодателя и контракты работника
+    create_index(engine, "ix_job_offers_employer_status", "job_offers", ["employer_id", "status"])
+    create_index(engine, "ix_job_offers_employee_status", "job_offers", ["employee_id", "status"])
+
+
+@migration(6, "payroll_columns")
+def _payroll_columns(engine: Engine):
+    add_column(engine, "job_offers", "paid_hours", "INTEGER DEFAULT 0")
+    add_column(engine, "transactions", "idempotency_key", "VARCHAR(100)")
+    # Повторный запуск расчета зарплат не может провести ту же выплату дважды
+    create_index(engine, "ux_transactions_idempotency_key", "transactions", ["idempotency_key"], unique=True)
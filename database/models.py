@@ -63,6 +63,23 @@ class UserStock(Base):
     user = relationship("User", back_populates="stocks")
     stock = relationship("Stock")
 
+class StockOrder(Base):
+    __tablename__ = 'stock_orders'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    symbol = Column(String(10), nullable=False)
+    side = Column(String(4), nullable=False)  # buy, sell
+    order_type = Column(String(10), default='limit')  # limit, market
+    price = Column(Float, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    remaining = Column(Integer, nullable=False)
+    escrow_price = Column(Float, nullable=False)
+    status = Column(String(20), default='open')  # open, filled, cancelled
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    user = relationship("User")
+
 class Transaction(Base):
     __tablename__ = 'transactions'
     
@@ -72,6 +89,7 @@ class Transaction(Base):
     amount = Column(Float, nullable=False)
     details = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
+    idempotency_key = Column(String(100), nullable=True)  # Уникален (миграция 6): защита пакетных начислений от повтора
     
     user = relationship("User", back_populates="transactions")
 
@@ -93,7 +111,9 @@ class JobOffer(Base):
     salary = Column(Float, nullable=False)
     duration_hours = Column(Integer, default=24)
     created_at = Column(DateTime, default=datetime.utcnow)
-    status = Column(String(20), default='open')  # open, accepted, completed, expired
+    accepted_at = Column(DateTime, nullable=True)
+    paid_hours = Column(Integer, default=0)  # Оплаченные часы контракта
+    status = Column(String(20), default='open')  # open, accepted, completed, terminated, expired, cancelled
     
     employer = relationship("User", foreign_keys=[employer_id])
     employee = relationship("User", foreign_keys=[employee_id])
\ No newline at end of file
@@ -4,6 +4,7 @@ from .profile import router as profile_router
 from .business import router as business_router
 from .stock_market import router as stock_market_router
 from .players import router as players_router
+from .job_market import router as job_market_router
 from .admin import router as admin_router
 from .errors import router as errors_router
 
@@ -14,5 +15,6 @@ def register_handlers(dp: Dispatcher):
     dp.include_router(business_router)
     dp.include_router(stock_market_router)
     dp.include_router(players_router)
+    dp.include_router(job_market_router)
     dp.include_router(admin_router)
     dp.include_router(errors_router)
\ No newline at end of file
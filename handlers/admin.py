@@ -1,16 +1,19 @@
 from aiogram import Router, F
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.filters.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.orm import Session # type: ignore
 from database.database import db
 from models.user import User
-from services.economy_service import EconomyService
-from services.stock_service import StockService
+from services.container import container
 from config import config
 import json
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
@@ -37,6 +40,8 @@ async def cmd_admin(message: Message):
         "🎰 /lottery - запуск розыгрыша\n"
         "📈 /stocks - управление акциями\n"
         "💰 /economy - управление экономикой\n"
+        "⏱ /lag - задержка цикла событий\n"
+        "🔬 /profiler [сек] - профилирование бота\n"
     )
     
     builder = InlineKeyboardBuilder()
@@ -44,7 +49,8 @@ async def cmd_admin(message: Message):
     builder.button(text="👥 Пользователи", callback_data="admin_users")
     builder.button(text="📢 Рассылка", callback_data="admin_broadcast")
     builder.button(text="🎰 Розыгрыш", callback_data="admin_lottery")
-    builder.adjust(2, 2)
+    builder.button(text="🔬 Профилирование", callback_data="admin_profiler")
+    builder.adjust(2, 2, 1)
     
     await message.answer(
         text,
@@ -58,7 +64,7 @@ async def cmd_stats(message: Message):
         await message.answer("⛔ У вас нет прав администратора")
         return
     
-    economy_service = EconomyService()
+    economy_service = container.economy
     
     with db.get_session() as session:
         stats = economy_service.get_economy_stats(session)
@@ -124,7 +130,7 @@ async def process_broadcast_message(message: Message, state: FSMContext):
                 )
                 success_count += 1
             except Exception as e:
-                print(f"Failed to send to user {user.id}: {e}")
+                logger.warning(f"Failed to send to user {user.id}: {e}")
                 fail_count += 1
         
         await message.answer(
@@ -160,6 +166,64 @@ async def cmd_lottery(message: Message):
     # Для демонстрации просто отправляем сообщение
     await message.answer("Розыгрыш будет проведен автоматически в воскресенье в 20:00")
 
+@router.message(Command("lag"))
+async def cmd_lag(message: Message):
+    """Задержка цикла событий и источники зависаний"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ У вас нет прав администратора")
+        return
+    
+    from utils.loop_monitor import loop_monitor
+    
+    await message.answer(loop_monitor.report())
+
+async def run_profiler(message: Message, seconds: int):
+    """Профилирование бота и отправка свернутых стеков файлом"""
+    from utils.profiler import profiler
+    
+    if profiler.running:
+        await message.answer("⏳ Профилирование уже идет, дождитесь результата")
+        return
+    
+    await message.answer(f"🔬 Профилирование запущено на {seconds} сек...")
+    
+    result = await profiler.profile(seconds)
+    if result is None:
+        await message.answer("⏳ Профилирование уже идет, дождитесь результата")
+        return
+    
+    filename = f"profile_{datetime.utcnow():%Y%m%d_%H%M%S}.folded"
+    await message.answer_document(
+        BufferedInputFile(result.collapsed().encode("utf-8"), filename=filename),
+        caption=result.summary()[:1024]
+    )
+
+@router.message(Command("profiler"))
+async def cmd_profiler(message: Message):
+    """Профилирование работающего бота: /profiler [секунды]"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ У вас нет прав администратора")
+        return
+    
+    parts = message.text.split()
+    try:
+        seconds = int(parts[1]) if len(parts) > 1 else 30
+    except ValueError:
+        await message.answer("❌ Использование: /profiler [секунды]")
+        return
+    
+    await run_profiler(message, max(1, min(seconds, 300)))
+
+@router.callback_query(F.data == "admin_profiler")
+async def admin_profiler_callback(callback: CallbackQuery):
+    """Профилирование через callback"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ У вас нет прав администратора")
+        return
+    
+    await callback.answer()
+    await run_profiler(callback.message, 30)
+
 @router.message(Command("users"))
 async def cmd_users(message: Message):
     """Управление пользователями"""
@@ -4,13 +4,15 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.orm import Session # type: ignore
 from database.database import db
-from services.business_service import BusinessService
-from services.economy_service import EconomyService
+from services.container import container
+from configs.registry import BusinessConfig
+from models.user import User
 from utils.keyboards import business_menu_keyboard
+from utils.screen_cache import static_screens
 import json
 
 router = Router()
-business_service = BusinessService()
+business_service = container.business
 
 @router.callback_query(F.data == "businesses")
 async def show_businesses(callback: CallbackQuery):
@@ -38,7 +40,7 @@ async def show_businesses(callback: CallbackQuery):
             for i, ub in enumerate(user_businesses[:5], 1):
                 business_info = business_service.get_business_info(ub.business_type)
                 if business_info:
-                    text += f"{i}. {business_info['icon']} {business_info['name']} - Уровень {ub.level}\n"
+                    text += f"{i}. {business_info.icon} {business_info.name} - Уровень {ub.level}\n"
                     text += f"   Прибыль/час: ${ub.profit_per_hour:,.2f}\n"
             
             if len(user_businesses) > 5:
@@ -65,13 +67,21 @@ async def show_businesses(callback: CallbackQuery):
 @router.callback_query(F.data == "buy_business_menu")
 async def show_buy_business_menu(callback: CallbackQuery):
     """Показать меню покупки бизнеса"""
+    text, markup = static_screens.get_or_render("buy_business_menu", _render_buy_business_menu)
+    
+    await callback.message.edit_text(text, reply_markup=markup)
+    
+    await callback.answer()
+
+def _render_buy_business_menu():
+    """Отрисовка меню выбора категории"""
     all_businesses = business_service.get_all_businesses()
     
     # Создаем клавиатуру с категориями
     builder = InlineKeyboardBuilder()
     
     # Получаем уникальные категории
-    categories = set(b['category'] for b in all_businesses)
+    categories = set(b.category for b in all_businesses)
     
     for category in sorted(categories):
         builder.button(text=f"📁 {category.title()}", callback_data=f"category_{category}")
@@ -79,18 +89,28 @@ async def show_buy_business_menu(callback: CallbackQuery):
     builder.button(text="🔙 Назад", callback_data="businesses")
     builder.adjust(2)
     
-    await callback.message.edit_text(
+    text = (
         "🏪 ВЫБОР КАТЕГОРИИ БИЗНЕСА\n\n"
-        "Выберите категорию для просмотра доступных бизнесов:",
-        reply_markup=builder.as_markup()
+        "Выберите категорию для просмотра доступных бизнесов:"
     )
-    
-    await callback.answer()
+    return text, builder.as_markup()
 
 @router.callback_query(F.data.startswith("category_"))
 async def show_businesses_in_category(callback: CallbackQuery):
     """Показать бизнесы в категории"""
     category = callback.data.replace("category_", "")
+    
+    text, markup = static_screens.get_or_render(
+        ("category", category),
+        lambda: _render_businesses_in_category(category)
+    )
+    
+    await callback.message.edit_text(text, reply_markup=markup)
+    
+    await callback.answer()
+
+def _render_businesses_in_category(category: str):
+    """Отрисовка списка бизнесов категории"""
     businesses = business_service.get_businesses_by_category(category)
     
     text = f"🏪 БИЗНЕСЫ: {category.upper()}\n\n"
@@ -98,18 +118,13 @@ async def show_businesses_in_category(callback: CallbackQuery):
     builder = InlineKeyboardBuilder()
     
     for business in businesses[:10]:  # Ограничиваем 10 бизнесами на странице
-        btn_text = f"{business['icon']} {business['name']} - ${business['base_price']:,.0f}"
-        builder.button(text=btn_text, callback_data=f"view_business_{business['id']}")
+        btn_text = f"{business.icon} {business.name} - ${business.base_price:,.0f}"
+        builder.button(text=btn_text, callback_data=f"view_business_{business.id}")
     
     builder.button(text="🔙 Назад к категориям", callback_data="buy_business_menu")
     builder.adjust(1)
     
-    await callback.message.edit_text(
-        text,
-        reply_markup=builder.as_markup()
-    )
-    
-    await callback.answer()
+    return text, builder.as_markup()
 
 @router.callback_query(F.data.startswith("view_business_"))
 async def view_business_details(callback: CallbackQuery):
@@ -134,13 +149,13 @@ async def view_business_details(callback: CallbackQuery):
         can_buy, message = business_service.can_buy_business(session, user.id, business_id)
         
         text = (
-            f"{business_info['icon']} {business_info['name']}\n\n"
-            f"📝 {business_info['description']}\n\n"
-            f"💰 Базовая цена: ${business_info['base_price']:,.2f}\n"
-            f"📈 Прибыль/час (уровень 1): ${business_info['base_profit_per_hour']:,.2f}\n"
-            f"⬆️ Множитель улучшения: {business_info['upgrade_multiplier']}x\n"
-            f"🏆 Максимальный уровень: {business_info['max_level']}\n"
-            f"📂 Категория: {business_info['category']}\n\n"
+            f"{business_info.icon} {business_info.name}\n\n"
+            f"📝 {business_info.description}\n\n"
+            f"💰 Базовая цена: ${business_info.base_price:,.2f}\n"
+            f"📈 Прибыль/час (уровень 1): ${business_info.base_profit_per_hour:,.2f}\n"
+            f"⬆️ Множитель улучшения: {business_info.upgrade_multiplier}x\n"
+            f"🏆 Максимальный уровень: {business_info.max_level}\n"
+            f"📂 Категория: {business_info.category}\n\n"
         )
         
         if can_buy:
@@ -154,7 +169,7 @@ async def view_business_details(callback: CallbackQuery):
             builder.button(text="✅ Купить бизнес", callback_data=f"buy_business_{business_id}")
         
         builder.button(text="📈 Показать улучшения", callback_data=f"show_upgrades_{business_id}")
-        builder.button(text="🔙 Назад", callback_data=f"category_{business_info['category']}")
+        builder.button(text="🔙 Назад", callback_data=f"category_{business_info.category}")
         builder.adjust(1)
         
         await callback.message.edit_text(
@@ -164,7 +179,7 @@ async def view_business_details(callback: CallbackQuery):
     
     await callback.answer()
 
-@router.callback_query(F.data.startswith("buy_business_"))
+@router.callback_query(F.data.startswith("buy_business_"), flags={"user_queue": True})
 async def buy_business(callback: CallbackQuery):
     """Покупка бизнеса"""
     business_id = callback.data.replace("buy_business_", "")
@@ -188,8 +203,8 @@ async def buy_business(callback: CallbackQuery):
             event_text = (
                 f"🎉 НОВЫЙ БИЗНЕС!\n\n"
                 f"👤 Игрок: @{callback.from_user.username or callback.from_user.first_name}\n"
-                f"🏪 Бизнес: {business_info['icon']} {business_info['name']}\n"
-                f"💰 Стоимость: ${business_info['base_price']:,.2f}"
+                f"🏪 Бизнес: {business_info.icon} {business_info.name}\n"
+                f"💰 Стоимость: ${business_info.base_price:,.2f}"
             )
             
             # Здесь должен быть вызов сервиса канала
@@ -218,7 +233,7 @@ async def buy_business(callback: CallbackQuery):
     
     await callback.answer()
 
-@router.callback_query(F.data == "collect_profits")
+@router.callback_query(F.data == "collect_profits", flags={"user_queue": True, "throttle": {"rate": 0.2, "burst": 2}})
 async def collect_profits(callback: CallbackQuery):
     """Сбор прибыли со всех бизнесов"""
     with db.get_session() as session:
@@ -240,18 +255,19 @@ async def collect_profits(callback: CallbackQuery):
                 for business_type, details in collected_from.items():
                     business_info = business_service.get_business_info(business_type)
                     if business_info:
-                        text += f"{business_info['icon']} {business_info['name']} (ур. {details['level']}): ${details['profit']:,.2f}\n"
+                        text += f"{business_info.icon} {business_info.name} (ур. {details['level']}): ${details['profit']:,.2f}\n"
             else:
                 text += f"📊 Прибыль собрана с {len(collected_from)} бизнесов\n"
             
             text += f"\n💰 Ваш баланс: ${user.balance:,.2f}"
             
             # Проверяем повышение уровня
-            economy_service = EconomyService()
-            leveled_up, new_level = economy_service.check_level_up(session, user.id)
+            leveled_up, new_level = container.economy.check_level_up(session, user.id)
             
             if leveled_up:
                 text += f"\n\n🎉 ПОЗДРАВЛЯЕМ! Вы достигли уровня {new_level}!"
+                # Публикация в канал только ставится в очередь уведомлений
+                await container.events.publish_level_up(user, new_level)
         else:
             text = "⏰ Прибыль еще не накопилась. Подождите хотя бы 1 час после последнего сбора."
         
@@ -277,26 +293,35 @@ async def show_business_upgrades(callback: CallbackQuery):
         await callback.answer("Бизнес не найден")
         return
     
-    text = f"📈 УЛУЧШЕНИЯ: {business_info['name']}\n\n"
+    text, markup = static_screens.get_or_render(
+        ("upgrades", business_id),
+        lambda: _render_business_upgrades(business_id, business_info)
+    )
+    
+    await callback.message.edit_text(
+        text,
+        reply_markup=markup,
+        parse_mode="HTML"
+    )
+    
+    await callback.answer()
+
+def _render_business_upgrades(business_id: str, business_info: BusinessConfig):
+    """Отрисовка таблицы улучшений бизнеса"""
+    text = f"📈 УЛУЧШЕНИЯ: {business_info.name}\n\n"
     text += "Уровень | Стоимость | Прибыль/час\n"
     text += "--------|-----------|-------------\n"
     
-    for level in range(1, min(6, business_info['max_level'] + 1)):  # Показываем первые 5 уровней
+    for level in range(1, min(6, business_info.max_level + 1)):  # Показываем первые 5 уровней
         upgrade_price = business_service.calculate_upgrade_price(business_info, level)
         profit = business_service.calculate_profit_per_hour(business_info, level)
         
         text += f"{level:2} | ${upgrade_price:9,.0f} | ${profit:11,.2f}\n"
     
-    if business_info['max_level'] > 5:
-        text += f"... и еще {business_info['max_level'] - 5} уровней\n"
+    if business_info.max_level > 5:
+        text += f"... и еще {business_info.max_level - 5} уровней\n"
     
     builder = InlineKeyboardBuilder()
     builder.button(text="🔙 Назад", callback_data=f"view_business_{business_id}")
     
-    await callback.message.edit_text(
-        f"<pre>{text}</pre>",
-        reply_markup=builder.as_markup(),
-        parse_mode="HTML"
-    )
-    
-    await callback.answer()
\ No newline at end of file
+    return f"<pre>{text}</pre>", builder.as_markup()
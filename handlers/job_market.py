@@ -0,0 +1,327 @@
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery
+from aiogram.fsm.context import FSMContext
+from aiogram.filters.state import State, StatesGroup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from database.database import db
+from models.job_offer import JobOffer
+from models.user import User
+from services.container import container
+from services.notification_service import HIGH
+from utils.screen_cache import static_screens
+from config import config
+import math
+router = Router()
+job_market_service = container.job_market
+
+class HireWorker(StatesGroup):
+    entering_salary = State()
+
+class FindJob(StatesGroup):
+    entering_min_salary = State()
+
+def _name(user: User) -> str:
+    return user.username or user.full_name or f"Игрок_{user.id}"
+
+def _notify_match(offer: JobOffer):
+    """Уведомление обеих сторон о заключенном контракте (в фоне)"""
+    text = (
+        f"🤝 Контракт #{offer.id} заключен!\n\n"
+        f"👨‍💼 Работодатель: @{_name(offer.employer)}\n"
+        f"👨‍💻 Работник: @{_name(offer.employee)}\n"
+        f"💰 Зарплата: ${offer.salary:,.2f}/час\n"
+        f"⏱ Длительность: {offer.duration_hours} ч"
+    )
+    for user in (offer.employer, offer.employee):
+        container.notifications.notify(user.telegram_id, text, HIGH, dedup_key=f"contract:{offer.id}:{user.id}")
+
+@router.callback_query(F.data == "job_market")
+async def show_job_market(callback: CallbackQuery):
+    """Показать рынок труда"""
+    text, markup = static_screens.get_or_render("job_market", _render_job_market)
+
+    await callback.message.edit_text(
+        text,
+        reply_markup=markup
+    )
+
+    await callback.answer()
+
+def _render_job_market():
+    """Отрисовка меню рынка труда"""
+    text = (
+        "🏢 РЫНОК ТРУДА\n\n"
+        "Здесь вы можете:\n\n"
+        "👨‍💼 Нанять работника - опубликуйте предложение с почасовой зарплатой\n"
+        "👨‍💻 Найти работу - примите лучшее предложение или встаньте в очередь\n"
+        "📋 Мои предложения - ваши предложения и контракты\n\n"
+        f"⏳ Предложения действуют {config.JOB_OFFER_TTL_HOURS} ч"
+    )
+
+    builder = InlineKeyboardBuilder()
+    builder.button(text="👨‍💼 Нанять работника", callback_data="hire_worker")
+    builder.button(text="👨‍💻 Найти работу", callback_data="find_job")
+    builder.button(text="📋 Мои предложения", callback_data="my_job_offers")
+    builder.button(text="🔙 Назад", callback_data="players")
+    builder.adjust(2, 1, 1)
+
+    return text, builder.as_markup()
+
+@router.callback_query(F.data == "hire_worker")
+async def start_hire_worker(callback: CallbackQuery, state: FSMContext):
+    """Начало публикации предложения работы"""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🔙 Назад", callback_data="job_market")
+
+    await state.set_state(HireWorker.entering_salary)
+    await callback.message.edit_text(
+        "👨‍💼 НАЙМ РАБОТНИКА\n\n"
+        "Введите зарплату в час:",
+        reply_markup=builder.as_markup()
+    )
+
+    await callback.answer()
+
+@router.message(HireWorker.entering_salary)
+async def process_salary_input(message: Message, state: FSMContext):
+    """Обработка ввода зарплаты"""
+    try:
+        salary = round(float(message.text.strip()), 2)
+    except ValueError:
+        await message.answer("Пожалуйста, введите число")
+        return
+
+    # float() принимает "nan" и "inf", а любое сравнение с NaN ложно
+    if not math.isfinite(salary):
+        await message.answer("Пожалуйста, введите число")
+        return
+
+    if salary <= 0:
+        await message.answer("Зарплата должна быть больше 0")
+        return
+
+    await state.clear()
+
+    builder = InlineKeyboardBuilder()
+    for hours in config.JOB_DURATIONS:
+        builder.button(
+            text=f"{hours} ч (${salary * hours:,.2f})",
+            callback_data=f"hire_duration_{salary}_{hours}"
+        )
+    builder.button(text="🔙 Отмена", callback_data="job_market")
+    builder.adjust(1)
+
+    await message.answer(
+        f"💰 Зарплата: ${salary:,.2f}/час\n\n"
+        f"Выберите длительность контракта:",
+        reply_markup=builder.as_markup()
+    )
+
+@router.callback_query(F.data.startswith("hire_duration_"), flags={"user_queue": True})
+async def post_job_offer(callback: CallbackQuery):
+    """Публикация предложения работы"""
+    _, _, salary, hours = callback.data.split("_")
+
+    with db.get_session() as session:
+        user = session.query(User).filter(
+            User.telegram_id == callback.from_user.id
+        ).first()
+
+        if not user:
+            await callback.answer("Пользователь не найден")
+            return
+
+        success, message_text, offer = job_market_service.post_offer(
+            session, user.id, float(salary), int(hours)
+        )
+
+        if not success:
+            await callback.answer(f"❌ {message_text}", show_alert=True)
+            return
+
+        builder = InlineKeyboardBuilder()
+        builder.button(text="📋 Мои предложения", callback_data="my_job_offers")
+        builder.button(text="🔙 К рынку труда", callback_data="job_market")
+        builder.adjust(1)
+
+        await callback.message.edit_text(message_text, reply_markup=builder.as_markup())
+
+        if offer.status == 'accepted':
+            _notify_match(offer)
+
+    await callback.answer()
+
+@router.callback_query(F.data == "find_job", flags={"throttle": {"rate": 0.5, "burst": 3}})
+async def show_open_offers(callback: CallbackQuery):
+    """Лучшие открытые предложения"""
+    with db.get_session() as session:
+        offers = job_market_service.get_open_offers(session)
+
+        text = "👨‍💻 ПОИСК РАБОТЫ\n\n"
+        builder = InlineKeyboardBuilder()
+
+        if offers:
+            text += "💼 Лучшие предложения:\n"
+            for offer in offers:
+                text += (
+                    f"#{offer.id} @{_name(offer.employer)} - "
+                    f"${offer.salary:,.2f}/час, {offer.duration_hours} ч\n"
+                )
+                builder.button(text=f"✅ #{offer.id} ${offer.salary:,.2f}", callback_data=f"accept_job_{offer.id}")
+        else:
+            text += "Открытых предложений пока нет\n"
+
+        text += "\nМожно встать в очередь: первое подходящее предложение достанется вам"
+
+        builder.button(text="⏳ Встать в очередь", callback_data="job_queue")
+        builder.button(text="🔙 Назад", callback_data="job_market")
+        builder.adjust(2)
+
+        await callback.message.edit_text(text, reply_markup=builder.as_markup())
+
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("accept_job_"), flags={"user_queue": True})
+async def accept_job_offer(callback: CallbackQuery):
+    """Принятие предложения из списка"""
+    offer_id = int(callback.data.split("_")[2])
+
+    with db.get_session() as session:
+        user = session.query(User).filter(
+            User.telegram_id == callback.from_user.id
+        ).first()
+
+        if not user:
+            await callback.answer("Пользователь не найден")
+            return
+
+        success, message_text, offer = job_market_service.accept_offer(session, user.id, offer_id)
+
+        if not success:
+            await callback.answer(f"❌ {message_text}", show_alert=True)
+            return
+
+        await callback.answer(message_text, show_alert=True)
+        _notify_match(offer)
+
+@router.callback_query(F.data == "job_queue")
+async def start_job_queue(callback: CallbackQuery, state: FSMContext):
+    """Начало ожидания предложения"""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🔙 Назад", callback_data="find_job")
+
+    await state.set_state(FindJob.entering_min_salary)
+    await callback.message.edit_text(
+        "⏳ ОЧЕРЕДЬ СОИСКАТЕЛЕЙ\n\n"
+        "Введите минимальную зарплату в час (0 - любая):",
+        reply_markup=builder.as_markup()
+    )
+
+    await callback.answer()
+
+@router.message(FindJob.entering_min_salary, flags={"user_queue": True})
+async def process_min_salary_input(message: Message, state: FSMContext):
+    """Постановка в очередь соискателей"""
+    try:
+        min_salary = float(message.text.strip())
+    except ValueError:
+        await message.answer("Пожалуйста, введите число")
+        return
+
+    if not math.isfinite(min_salary):
+        await message.answer("Пожалуйста, введите число")
+        return
+
+    await state.clear()
+
+    with db.get_session() as session:
+        user = session.query(User).filter(
+            User.telegram_id == message.from_user.id
+        ).first()
+
+        if not user:
+            await message.answer("Пользователь не найден")
+            return
+
+        success, message_text, offer = job_market_service.seek_job(session, user.id, min_salary)
+
+        if not success:
+            await message.answer(f"❌ {message_text}")
+            return
+
+        await message.answer(message_text)
+        if offer is not None:
+            _notify_match(offer)
+
+@router.callback_query(F.data == "my_job_offers")
+async def show_my_job_offers(callback: CallbackQuery):
+    """Свои предложения и контракты"""
+    with db.get_session() as session:
+        user = session.query(User).filter(
+            User.telegram_id == callback.from_user.id
+        ).first()
+
+        if not user:
+            await callback.answer("Пользователь не найден")
+            return
+
+        text, markup = _render_my_offers(session, user)
+        await callback.message.edit_text(text, reply_markup=markup)
+
+    await callback.answer()
+
+def _render_my_offers(session, user: User):
+    """Отрисовка своих предложений и контракта"""
+    offers = job_market_service.get_user_offers(session, user.id)
+    contract = job_market_service.get_active_contract(session, user.id)
+
+    text = "📋 МОИ ПРЕДЛОЖЕНИЯ\n\n"
+    builder = InlineKeyboardBuilder()
+
+    if contract:
+        text += (
+            f"👨‍💻 Вы работаете у @{_name(contract.employer)}: "
+            f"${contract.salary:,.2f}/час, {contract.duration_hours} ч\n\n"
+        )
+    elif job_market_service.matcher.is_seeking(user.id):
+        text += "⏳ Вы в очереди соискателей\n\n"
+
+    if offers:
+        for offer in offers:
+            if offer.status == 'open':
+                text += f"🟢 #{offer.id} ${offer.salary:,.2f}/час, {offer.duration_hours} ч - ждет работника\n"
+                builder.button(text=f"❌ Отменить #{offer.id}", callback_data=f"cancel_job_{offer.id}")
+            else:
+                text += (
+                    f"🤝 #{offer.id} ${offer.salary:,.2f}/час, {offer.duration_hours} ч - "
+                    f"работает @{_name(offer.employee)}\n"
+                )
+    else:
+        text += "У вас нет открытых предложений\n"
+
+    builder.button(text="🔙 Назад", callback_data="job_market")
+    builder.adjust(1)
+
+    return text, builder.as_markup()
+
+@router.callback_query(F.data.startswith("cancel_job_"), flags={"user_queue": True})
+async def cancel_job_offer(callback: CallbackQuery):
+    """Отмена своего предложения"""
+    offer_id = int(callback.data.split("_")[2])
+
+    with db.get_session() as session:
+        user = session.query(User).filter(
+            User.telegram_id == callback.from_user.id
+        ).first()
+
+        if not user:
+            await callback.answer("Пользователь не найден")
+            return
+
+        success, message_text = job_market_service.cancel_offer(session, user.id, offer_id)
+
+        if success:
+            text, markup = _render_my_offers(session, user)
+            await callback.message.edit_text(text, reply_markup=markup)
+
+    await callback.answer(message_text if success else f"❌ {message_text}", show_alert=True)
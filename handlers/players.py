@@ -6,7 +6,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.orm import Session # type: ignore
 from database.database import db
 from models.user import User
-from services.economy_service import EconomyService
+from services.container import container
 import random
 
 router = Router()
@@ -107,7 +107,7 @@ async def process_username_input(message: Message, state: FSMContext):
         
         await message.answer(text)
 
-@router.message(MoneyTransfer.entering_amount)
+@router.message(MoneyTransfer.entering_amount, flags={"user_queue": True})
 async def process_amount_input(message: Message, state: FSMContext):
     """Обработка ввода суммы перевода"""
     try:
@@ -126,7 +126,7 @@ async def process_amount_input(message: Message, state: FSMContext):
             return
         
         with db.get_session() as session:
-            economy_service = EconomyService()
+            economy_service = container.economy
             sender = session.query(User).filter(
                 User.telegram_id == message.from_user.id
             ).first()
@@ -171,7 +171,7 @@ async def process_amount_input(message: Message, state: FSMContext):
     
     await state.clear()
 
-@router.callback_query(F.data == "player_rating")
+@router.callback_query(F.data == "player_rating", flags={"throttle": {"rate": 0.2, "burst": 2}})
 async def show_player_rating(callback: CallbackQuery):
     """Показать рейтинг игроков"""
     with db.get_session() as session:
@@ -207,28 +207,3 @@ async def show_player_rating(callback: CallbackQuery):
         )
     
     await callback.answer()
-
-@router.callback_query(F.data == "job_market")
-async def show_job_market(callback: CallbackQuery):
-    """Показать рынок труда"""
-    text = (
-        "🏢 РЫНОК ТРУДА\n\n"
-        "Здесь вы можете:\n\n"
-        "👨‍💼 Нанять работника - наймите другого игрока для работы в вашем бизнесе\n"
-        "👨‍💻 Найти работу - станьте работником у другого игрока\n"
-        "📋 Мои предложения - просмотр ваших предложений работы\n"
-        "🤝 Активные контракты - ваши текущие рабочие отношения\n\n"
-        "⚡ Функция в разработке..."
-    )
-    
-    builder = InlineKeyboardBuilder()
-    builder.button(text="👨‍💼 Нанять работника", callback_data="hire_worker")
-    builder.button(text="👨‍💻 Найти работу", callback_data="find_job")
-    builder.button(text="🔙 Назад", callback_data="players")
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=builder.as_markup()
-    )
-    
-    await callback.answer()
\ No newline at end of file
@@ -0,0 +1,68 @@
+from aiogram import Router, F
+from aiogram.types import CallbackQuery
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from database.database import db
+from models.user import User
+from services.container import container
+
+router = Router()
+economy_service = container.economy
+bonus_service = container.bonuses
+
+@router.callback_query(F.data == "profile")
+async def show_profile(callback: CallbackQuery):
+    """Профиль игрока"""
+    with db.get_session() as session:
+        user = session.query(User).filter( # type: ignore
+            User.telegram_id == callback.from_user.id # type: ignore
+        ).first()
+
+        if not user:
+            await callback.answer("Пользователь не найден")
+            return
+
+        progress, exp_in_level, exp_needed = economy_service.get_exp_progress(user.experience)
+        # Размер следующего бонуса, если серия не прервется
+        next_bonus = bonus_service.calculate_bonus(user.daily_streak + 1, user.level)
+
+        text = (
+            f"👤 ПРОФИЛЬ\n\n"
+            f"💰 Баланс: ${user.balance:,.2f}\n"
+            f"⭐ Уровень: {user.level} ({progress}%)\n"
+            f"📈 Опыт: {exp_in_level:,.0f} / {exp_needed:,.0f}\n"
+            f"📊 Всего заработано: ${user.total_earned:,.2f}\n"
+            f"📉 Всего потрачено: ${user.total_spent:,.2f}\n\n"
+            f"🔥 Серия бонусов: {user.daily_streak} дней\n"
+            f"🎁 Следующий бонус: ${next_bonus:,.2f}\n"
+        )
+
+        builder = InlineKeyboardBuilder()
+        builder.button(text="🎁 Ежедневный бонус", callback_data="daily_bonus")
+        builder.button(text="🔙 Назад", callback_data="main_menu")
+        builder.adjust(1)
+
+        await callback.message.edit_text(
+            text,
+            reply_markup=builder.as_markup()
+        )
+
+    await callback.answer()
+
+@router.callback_query(F.data == "daily_bonus")
+async def claim_daily_bonus(callback: CallbackQuery):
+    """Получение ежедневного бонуса"""
+    with db.get_session() as session:
+        user_id = session.query(User.id).filter( # type: ignore
+            User.telegram_id == callback.from_user.id # type: ignore
+        ).scalar()
+
+        if not user_id:
+            await callback.answer("Пользователь не найден")
+            return
+
+        success, message, bonus = economy_service.get_daily_bonus(session, user_id)
+
+    if success:
+        await callback.answer(f"{message}\n💰 +${bonus:,.2f}", show_alert=True)
+    else:
+        await callback.answer(message, show_alert=True)
@@ -2,12 +2,19 @@ from aiogram import Router, F
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from utils.screen_cache import static_screens
 
 router = Router()
 
 @router.message(CommandStart())
 async def cmd_start(message: Message):
     """Обработчик команды /start"""
+    welcome_text, markup = static_screens.get_or_render("start", _render_start)
+    
+    await message.answer(welcome_text, reply_markup=markup)
+
+def _render_start():
+    """Отрисовка приветствия и главного меню"""
     welcome_text = (
         "🎮 Добро пожаловать в игру 'Магнат'!\n\n"
         "📊 Вы начинаете с $1,000. Ваша цель - стать самым богатым магнатом.\n\n"
@@ -27,4 +34,4 @@ async def cmd_start(message: Message):
     builder.button(text="❓ Помощь", callback_data="help")
     builder.adjust(2, 2, 1)
     
-    await message.answer(welcome_text, reply_markup=builder.as_markup())
\ No newline at end of file
+    return welcome_text, builder.as_markup()
\ No newline at end of file
@@ -1,85 +1,165 @@
 from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.filters.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.orm import Session # type: ignore
 from database.database import db
-from services.stock_service import StockService
-from services.economy_service import EconomyService
+from services.stock_service import stock_quote_cache, symbol_trades
+from services.market_analytics import MarketStats, market_analytics
+from services.container import container
+from services.order_book import BUY, SELL
 from models.user import User
+from utils.coalesce import RequestCoalescer
+from utils.screen_cache import edit_screen, user_screens
+from typing import Optional
+import asyncio
 import datetime
 
 router = Router()
-stock_service = StockService()
+stock_service = container.stocks
+exchange_service = container.exchange
+
+# Повторные нажатия "🔄 Обновить" одного игрока ждут уже идущий расчет
+market_refreshes = RequestCoalescer()
 
 class StockTrade(StatesGroup):
     choosing_stock = State()
     choosing_action = State()
     entering_quantity = State()
 
-@router.callback_query(F.data == "stock_market")
+@router.callback_query(F.data == "stock_market", flags={"throttle": {"rate": 0.5, "burst": 3}})
 async def show_stock_market(callback: CallbackQuery):
     """Показать фондовый рынок"""
+    telegram_id = callback.from_user.id
+    
+    text, markup = await market_refreshes.run(
+        telegram_id,
+        lambda: asyncio.to_thread(_build_stock_market, telegram_id)
+    )
+    
+    # Если ничего не изменилось, не тратим запрос к Telegram
+    await edit_screen(callback.message, text, markup)
+    
+    await callback.answer()
+
+def _user_id(session: Session, telegram_id: int) -> Optional[int]:
+    """id игрока в БД по Telegram id: позиции и заявки хранятся по нему"""
+    row = session.query(User.id).filter(User.telegram_id == telegram_id).first()
+    return row[0] if row else None
+
+def _build_stock_market(telegram_id: int):
+    """Загрузка данных и отрисовка экрана рынка (выполняется в потоке)"""
     with db.get_session() as session:
-        # Инициализируем акции, если их нет
-        stock_service.init_stocks(session)
-        
+        # Акции сверяются с конфигом при запуске (main.py), здесь
+        # котировки берутся из кэша без запросов к БД
         stocks = stock_service.get_all_stocks(session)
-        user_stocks = stock_service.get_user_stocks(session, callback.from_user.id)
-        
-        text = "📊 ФОНДОВЫЙ РЫНОК\n\n"
-        text += "📈 Актуальные цены:\n\n"
-        
-        for stock in stocks[:10]:  # Показываем первые 10 акций
-            change_emoji = "➡️"
-            # В реальном проекте здесь было бы вычисление изменения цены
-            text += f"{stock.symbol}: ${stock.current_price:,.2f} {change_emoji}\n"
-        
-        if len(stocks) > 10:
-            text += f"\n... и еще {len(stocks) - 10} акций\n"
-        
-        if user_stocks:
-            text += "\n🏦 ВАШИ АКЦИИ:\n"
-            total_value = 0
-            
-            for user_stock in user_stocks[:5]:  # Показываем первые 5 позиций
-                stock = stock_service.get_stock_by_symbol(session, user_stock.stock.symbol)
-                if stock:
-                    value = stock.current_price * user_stock.quantity
-                    total_value += value
-                    
-                    # Расчет прибыли/убытка
-                    profit_loss = (stock.current_price - user_stock.average_price) * user_stock.quantity
-                    profit_percent = ((stock.current_price / user_stock.average_price) - 1) * 100
-                    
-                    pl_emoji = "📈" if profit_loss >= 0 else "📉"
-                    pl_sign = "+" if profit_loss >= 0 else ""
-                    
-                    text += f"{stock.symbol}: {user_stock.quantity} шт.\n"
-                    text += f"   Ср. цена: ${user_stock.average_price:,.2f}\n"
-                    text += f"   Тек. цена: ${stock.current_price:,.2f}\n"
-                    text += f"   {pl_emoji} {pl_sign}{profit_loss:,.2f} ({pl_sign}{profit_percent:.1f}%)\n"
-            
-            text += f"\n💰 Общая стоимость: ${total_value:,.2f}"
-        
-        # Создаем клавиатуру
-        builder = InlineKeyboardBuilder()
-        builder.button(text="📈 Купить акции", callback_data="buy_stock_menu")
-        builder.button(text="📉 Продать акции", callback_data="sell_stock_menu")
-        builder.button(text="📊 Статистика", callback_data="stock_stats")
-        builder.button(text="📈 История", callback_data="stock_history_menu")
-        builder.button(text="🔄 Обновить", callback_data="stock_market")
-        builder.button(text="🔙 Назад", callback_data="main_menu")
-        builder.adjust(2, 2, 1, 1)
-        
-        await callback.message.edit_text(
-            text,
-            reply_markup=builder.as_markup()
+        user_id = _user_id(session, telegram_id)
+        user_stocks = stock_service.get_user_stocks(session, user_id) if user_id else []
+        
+        # Экран зависит только от котировок, их изменения и позиций игрока
+        key = (
+            telegram_id,
+            "stock_market",
+            stock_quote_cache.version,
+            market_analytics.version,
+            tuple((us.stock_id, us.quantity, us.average_price) for us in user_stocks)
+        )
+        return user_screens.get_or_render(
+            key,
+            lambda: _render_stock_market(session, stocks, user_stocks)
         )
+
+def _render_stock_market(session: Session, stocks: list, user_stocks: list):
+    """Отрисовка экрана фондового рынка"""
+    text = "📊 ФОНДОВЫЙ РЫНОК\n\n"
+    text += "📈 Актуальные цены:\n\n"
+    
+    analytics = market_analytics.all()
+    for stock in stocks[:10]:  # Показываем первые 10 акций
+        text += f"{stock.symbol}: ${stock.current_price:,.2f} {_format_change(analytics.get(stock.symbol))}\n"
+    
+    if len(stocks) > 10:
+        text += f"\n... и еще {len(stocks) - 10} акций\n"
+    
+    if user_stocks:
+        text += "\n🏦 ВАШИ АКЦИИ:\n"
+        total_value = 0
+        
+        for user_stock in user_stocks[:5]:  # Показываем первые 5 позиций
+            stock = stock_service.get_stock_by_id(session, user_stock.stock_id)
+            if stock:
+                value = stock.current_price * user_stock.quantity
+                total_value += value
+                
+                # Расчет прибыли/убытка
+                profit_loss = (stock.current_price - user_stock.average_price) * user_stock.quantity
+                profit_percent = ((stock.current_price / user_stock.average_price) - 1) * 100
+                
+                pl_emoji = "📈" if profit_loss >= 0 else "📉"
+                pl_sign = "+" if profit_loss >= 0 else ""
+                
+                text += f"{stock.symbol}: {user_stock.quantity} шт.\n"
+                text += f"   Ср. цена: ${user_stock.average_price:,.2f}\n"
+                text += f"   Тек. цена: ${stock.current_price:,.2f}\n"
+                text += f"   {pl_emoji} {pl_sign}{profit_loss:,.2f} ({pl_sign}{profit_percent:.1f}%)\n"
+        
+        text += f"\n💰 Общая стоимость: ${total_value:,.2f}"
+    
+    # Создаем клавиатуру
+    builder = InlineKeyboardBuilder()
+    builder.button(text="📈 Купить акции", callback_data="buy_stock_menu")
+    builder.button(text="📉 Продать акции", callback_data="sell_stock_menu")
+    builder.button(text="📊 Статистика", callback_data="stock_stats")
+    builder.button(text="📈 История", callback_data="stock_history_menu")
+    builder.button(text="🚀 Лидеры движения", callback_data="top_movers")
+    builder.button(text="📋 Мои заявки", callback_data="my_orders")
+    builder.button(text="🔄 Обновить", callback_data="stock_market")
+    builder.button(text="🔙 Назад", callback_data="main_menu")
+    builder.adjust(2, 2, 2, 1, 1)
+    
+    return text, builder.as_markup()
+
+def _format_change(stats: Optional[MarketStats]) -> str:
+    """Изменение цены к предыдущему закрытию"""
+    if stats is None or not stats.change_pct:
+        return "➡️"
+    emoji = "📈" if stats.change_pct > 0 else "📉"
+    return f"{emoji} {stats.change_pct:+.2f}%"
+
+@router.callback_query(F.data == "top_movers", flags={"throttle": {"rate": 0.5, "burst": 3}})
+async def show_top_movers(callback: CallbackQuery):
+    """Акции с наибольшим изменением цены"""
+    text, markup = _render_top_movers()
+    
+    await edit_screen(callback.message, text, markup)
     
     await callback.answer()
 
+def _render_top_movers():
+    """Отрисовка лидеров движения (показатели уже посчитаны аналитикой)"""
+    movers = market_analytics.top_movers(10)
+    
+    text = "🚀 ЛИДЕРЫ ДВИЖЕНИЯ\n\n"
+    if not movers:
+        text += "С последнего обновления цен акции не изменились."
+    
+    for i, stats in enumerate(movers, 1):
+        text += f"{i}. {stats.symbol}: ${stats.price:,.2f} {_format_change(stats)}\n"
+        details = [f"закрытие ${stats.previous_close:,.2f}"]
+        if stats.volatility is not None:
+            details.append(f"волатильность {stats.volatility:.2f}%")
+        details.append(f"объем за сутки {stats.volume:,}")
+        text += f"   {', '.join(details)}\n"
+    
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🔄 Обновить", callback_data="top_movers")
+    builder.button(text="🔙 Назад", callback_data="stock_market")
+    builder.adjust(2)
+    
+    return text, builder.as_markup()
+
 @router.callback_query(F.data == "buy_stock_menu")
 async def show_buy_stock_menu(callback: CallbackQuery, state: FSMContext):
     """Меню покупки акций"""
@@ -118,7 +198,7 @@ async def choose_stock_to_buy(callback: CallbackQuery, state: FSMContext):
     """Выбор акции для покупки"""
     stock_symbol = callback.data.replace("buy_stock_", "")
     
-    await state.update_data(stock_symbol=stock_symbol)
+    await state.update_data(stock_symbol=stock_symbol, side=BUY)
     await state.set_state(StockTrade.entering_quantity)
     
     with db.get_session() as session:
@@ -159,18 +239,19 @@ async def choose_stock_to_buy(callback: CallbackQuery, state: FSMContext):
     
     await callback.answer()
 
-@router.callback_query(F.data.startswith("quick_buy_"))
+@router.callback_query(F.data.startswith("quick_buy_"), flags={"user_queue": True})
 async def quick_buy_stocks(callback: CallbackQuery, state: FSMContext):
     """Быстрая покупка акций"""
     data = callback.data.replace("quick_buy_", "")
     quantity_str, stock_symbol = data.split("_", 1)
     quantity = int(quantity_str)
     
+    # Сделки по одной акции выполняются по очереди
+    success, message = await _trade(
+        stock_symbol, _buy_stocks, callback.from_user.id, stock_symbol, quantity
+    )
+    
     with db.get_session() as session:
-        success, message = stock_service.buy_stocks(
-            session, callback.from_user.id, stock_symbol, quantity
-        )
-        
         if success:
             stock = stock_service.get_stock_by_symbol(session, stock_symbol)
             user = session.query(User).filter(
@@ -210,7 +291,36 @@ async def quick_buy_stocks(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.answer()
 
-@router.message(StockTrade.entering_quantity)
+async def _trade(stock_symbol: str, func, *args) -> tuple[bool, str]:
+    """Сделка в очереди акции (покупки и продажи одной акции - по очереди)"""
+    try:
+        return await symbol_trades.run(stock_symbol, func, *args)
+    except LookupError:
+        return False, "Акция не найдена"
+
+def _buy_stocks(telegram_id: int, stock_symbol: str, quantity: int) -> tuple[bool, str]:
+    """Покупка акций в отдельной сессии (выполняется в очереди акции)"""
+    with db.get_session() as session:
+        user_id = _user_id(session, telegram_id)
+        if not user_id:
+            return False, "Пользователь не найден"
+        return stock_service.buy_stocks(session, user_id, stock_symbol, quantity)
+
+def _sell_stocks(telegram_id: int, stock_symbol: str, quantity: Optional[int], fraction: float = 1.0) -> tuple[bool, str]:
+    """Продажа акций в отдельной сессии (выполняется в очереди акции)
+
+    Без quantity продается доля fraction позиции на момент сделки.
+    """
+    with db.get_session() as session:
+        user_id = _user_id(session, telegram_id)
+        if not user_id:
+            return False, "Пользователь не найден"
+        if quantity is None:
+            user_stock = stock_service.get_user_stock(session, user_id, stock_symbol)
+            quantity = max(1, int(user_stock.quantity * fraction)) if user_stock else 0
+        return stock_service.sell_stocks(session, user_id, stock_symbol, quantity)
+
+@router.message(StockTrade.entering_quantity, flags={"user_queue": True})
 async def process_quantity_input(message: Message, state: FSMContext):
     """Обработка ввода количества акций"""
     try:
@@ -228,27 +338,34 @@ async def process_quantity_input(message: Message, state: FSMContext):
             await state.clear()
             return
         
-        with db.get_session() as session:
-            success, msg = stock_service.buy_stocks(
-                session, message.from_user.id, stock_symbol, quantity
+        if data.get('side') == SELL:
+            success, msg = await _trade(
+                stock_symbol, _sell_stocks, message.from_user.id, stock_symbol, quantity
             )
+        else:
+            success, msg = await _trade(
+                stock_symbol, _buy_stocks, message.from_user.id, stock_symbol, quantity
+            )
+        
+        if success:
+            await message.answer(msg)
             
-            if success:
-                await message.answer(msg)
-                
-                # Показываем меню
-                builder = InlineKeyboardBuilder()
-                builder.button(text="📈 Купить еще", callback_data="buy_stock_menu")
-                builder.button(text="📊 Рынок", callback_data="stock_market")
-                builder.button(text="🔙 В меню", callback_data="main_menu")
-                builder.adjust(2, 1)
-                
-                await message.answer(
-                    "Что хотите сделать дальше?",
-                    reply_markup=builder.as_markup()
-                )
+            # Показываем меню
+            builder = InlineKeyboardBuilder()
+            if data.get('side') == SELL:
+                builder.button(text="📉 Продать еще", callback_data="sell_stock_menu")
             else:
-                await message.answer(f"❌ {msg}")
+                builder.button(text="📈 Купить еще", callback_data="buy_stock_menu")
+            builder.button(text="📊 Рынок", callback_data="stock_market")
+            builder.button(text="🔙 В меню", callback_data="main_menu")
+            builder.adjust(2, 1)
+            
+            await message.answer(
+                "Что хотите сделать дальше?",
+                reply_markup=builder.as_markup()
+            )
+        else:
+            await message.answer(f"❌ {msg}")
     
     except ValueError:
         await message.answer("Пожалуйста, введите число")
@@ -259,7 +376,8 @@ async def process_quantity_input(message: Message, state: FSMContext):
 async def show_sell_stock_menu(callback: CallbackQuery):
     """Меню продажи акций"""
     with db.get_session() as session:
-        user_stocks = stock_service.get_user_stocks(session, callback.from_user.id)
+        user_id = _user_id(session, callback.from_user.id)
+        user_stocks = stock_service.get_user_stocks(session, user_id) if user_id else []
         
         if not user_stocks:
             await callback.answer("У вас нет акций для продажи", show_alert=True)
@@ -271,7 +389,9 @@ async def show_sell_stock_menu(callback: CallbackQuery):
         builder = InlineKeyboardBuilder()
         
         for user_stock in user_stocks[:10]:  # Ограничиваем 10 позициями
-            stock = user_stock.stock
+            stock = stock_service.get_stock_by_id(session, user_stock.stock_id)
+            if not stock:
+                continue
             total_value = stock.current_price * user_stock.quantity
             
             btn_text = f"{stock.symbol} - {user_stock.quantity} шт. (${total_value:,.0f})"
@@ -293,7 +413,8 @@ async def choose_stock_to_sell(callback: CallbackQuery, state: FSMContext):
     stock_symbol = callback.data.replace("sell_stock_", "")
     
     with db.get_session() as session:
-        user_stock = stock_service.get_user_stock(session, callback.from_user.id, stock_symbol)
+        user_id = _user_id(session, callback.from_user.id)
+        user_stock = stock_service.get_user_stock(session, user_id, stock_symbol) if user_id else None
         
         if not user_stock:
             await callback.answer("У вас нет таких акций")
@@ -332,7 +453,7 @@ async def choose_stock_to_sell(callback: CallbackQuery, state: FSMContext):
         builder.button(text="🔙 Назад", callback_data="sell_stock_menu")
         builder.adjust(2, 1)
         
-        await state.update_data(stock_symbol=stock_symbol)
+        await state.update_data(stock_symbol=stock_symbol, side=SELL)
         await state.set_state(StockTrade.entering_quantity)
         
         await callback.message.edit_text(
@@ -340,4 +461,161 @@ async def choose_stock_to_sell(callback: CallbackQuery, state: FSMContext):
             reply_markup=builder.as_markup()
         )
     
-    await callback.answer()
\ No newline at end of file
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("sell_all_") | F.data.startswith("sell_half_"), flags={"user_queue": True})
+async def quick_sell_stocks(callback: CallbackQuery, state: FSMContext):
+    """Быстрая продажа всех акций или половины"""
+    _, share, stock_symbol = callback.data.split("_", 2)
+    fraction = 0.5 if share == "half" else 1.0
+    
+    # Продажи идут через ту же очередь акции, что и покупки
+    success, message = await _trade(
+        stock_symbol, _sell_stocks, callback.from_user.id, stock_symbol, None, fraction
+    )
+    
+    if success:
+        builder = InlineKeyboardBuilder()
+        builder.button(text="📉 Продать еще", callback_data="sell_stock_menu")
+        builder.button(text="📊 Рынок", callback_data="stock_market")
+        builder.button(text="🔙 В меню", callback_data="main_menu")
+        builder.adjust(2, 1)
+        
+        await callback.message.edit_text(
+            message,
+            reply_markup=builder.as_markup()
+        )
+    else:
+        await callback.answer(message, show_alert=True)
+    
+    await state.clear()
+    await callback.answer()
+
+ORDER_USAGE = (
+    "📋 ЗАЯВКИ НА БИРЖЕ\n\n"
+    "Лимитная заявка: /order buy MAGN 10 95.5\n"
+    "Рыночная заявка: /order sell MAGN 10\n\n"
+    "Заявки исполняются против заявок других игроков "
+    "по приоритету цена-время. Деньги или акции резервируются "
+    "сразу, расчет по сделкам проходит в течение нескольких секунд."
+)
+
+@router.message(Command("order"), flags={"user_queue": True})
+async def cmd_order(message: Message, command: CommandObject):
+    """Выставление заявки в стакан"""
+    args = (command.args or "").split()
+    
+    if len(args) not in (3, 4) or args[0].lower() not in (BUY, SELL):
+        await message.answer(ORDER_USAGE)
+        return
+    
+    side = args[0].lower()
+    symbol = args[1].upper()
+    
+    try:
+        quantity = int(args[2])
+        price = float(args[3]) if len(args) == 4 else None
+    except ValueError:
+        await message.answer("Количество должно быть целым числом, а цена - числом")
+        return
+    
+    # Резерв пишется в БД в пуле потоков, в стакан заявка ставится в цикле
+    success, msg, order = await container.jobs.run_blocking(
+        _place_order, message.from_user.id, symbol, side, quantity, price
+    )
+    if success:
+        msg, _ = exchange_service.submit_order(order)
+    
+    await message.answer(msg if success else f"❌ {msg}")
+
+def _place_order(telegram_id: int, symbol: str, side: str, quantity: int, price: Optional[float]):
+    """Резервирование заявки в отдельной сессии (выполняется в пуле потоков)"""
+    with db.get_session() as session:
+        user_id = _user_id(session, telegram_id)
+        if not user_id:
+            return False, "Пользователь не найден", None
+        return exchange_service.place_order(session, user_id, symbol, side, quantity, price)
+
+@router.message(Command("orders"))
+async def cmd_orders(message: Message):
+    """Список открытых заявок"""
+    text, markup = _render_orders(message.from_user.id)
+    await message.answer(text, reply_markup=markup)
+
+@router.callback_query(F.data == "my_orders")
+async def show_my_orders(callback: CallbackQuery):
+    """Список открытых заявок (из меню биржи)"""
+    text, markup = _render_orders(callback.from_user.id)
+    await edit_screen(callback.message, text, markup)
+    await callback.answer()
+
+def _render_orders(telegram_id: int):
+    """Отрисовка открытых заявок игрока"""
+    with db.get_session() as session:
+        user = session.query(User).filter(User.telegram_id == telegram_id).first()
+        orders = exchange_service.engine.user_orders(user.id) if user else []
+    
+    builder = InlineKeyboardBuilder()
+    
+    if orders:
+        text = "📋 ВАШИ ЗАЯВКИ\n\n"
+        for order in orders[:10]:
+            side = "Покупка" if order.side == BUY else "Продажа"
+            text += (
+                f"#{order.id} {side} {order.symbol}: "
+                f"{order.remaining}/{order.quantity} шт. по ${order.price:,.2f}\n"
+            )
+            builder.button(text=f"❌ Снять #{order.id}", callback_data=f"cancel_order_{order.id}")
+    else:
+        text = ORDER_USAGE
+    
+    builder.button(text="🔙 Назад", callback_data="stock_market")
+    builder.adjust(2)
+    
+    return text, builder.as_markup()
+
+@router.callback_query(F.data.startswith("cancel_order_"), flags={"user_queue": True})
+async def cancel_order(callback: CallbackQuery):
+    """Снятие заявки"""
+    order_id = int(callback.data.replace("cancel_order_", ""))
+    
+    with db.get_session() as session:
+        user = session.query(User).filter(
+            User.telegram_id == callback.from_user.id
+        ).first()
+        
+        if not user:
+            await callback.answer("Пользователь не найден")
+            return
+    
+    success, msg = exchange_service.cancel_order(user.id, order_id)
+    await callback.answer(msg, show_alert=not success)
+    
+    if success:
+        text, markup = _render_orders(callback.from_user.id)
+        await edit_screen(callback.message, text, markup)
+
+@router.message(Command("book"))
+async def cmd_book(message: Message, command: CommandObject):
+    """Стакан заявок по акции"""
+    symbol = (command.args or "").strip().upper()
+    
+    if not symbol:
+        await message.answer("Укажите акцию, например: /book MAGN")
+        return
+    
+    with db.get_session() as session:
+        if not stock_service.get_stock_by_symbol(session, symbol):
+            await message.answer("Акция не найдена")
+            return
+    
+    depth = exchange_service.engine.book(symbol).depth()
+    
+    text = f"📒 СТАКАН: {symbol}\n\n📉 Продажа:\n"
+    for price, volume in reversed(depth[SELL]):
+        text += f"   ${price:,.2f} × {volume}\n"
+    text += "\n📈 Покупка:\n"
+    for price, volume in depth[BUY]:
+        text += f"   ${price:,.2f} × {volume}\n"
+    
+    await message.answer(text)
@@ -1,4 +1,10 @@
+import time
+
+# Отсчет времени запуска начинается до импортов
+_process_started = time.perf_counter()
+
 import asyncio
+import contextlib
 import logging
 import sys
 from pathlib import Path
@@ -24,14 +30,14 @@ if not BOT_TOKEN:
     print("Добавьте BOT_TOKEN в переменные окружения или в файл .env")
     sys.exit(1)
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("logs/bot.log", encoding="utf-8")
-    ]
+# Настройка логирования: запись на диск идет в фоновом потоке
+from utils.logging_setup import setup_logging
+log_listener = setup_logging(
+    level=config.LOG_LEVEL,
+    log_file=config.LOG_FILE,
+    max_bytes=config.LOG_MAX_BYTES,
+    backup_count=config.LOG_BACKUP_COUNT,
+    sampling=config.LOG_SAMPLING
 )
 logger = logging.getLogger(__name__)
 
@@ -45,20 +51,40 @@ async def set_bot_commands(bot: Bot):
         BotCommand(command="/players", description="🤝 Игроки"),
         BotCommand(command="/help", description="❓ Помощь"),
     ]
-    await bot.set_my_commands(commands)
+    try:
+        await bot.set_my_commands(commands)
+    except Exception as e:
+        logger.error(f"❌ Ошибка установки команд бота: {e}")
 
 async def main():
     """Основная функция запуска бота"""
+    from utils.startup_timer import StartupTimer
+    startup = StartupTimer(config.STARTUP_BUDGET, started=_process_started)
+    startup.record("imports & config", time.perf_counter() - _process_started)
     
     # Создаем необходимые директории
     Path("data").mkdir(exist_ok=True)
     Path("logs").mkdir(exist_ok=True)
     Path("configs").mkdir(exist_ok=True)
     
+    # Игровые конфиги: без корректных конфигов бот не запускается
+    try:
+        with startup.phase("game configs"):
+            from configs.registry import config_registry
+            snapshot = config_registry.load()
+        logger.info(f"✅ Конфиги загружены (версия {snapshot.version})")
+    except Exception as e:
+        logger.error(f"❌ Ошибка загрузки конфигов: {e}")
+        return
+    
     # Инициализация базы данных
     try:
-        from database.database import db
-        db.init_db()
+        with startup.phase("database"):
+            from database.database import db
+            db.init_db()
+            # События для достижений собираются хуками сессий
+            from services.achievement_service import achievement_engine
+            achievement_engine.install(db.SessionLocal)
         logger.info("✅ База данных инициализирована")
     except Exception as e:
         logger.error(f"❌ Ошибка инициализации БД: {e}")
@@ -68,32 +94,73 @@ async def main():
     bot = Bot(token=BOT_TOKEN)
     dp = Dispatcher(storage=MemoryStorage())
     
+    # Общие сервисы: хендлеры получают их аргументом services, планировщик - в конструкторе
+    from services.container import container
+    container.bind_bot(bot)
+    dp["services"] = container
+    
+    def apply_config_reload(snapshot):
+        """Применение новой версии конфигов без перезапуска"""
+        from utils.screen_cache import static_screens
+        static_screens.invalidate()
+        with db.get_session() as session:
+            result = container.stocks.sync_stocks(session)
+        logger.info(
+            f"✅ Конфиги версии {snapshot.version} применены "
+            f"(акций добавлено: {result['added']}, обновлено: {result['updated']})"
+        )
+    
+    config_registry.subscribe(apply_config_reload)
+    config_registry.start_watching()
+    
+    # Монитор задержки цикла событий
+    from utils.loop_monitor import loop_monitor
+    loop_monitor.start()
+    
     # Регистрация обработчиков
     try:
-        from handlers import register_handlers
-        register_handlers(dp)
+        with startup.phase("handlers"):
+            from middlewares import register_middlewares
+            from handlers import register_handlers
+            register_middlewares(dp)
+            register_handlers(dp)
         logger.info("✅ Обработчики зарегистрированы")
     except Exception as e:
         logger.error(f"❌ Ошибка регистрации обработчиков: {e}")
     
-    # Установка команд бота
-    await set_bot_commands(bot)
+    # Установка команд бота - сетевой запрос, запуск его не ждет
+    commands_task = asyncio.create_task(set_bot_commands(bot))
     
     # Инициализация акций
     try:
-        from services.stock_service import StockService
-        with db.get_session() as session:
-            stock_service = StockService()
-            stock_service.init_stocks(session)
-            logger.info("✅ Акции инициализированы")
+        with startup.phase("stocks"), db.get_session() as session:
+            result = container.stocks.sync_stocks(session)
+            logger.info(
+                f"✅ Акции инициализированы "
+                f"(добавлено: {result['added']}, обновлено: {result['updated']})"
+            )
+            
+            # Предыдущее закрытие до первого обновления цен - текущая цена
+            from services.market_analytics import market_analytics
+            market_analytics.seed(
+                (q.symbol, q.current_price) for q in container.stocks.get_all_stocks(session)
+            )
+            
+            restored = container.exchange.load_open_orders(session)
+            logger.info(f"✅ Открытых заявок в стакане: {restored}")
+            offers = container.job_market.load_open_offers(session)
+            logger.info(f"✅ Открытых предложений работы: {offers}")
     except Exception as e:
         logger.error(f"❌ Ошибка инициализации акций: {e}")
     
     # Запуск планировщика
     try:
-        from services.scheduler_service import SchedulerService
-        scheduler = SchedulerService(bot)
-        scheduler.start()
+        with startup.phase("scheduler"):
+            from services.scheduler_service import SchedulerService
+            scheduler = SchedulerService(bot, container)
+            scheduler.start()
+            # Отправители уведомлений работают в фоне до остановки бота
+            container.notifications.start()
         logger.info("✅ Планировщик задач запущен")
     except Exception as e:
         logger.error(f"❌ Ошибка запуска планировщика: {e}")
@@ -101,6 +168,7 @@ async def main():
     # Запуск бота
     logger.info("🚀 Бот запущен и готов к работе!")
     logger.info(f"🤖 ID администраторов: {config.ADMIN_IDS}")
+    startup.report()
     
     try:
         await dp.start_polling(bot)
@@ -109,6 +177,19 @@ async def main():
     except Exception as e:
         logger.error(f"❌ Критическая ошибка: {e}")
     finally:
+        loop_monitor.stop()
+        config_registry.stop_watching()
+        if container.channel.ready:
+            # Накопленные события канала - последним постом
+            await container.channel.flush()
+            await container.channel.publish_digest()
+        if container.notifications.ready:
+            await container.notifications.stop()
+        # Команды могли еще не установиться - запрос не переживет закрытие сессии
+        if not commands_task.done():
+            commands_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await commands_task
         await bot.session.close()
         logger.info("👋 Бот завершил работу")
 
@@ -119,4 +200,8 @@ if __name__ == "__main__":
         sys.exit(1)
     
     # Запускаем бота
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        # Дописываем записи, оставшиеся в очереди лога
+        log_listener.stop()
\ No newline at end of file
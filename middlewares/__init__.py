@@ -0,0 +1,19 @@
+from aiogram import Dispatcher
+from config import config
+from .throttling import ThrottlingMiddleware, create_bucket_storage
+from .user_queue import UserQueueMiddleware, user_command_queue
+from .activity import ActivityMiddleware
+from utils.loop_monitor import loop_monitor
+
+def register_middlewares(dp: Dispatcher):
+    """Регистрация всех middleware"""
+    throttling = ThrottlingMiddleware(create_bucket_storage(config.REDIS_URL))
+    
+    # Внутренние middleware диспетчера действуют на хендлеры всех роутеров.
+    # Ограничение частоты идет первым, чтобы лишние запросы не попадали в очередь
+    dp.callback_query.middleware(throttling)
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(UserQueueMiddleware(user_command_queue))
+    dp.message.middleware(UserQueueMiddleware(user_command_queue))
+    dp.callback_query.middleware(ActivityMiddleware(loop_monitor))
+    dp.message.middleware(ActivityMiddleware(loop_monitor))
@@ -0,0 +1,28 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from utils.loop_monitor import LoopMonitor
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """Отметка выполняемого хендлера для монитора цикла событий
+
+    Регистрируется последней, чтобы метка ставилась в той задаче, где
+    хендлер действительно выполняется (в том числе в обработчике очереди
+    игрока).
+    """
+
+    def __init__(self, monitor: LoopMonitor):
+        self.monitor = monitor
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", type(event).__name__)
+
+        with self.monitor.track(f"handler:{name}"):
+            return await handler(event, data)
@@ -0,0 +1,173 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject
+
+logger = logging.getLogger(__name__)
+
+# Общий лимит на игрока: 3 события в секунду, всплеск до 10
+DEFAULT_RATE = 3.0
+DEFAULT_BURST = 10
+
+
+class MemoryBucketStorage:
+    """Token bucket в памяти процесса
+
+    Каждое ведро - список [токены, время последнего обновления]. Ведра,
+    которыми не пользовались дольше ttl, удаляются: к этому моменту они
+    все равно полностью заполнены, поэтому удаление ничего не меняет.
+    """
+
+    def __init__(self, ttl: float = 600.0):
+        self.ttl = ttl
+        self._buckets: Dict[Hashable, list] = {}
+        self._next_sweep = time.monotonic() + ttl
+
+    async def consume(self, key: Hashable, rate: float, burst: int, cost: float = 1.0) -> bool:
+        now = time.monotonic()
+
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(burst), now]
+        else:
+            bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] < cost:
+            return False
+
+        bucket[0] -= cost
+        return True
+
+    def _sweep(self, now: float):
+        expired = [key for key, (_, ts) in self._buckets.items() if now - ts > self.ttl]
+        for key in expired:
+            del self._buckets[key]
+        self._next_sweep = now + self.ttl
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RedisBucketStorage:
+    """Token bucket в Redis для нескольких процессов бота
+
+    Требует пакет redis (redis.asyncio). Пополнение и списание токенов
+    выполняются атомарно одним Lua-скриптом.
+    """
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local ttl = tonumber(ARGV[5])
+    local tokens = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - ts) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], ttl)
+    return allowed
+    """
+
+    def __init__(self, url: str, ttl: int = 600, prefix: str = "throttle"):
+        from redis.asyncio import Redis  # необязательная зависимость
+
+        self.redis = Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._script = self.redis.register_script(self.SCRIPT)
+
+    async def consume(self, key: Hashable, rate: float, burst: int, cost: float = 1.0) -> bool:
+        redis_key = f"{self.prefix}:" + ":".join(str(part) for part in key)
+        allowed = await self._script(
+            keys=[redis_key],
+            args=[rate, burst, cost, time.time(), self.ttl]
+        )
+        return bool(allowed)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты запросов игрока
+
+    Проверяются два ведра: общее ведро игрока и ведро конкретного
+    хендлера, если у него есть флаг throttle, например
+    flags={"throttle": {"rate": 0.5, "burst": 2}}.
+
+    Если хранилище недоступно (например, упал Redis), апдейты
+    пропускаются без ограничения, а не ломают хендлеры.
+    """
+
+    def __init__(self, storage, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        self.storage = storage
+        self.rate = rate
+        self.burst = burst
+        self._storage_down = False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        if not await self._consume(("u", user.id), self.rate, self.burst):
+            return await self._reject(event)
+
+        limit: Optional[dict] = get_flag(data, "throttle")
+        if limit:
+            handler_name = data["handler"].callback.__name__
+            allowed = await self._consume(
+                ("h", user.id, handler_name),
+                limit.get("rate", self.rate),
+                limit.get("burst", self.burst)
+            )
+            if not allowed:
+                return await self._reject(event)
+
+        return await handler(event, data)
+
+    async def _consume(self, key: Hashable, rate: float, burst: int) -> bool:
+        try:
+            allowed = await self.storage.consume(key, rate, burst)
+        except Exception as e:
+            # Пишем в лог один раз за сбой, а не на каждый апдейт
+            if not self._storage_down:
+                self._storage_down = True
+                logger.warning(f"Throttle storage unavailable, updates are not limited: {e}")
+            return True
+
+        if self._storage_down:
+            self._storage_down = False
+            logger.info("Throttle storage is available again")
+        return allowed
+
+    @staticmethod
+    async def _reject(event: TelegramObject):
+        if isinstance(event, CallbackQuery):
+            await event.answer("🐢 Слишком часто! Подождите пару секунд")
+        return None
+
+
+def create_bucket_storage(redis_url: str = ""):
+    """Создание хранилища: Redis, если указан адрес, иначе память"""
+    if redis_url:
+        try:
+            return RedisBucketStorage(redis_url)
+        except ImportError:
+            logger.warning("Пакет redis не установлен, лимиты запросов хранятся в памяти")
+    return MemoryBucketStorage()
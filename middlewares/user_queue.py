@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject
+
+
+class UserCommandQueue:
+    """Очереди команд игроков
+
+    Команды одного игрока выполняются строго по очереди одним
+    обработчиком, команды разных игроков - параллельно. Обработчик
+    игрока завершается после простоя и создается заново при следующей
+    команде.
+    """
+
+    def __init__(self, maxsize: int = 5, dedup_window: float = 2.0, idle_timeout: float = 60.0):
+        self.maxsize = maxsize
+        self.dedup_window = dedup_window
+        self.idle_timeout = idle_timeout
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._recent: Dict[int, Dict[Hashable, float]] = {}
+
+    def is_duplicate(self, user_id: int, key: Hashable) -> bool:
+        """Проверка повторной команды в окне дедупликации"""
+        now = time.monotonic()
+        recent = self._recent.setdefault(user_id, {})
+
+        # Чистим устаревшие записи игрока
+        for old_key in [k for k, ts in recent.items() if now - ts >= self.dedup_window]:
+            del recent[old_key]
+
+        if key in recent:
+            return True
+
+        recent[key] = now
+        return False
+
+    async def run(self, user_id: int, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнение команды в очереди игрока
+
+        Если очередь переполнена, выбрасывает asyncio.QueueFull.
+        """
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = asyncio.Queue(maxsize=self.maxsize)
+
+        worker = self._workers.get(user_id)
+        if worker is None or worker.done():
+            self._workers[user_id] = asyncio.create_task(self._worker(user_id, queue))
+
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((call, future))
+        return await future
+
+    async def _worker(self, user_id: int, queue: asyncio.Queue):
+        while True:
+            try:
+                call, future = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                # Простаивающий обработчик освобождает память
+                if queue.empty():
+                    self._queues.pop(user_id, None)
+                    self._workers.pop(user_id, None)
+                    self._recent.pop(user_id, None)
+                    return
+                continue
+
+            try:
+                result = await call()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                queue.task_done()
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+
+class UserQueueMiddleware(BaseMiddleware):
+    """Последовательное выполнение изменяющих команд игрока
+
+    Применяется к хендлерам с флагом user_queue. Повтор того же
+    callback_data в окне дедупликации (двойное нажатие) отбрасывается.
+    """
+
+    def __init__(self, queue: UserCommandQueue):
+        self.queue = queue
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or not get_flag(data, "user_queue"):
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery) and self.queue.is_duplicate(user.id, event.data):
+            await event.answer()
+            return None
+
+        try:
+            return await self.queue.run(user.id, lambda: handler(event, data))
+        except asyncio.QueueFull:
+            if isinstance(event, CallbackQuery):
+                await event.answer("⏳ Слишком много запросов, подождите немного")
+            return None
+
+
+# Общая очередь команд игроков
+user_command_queue = UserCommandQueue()
@@ -0,0 +1 @@
+from database.models import Stock, UserStock, StockOrder
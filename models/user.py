@@ -0,0 +1 @@
+from database.models import User, UserBusiness
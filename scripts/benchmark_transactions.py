@@ -0,0 +1,79 @@
+"""Сравнение записи транзакций через ORM и через TransactionWriter
+
+Запуск из корня проекта:
+    python scripts/benchmark_transactions.py [строк] [путь к файлу БД]
+
+По умолчанию пишется 10000 строк во временную SQLite-базу.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func # type: ignore
+from sqlalchemy.orm import sessionmaker # type: ignore
+from database.models import Base, Transaction, User
+from services.transaction_writer import TransactionWriter
+
+
+def _details(i: int) -> dict:
+    return {'prize': 'Бенчмарк', 'index': i, 'source': 'benchmark'}
+
+
+def orm_path(session, user_id: int, rows: int):
+    for i in range(rows):
+        session.add(Transaction(
+            user_id=user_id,
+            transaction_type='benchmark',
+            amount=float(i),
+            details=_details(i)
+        ))
+    session.commit()
+
+
+def writer_path(session, user_id: int, rows: int):
+    with TransactionWriter(session, publish=False) as writer:
+        for i in range(rows):
+            writer.add(user_id, 'benchmark', float(i), _details(i))
+    session.commit()
+
+
+def measure(name: str, path, session_factory, user_id: int, rows: int) -> float:
+    with session_factory() as session:
+        started = time.perf_counter()
+        path(session, user_id, rows)
+        elapsed = time.perf_counter() - started
+        count = session.query(func.count(Transaction.id)).filter(
+            Transaction.transaction_type == 'benchmark'
+        ).scalar()
+        session.query(Transaction).filter(Transaction.transaction_type == 'benchmark').delete()
+        session.commit()
+
+    print(f"{name:<20} {elapsed:8.3f} с  {rows / elapsed:10,.0f} строк/с  (записано {count})")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.mkdtemp(), "benchmark.db")
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    with session_factory() as session:
+        user = User(telegram_id=0, username='benchmark')
+        session.add(user)
+        session.commit()
+        user_id = user.id
+
+    print(f"Строк: {rows}, БД: {path}\n")
+    orm = measure("ORM (unit of work)", orm_path, session_factory, user_id, rows)
+    bulk = measure("TransactionWriter", writer_path, session_factory, user_id, rows)
+    print(f"\nУскорение: x{orm / bulk:.1f}")
+
+
+if __name__ == "__main__":
+    main()
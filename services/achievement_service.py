@@ -0,0 +1,286 @@
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from sqlalchemy import bindparam, event, insert, inspect, select, update # type: ignore
+from sqlalchemy.orm import Session, sessionmaker # type: ignore
+from models.achievement import Achievement
+from models.transaction import Transaction
+from models.user import User
+from configs.registry import AchievementConfig, ConfigSnapshot, config_registry
+
+# Событие изменения баланса (для правил по порогу баланса)
+BALANCE = 'balance'
+
+# Ключ в session.info для событий, ожидающих commit
+_PENDING_KEY = 'achievement_events'
+
+
+@dataclass(frozen=True)
+class AchievementEvent:
+    """Событие игрока, на которое могут реагировать достижения"""
+    user_id: int
+    event_type: str  # Тип транзакции или BALANCE
+    value: Optional[float] = None  # Сумма транзакции или новый баланс (None - неизвестен)
+
+
+@dataclass(frozen=True)
+class EventRule:
+    """Достижение за первое событие указанного типа"""
+    achievement_id: str
+    event_types: Tuple[str, ...]
+
+    def check(self, event: AchievementEvent) -> Optional[bool]:
+        return True
+
+
+@dataclass(frozen=True)
+class BalanceRule:
+    """Достижение за баланс не ниже порога"""
+    achievement_id: str
+    threshold: float
+    event_types: Tuple[str, ...] = (BALANCE,)
+
+    def check(self, event: AchievementEvent) -> Optional[bool]:
+        # None - баланс в событии неизвестен, его нужно взять из БД
+        if event.value is None:
+            return None
+        return event.value >= self.threshold
+
+    def check_balance(self, balance: float) -> bool:
+        return balance >= self.threshold
+
+
+Rule = Union[EventRule, BalanceRule]
+
+# Правила достижений из configs/bonuses.json. Достижение без правила
+# не выдается, правило без достижения в конфиге не действует
+RULES: Tuple[Rule, ...] = (
+    EventRule('first_business', ('buy_business',)),
+    EventRule('stock_investor', ('buy_stock',)),
+    BalanceRule('millionaire', 1_000_000),
+)
+
+
+@dataclass(frozen=True)
+class Award:
+    """Выданное достижение (для уведомлений после commit)"""
+    user_id: int
+    telegram_id: int
+    username: str
+    achievement: AchievementConfig
+
+
+class AchievementEngine:
+    """Инкрементальная выдача достижений
+
+    Движок не перебирает игроков. События (новые транзакции и изменения
+    баланса) собираются хуками сессии SQLAlchemy и после commit попадают
+    в очередь. Планировщик забирает очередь пачкой, и для каждого события
+    проверяются только правила из индекса "тип события -> правила".
+    Выдача, награды и транзакции всей пачки проводятся одной транзакцией.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = RULES):
+        self.rules = tuple(rules)
+        self._events: List[AchievementEvent] = []
+        self._lock = threading.Lock()
+        self._index_version: Optional[int] = None
+        self._index: Dict[str, List[Rule]] = {}
+
+    # ====================
+    # СБОР СОБЫТИЙ
+    # ====================
+
+    def install(self, session_factory: sessionmaker):
+        """Подключение хуков к сессиям бота"""
+        event.listen(session_factory, 'after_flush', self._after_flush)
+        event.listen(session_factory, 'after_commit', self._after_commit)
+        event.listen(session_factory, 'after_rollback', self._after_rollback)
+
+    def record(self, session: Session, events: Iterable[AchievementEvent]):
+        """События, записанные в обход ORM (пакетные insert/update)
+
+        Попадут в очередь только после успешного commit сессии.
+        """
+        session.info.setdefault(_PENDING_KEY, []).extend(events)
+
+    def _after_flush(self, session: Session, flush_context):
+        events = []
+        for obj in session.new:
+            if isinstance(obj, Transaction) and obj.user_id is not None:
+                events.append(AchievementEvent(obj.user_id, obj.transaction_type, obj.amount))
+
+        for obj in session.dirty:
+            if isinstance(obj, User):
+                history = inspect(obj).attrs.balance.history
+                if history.added:
+                    events.append(AchievementEvent(obj.id, BALANCE, history.added[0]))
+
+        if events:
+            self.record(session, events)
+
+    def _after_commit(self, session: Session):
+        events = session.info.pop(_PENDING_KEY, None)
+        if events:
+            with self._lock:
+                self._events.extend(events)
+
+    def _after_rollback(self, session: Session):
+        session.info.pop(_PENDING_KEY, None)
+
+    def has_pending(self) -> bool:
+        return bool(self._events)
+
+    def drain(self) -> List[AchievementEvent]:
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+    def requeue(self, events: List[AchievementEvent]):
+        with self._lock:
+            self._events[:0] = events
+
+    # ====================
+    # ВЫДАЧА
+    # ====================
+
+    def _rules_for(self, snapshot: ConfigSnapshot) -> Dict[str, List[Rule]]:
+        """Индекс "тип события -> правила" для текущей версии конфигов"""
+        if self._index_version != snapshot.version:
+            configured = {a.id for a in snapshot.bonuses.achievements}
+            index: Dict[str, List[Rule]] = defaultdict(list)
+            for rule in self.rules:
+                if rule.achievement_id in configured:
+                    for event_type in rule.event_types:
+                        index[event_type].append(rule)
+            self._index = dict(index)
+            self._index_version = snapshot.version
+        return self._index
+
+    def process(self, session: Session, events: List[AchievementEvent]) -> List[Award]:
+        """Проверка пачки событий и выдача достижений одной транзакцией"""
+        snapshot = config_registry.current
+        index = self._rules_for(snapshot)
+
+        # achievement_id -> игроки, выполнившие условие
+        candidates: Dict[str, Set[int]] = defaultdict(set)
+        # Правила, которым нужен баланс из БД: achievement_id -> игроки
+        balance_checks: Dict[str, Set[int]] = defaultdict(set)
+
+        for ev in events:
+            for rule in index.get(ev.event_type, ()):
+                result = rule.check(ev)
+                if result is None:
+                    balance_checks[rule.achievement_id].add(ev.user_id)
+                elif result:
+                    candidates[rule.achievement_id].add(ev.user_id)
+
+        if balance_checks:
+            self._check_balances(session, balance_checks, candidates)
+
+        if not candidates:
+            return []
+
+        # Уже выданные достижения отсеиваются одним запросом
+        user_ids = set().union(*candidates.values())
+        achieved = set(session.execute(
+            select(Achievement.user_id, Achievement.achievement_type).where(
+                Achievement.user_id.in_(user_ids),
+                Achievement.achievement_type.in_(list(candidates))
+            )
+        ).all())
+
+        configs = {a.id: a for a in snapshot.bonuses.achievements}
+        new_awards = [
+            (user_id, configs[achievement_id])
+            for achievement_id, users in candidates.items()
+            for user_id in users
+            if (user_id, achievement_id) not in achieved
+        ]
+        if not new_awards:
+            return []
+
+        users = {
+            row.id: row
+            for row in session.execute(
+                select(User.id, User.telegram_id, User.username, User.full_name).where(
+                    User.id.in_({user_id for user_id, _ in new_awards})
+                )
+            ).all()
+        }
+        self._apply(session, new_awards)
+
+        return [
+            Award(
+                user_id=user_id,
+                telegram_id=users[user_id].telegram_id,
+                username=users[user_id].username or users[user_id].full_name or f"Игрок_{user_id}",
+                achievement=achievement
+            )
+            for user_id, achievement in new_awards
+            if user_id in users
+        ]
+
+    def _check_balances(self, session: Session, checks: Dict[str, Set[int]], candidates: Dict[str, Set[int]]):
+        user_ids = set().union(*checks.values())
+        balances = dict(session.execute(
+            select(User.id, User.balance).where(User.id.in_(user_ids))
+        ).all())
+
+        rules = {rule.achievement_id: rule for rule in self.rules}
+        for achievement_id, users in checks.items():
+            rule = rules[achievement_id]
+            for user_id in users:
+                balance = balances.get(user_id)
+                if balance is not None and rule.check_balance(balance):
+                    candidates[achievement_id].add(user_id)
+
+    def _apply(self, session: Session, awards: List[Tuple[int, AchievementConfig]]):
+        now = datetime.utcnow()
+
+        session.execute(insert(Achievement), [
+            {
+                'user_id': user_id,
+                'achievement_type': achievement.id,
+                'achieved_at': now,
+                'details': {'name': achievement.name, 'reward': achievement.reward}
+            }
+            for user_id, achievement in awards
+        ])
+
+        rewards: Dict[int, float] = defaultdict(float)
+        for user_id, achievement in awards:
+            rewards[user_id] += achievement.reward
+
+        rewards = {user_id: reward for user_id, reward in rewards.items() if reward}
+        if rewards:
+            users = User.__table__
+            session.execute(
+                update(users).where(users.c.id == bindparam('uid')).values(
+                    balance=users.c.balance + bindparam('reward'),
+                    total_earned=users.c.total_earned + bindparam('reward')
+                ),
+                [{'uid': user_id, 'reward': reward} for user_id, reward in rewards.items()]
+            )
+
+            session.execute(insert(Transaction), [
+                {
+                    'user_id': user_id,
+                    'transaction_type': 'achievement',
+                    'amount': achievement.reward,
+                    'details': {'achievement': achievement.id, 'name': achievement.name},
+                    'created_at': now
+                }
+                for user_id, achievement in awards
+                if achievement.reward
+            ])
+            # Награда меняет баланс - пусть правила по балансу проверят его в следующей пачке
+            self.record(session, [AchievementEvent(user_id, BALANCE) for user_id in rewards])
+
+        session.commit()
+
+
+# Общий движок достижений
+achievement_engine = AchievementEngine()
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, insert, or_, update # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from models.user import User
+from models.transaction import Transaction
+from configs.registry import DailyBonusConfig, config_registry
+from services.achievement_service import BALANCE, AchievementEvent, achievement_engine
+
+
+def _day_start(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bonus_expr(settings: DailyBonusConfig, streak, level):
+    """Сумма бонуса SQL-выражением (та же формула, что calculate_bonus)"""
+    capped_streak = case(
+        (streak > settings.max_streak, settings.max_streak),
+        else_=streak
+    )
+    return func.round(
+        settings.base_amount
+        * (1 + capped_streak * settings.streak_multiplier)
+        * (1 + level * settings.level_multiplier),
+        2
+    )
+
+
+class BonusService:
+    """Ежедневный бонус по configs/bonuses.json
+
+    Получение бонуса - один условный UPDATE: новая серия, сумма бонуса
+    и зачисление считаются в самой БД, а условие "сегодня еще не получал"
+    защищает от двойного получения без предварительного чтения игрока.
+    Прерванные серии сбрасывает ночная задача одним запросом.
+    """
+
+    @property
+    def settings(self) -> DailyBonusConfig:
+        """Настройки бонуса из текущей версии конфигов"""
+        return config_registry.current.bonuses.daily_bonus
+
+    def calculate_bonus(self, streak: int, level: int) -> float:
+        """Размер бонуса для серии и уровня (для показа игроку)"""
+        settings = self.settings
+        streak = min(streak, settings.max_streak)
+        bonus = (
+            settings.base_amount
+            * (1 + streak * settings.streak_multiplier)
+            * (1 + level * settings.level_multiplier)
+        )
+        return round(bonus, 2)
+
+    def claim(self, session: Session, user_id: int) -> tuple[bool, str, float]:
+        """Получение ежедневного бонуса"""
+        settings = self.settings
+        now = datetime.utcnow()
+        today = _day_start(now)
+        yesterday = today - timedelta(days=1)
+
+        users = User.__table__
+        # Серия продолжается, только если бонус брали вчера. Ночной сброс
+        # обнуляет прерванные серии заранее, но условие здесь сохраняет
+        # правильный счет, даже если задача не успела выполниться
+        streak = case(
+            (users.c.last_daily >= yesterday, users.c.daily_streak + 1),
+            else_=1
+        )
+        bonus = _bonus_expr(settings, streak, users.c.level)
+
+        # В SET правые части вычисляются по старым значениям строки
+        row = session.execute(
+            update(users)
+            .where(
+                users.c.id == user_id,
+                or_(users.c.last_daily.is_(None), users.c.last_daily < today)
+            )
+            .values(
+                daily_streak=streak,
+                balance=users.c.balance + bonus,
+                total_earned=users.c.total_earned + bonus,
+                last_daily=now
+            )
+            # RETURNING видит обновленную строку: новая серия и тот же уровень
+            # дают ровно зачисленную сумму, ее и пишем в журнал
+            .returning(
+                users.c.daily_streak,
+                users.c.level,
+                users.c.balance,
+                _bonus_expr(settings, users.c.daily_streak, users.c.level).label('amount')
+            )
+        ).first()
+
+        if row is None:
+            session.rollback()
+            exists = session.query(User.id).filter(User.id == user_id).first()
+            if not exists:
+                return False, "Пользователь не найден", 0.0
+            return False, "Вы уже получали бонус сегодня", 0.0
+
+        amount = row.amount
+        session.execute(insert(Transaction).values(
+            user_id=user_id,
+            transaction_type='daily_bonus',
+            amount=amount,
+            details={
+                'streak': row.daily_streak,
+                'streak_multiplier': 1 + min(row.daily_streak, settings.max_streak) * settings.streak_multiplier,
+                'level_multiplier': 1 + row.level * settings.level_multiplier
+            },
+            created_at=now
+        ))
+        achievement_engine.record(session, [
+            AchievementEvent(user_id, 'daily_bonus', amount),
+            AchievementEvent(user_id, BALANCE, row.balance)
+        ])
+        session.commit()
+
+        return True, f"🎁 Ежедневный бонус! Серия: {row.daily_streak} дней", amount
+
+    def reset_broken_streaks(self, session: Session) -> int:
+        """Сброс серий игроков, пропустивших день (после полуночи UTC)"""
+        yesterday = _day_start(datetime.utcnow()) - timedelta(days=1)
+
+        users = User.__table__
+        result = session.execute(
+            update(users)
+            .where(
+                users.c.daily_streak > 0,
+                or_(users.c.last_daily.is_(None), users.c.last_daily < yesterday)
+            )
+            .values(daily_streak=0)
+        )
+        session.commit()
+        return result.rowcount
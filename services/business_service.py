@@ -1,49 +1,39 @@
-import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session # type: ignore
+from sqlalchemy import update # type: ignore
 from models.user import User, UserBusiness
 from models.transaction import Transaction
-from config import config
+from configs.registry import BusinessConfig, config_registry
+from services.achievement_service import BALANCE, AchievementEvent, achievement_engine
 import math
 
 class BusinessService:
-    def __init__(self):
-        self.businesses_config = self._load_businesses_config()
-    
-    def _load_businesses_config(self) -> Dict:
-        """Загрузка конфигурации бизнесов из JSON"""
-        with open(config.BUSINESSES_CONFIG, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    
-    def get_business_info(self, business_id: str) -> Optional[Dict]:
+    def get_business_info(self, business_id: str) -> Optional[BusinessConfig]:
         """Получение информации о бизнесе"""
-        for business in self.businesses_config['businesses']:
-            if business['id'] == business_id:
-                return business
-        return None
+        return config_registry.current.businesses_by_id.get(business_id)
     
-    def get_all_businesses(self) -> List[Dict]:
+    def get_all_businesses(self) -> Tuple[BusinessConfig, ...]:
         """Получение списка всех бизнесов"""
-        return self.businesses_config['businesses']
+        return config_registry.current.businesses
     
-    def get_businesses_by_category(self, category: str) -> List[Dict]:
+    def get_businesses_by_category(self, category: str) -> List[BusinessConfig]:
         """Получение бизнесов по категории"""
-        return [b for b in self.businesses_config['businesses'] if b.get('category') == category]
+        return [b for b in config_registry.current.businesses if b.category == category]
     
-    def calculate_upgrade_price(self, business_info: Dict, current_level: int) -> float:
+    def calculate_upgrade_price(self, business_info: BusinessConfig, current_level: int) -> float:
         """Расчет стоимости улучшения бизнеса"""
-        base_price = business_info['base_price']
-        multiplier = business_info['upgrade_multiplier']
+        base_price = business_info.base_price
+        multiplier = business_info.upgrade_multiplier
         
         # Нелинейный рост цены
         price = base_price * (multiplier ** (current_level - 1))
         return round(price, 2)
     
-    def calculate_profit_per_hour(self, business_info: Dict, level: int) -> float:
+    def calculate_profit_per_hour(self, business_info: BusinessConfig, level: int) -> float:
         """Расчет прибыли в час для уровня"""
-        base_profit = business_info['base_profit_per_hour']
-        multiplier = business_info['upgrade_multiplier']
+        base_profit = business_info.base_profit_per_hour
+        multiplier = business_info.upgrade_multiplier
         
         profit = base_profit * (multiplier ** (level - 1))
         return round(profit, 2)
@@ -69,25 +59,40 @@ class BusinessService:
             return False, f"Достигнут лимит бизнесов для вашего уровня ({max_businesses})"
         
         # Проверка баланса
-        price = business_info['base_price']
+        price = business_info.base_price
         if user.balance < price:
             return False, f"Недостаточно средств. Нужно: ${price:.2f}"
         
         return True, ""
     
     def buy_business(self, session: Session, user_id: int, business_id: str) -> tuple[bool, str, Optional[UserBusiness]]:
-        """Покупка бизнеса"""
+        """Покупка бизнеса
+
+        Баланс меняют и задачи планировщика в пуле потоков, поэтому он
+        меняется SQL-выражением от текущего значения в БД, а списание
+        проходит только при достаточном балансе на момент записи.
+        """
         can_buy, message = self.can_buy_business(session, user_id, business_id)
         if not can_buy:
             return False, message, None
         
-        user = session.query(User).filter(User.id == user_id).first()
         business_info = self.get_business_info(business_id)
         
-        # Вычитаем деньги
-        price = business_info['base_price']
-        user.balance -= price
-        user.total_spent += price
+        # Вычитаем деньги и добавляем опыт
+        price = business_info.base_price
+        debited = session.execute(
+            update(User).where(
+                User.id == user_id,
+                User.balance >= price
+            ).values(
+                balance=User.balance - price,
+                total_spent=User.total_spent + price,
+                experience=User.experience + config_registry.current.levels.exp_for_business_purchase
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        if not debited:
+            session.rollback()
+            return False, f"Недостаточно средств. Нужно: ${price:.2f}", None
         
         # Создаем запись о бизнесе
         user_business = UserBusiness(
@@ -106,20 +111,17 @@ class BusinessService:
             amount=-price,
             details={
                 'business_type': business_id,
-                'business_name': business_info['name'],
+                'business_name': business_info.name,
                 'level': 1
             }
         )
         session.add(transaction)
         
-        # Добавляем опыт
-        user.experience += 50  # Из конфига levels.json
-        
         session.commit()
         
-        return True, f"✅ Вы успешно купили {business_info['icon']} {business_info['name']}!", user_business
+        return True, f"✅ Вы успешно купили {business_info.icon} {business_info.name}!", user_business
     
-    def can_upgrade_business(self, session: Session, user_id: int, business_id: int) -> tuple[bool, str, Optional[Dict]]:
+    def can_upgrade_business(self, session: Session, user_id: int, business_id: int) -> tuple[bool, str, Optional[BusinessConfig]]:
         """Проверка возможности улучшения бизнеса"""
         user_business = session.query(UserBusiness).filter(
             UserBusiness.id == business_id,
@@ -133,8 +135,8 @@ class BusinessService:
         if not business_info:
             return False, "Информация о бизнесе не найдена", None
         
-        if user_business.level >= business_info['max_level']:
-            return False, f"Бизнес достиг максимального уровня ({business_info['max_level']})", None
+        if user_business.level >= business_info.max_level:
+            return False, f"Бизнес достиг максимального уровня ({business_info.max_level})", None
         
         user = session.query(User).filter(User.id == user_id).first()
         upgrade_price = self.calculate_upgrade_price(business_info, user_business.level)
@@ -155,12 +157,22 @@ class BusinessService:
             UserBusiness.user_id == user_id
         ).first()
         
-        user = session.query(User).filter(User.id == user_id).first()
         upgrade_price = self.calculate_upgrade_price(business_info, user_business.level)
         
-        # Вычитаем деньги
-        user.balance -= upgrade_price
-        user.total_spent += upgrade_price
+        # Вычитаем деньги и добавляем опыт (см. buy_business)
+        debited = session.execute(
+            update(User).where(
+                User.id == user_id,
+                User.balance >= upgrade_price
+            ).values(
+                balance=User.balance - upgrade_price,
+                total_spent=User.total_spent + upgrade_price,
+                experience=User.experience + config_registry.current.levels.exp_for_upgrade
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        if not debited:
+            session.rollback()
+            return False, f"Недостаточно средств. Нужно: ${upgrade_price:.2f}"
         
         # Улучшаем бизнес
         user_business.level += 1
@@ -173,19 +185,16 @@ class BusinessService:
             amount=-upgrade_price,
             details={
                 'business_type': user_business.business_type,
-                'business_name': business_info['name'],
+                'business_name': business_info.name,
                 'old_level': user_business.level - 1,
                 'new_level': user_business.level
             }
         )
         session.add(transaction)
         
-        # Добавляем опыт
-        user.experience += 25  # Из конфига levels.json
-        
         session.commit()
         
-        return True, f"✅ Бизнес {business_info['icon']} {business_info['name']} улучшен до уровня {user_business.level}!"
+        return True, f"✅ Бизнес {business_info.icon} {business_info.name} улучшен до уровня {user_business.level}!"
     
     def collect_profits(self, session: Session, user_id: int) -> tuple[float, Dict]:
         """Сбор прибыли со всех бизнесов пользователя"""
@@ -212,12 +221,15 @@ class BusinessService:
                 ub.last_collected = datetime.utcnow()
         
         if total_profit > 0:
-            user = session.query(User).filter(User.id == user_id).first()
-            user.balance += total_profit
-            user.total_earned += total_profit
-            
-            # Добавляем опыт за сбор прибыли
-            user.experience += total_profit * 0.1  # 10% от прибыли в опыт
+            # Начисление и опыт за сбор прибыли (10% от прибыли в опыт)
+            session.execute(
+                update(User).where(User.id == user_id).values(
+                    balance=User.balance + total_profit,
+                    total_earned=User.total_earned + total_profit,
+                    experience=User.experience + total_profit * 0.1
+                ).execution_options(synchronize_session=False)
+            )
+            achievement_engine.record(session, [AchievementEvent(user_id, BALANCE)])
             
             session.commit()
         
@@ -237,11 +249,8 @@ class BusinessService:
     
     def _get_max_businesses_for_level(self, level: int) -> int:
         """Получение максимального количества бизнесов для уровня"""
-        with open(config.LEVELS_CONFIG, 'r', encoding='utf-8') as f:
-            levels_config = json.load(f)
-        
-        for req in levels_config['level_up_requirements']:
-            if req['level'] == level:
-                return req['business_limit']
+        for req in config_registry.current.levels.requirements:
+            if req.level == level:
+                return req.business_limit
         
         return 1
\ No newline at end of file
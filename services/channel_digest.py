@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Tuple
+from services.market_analytics import MarketAnalytics, market_analytics
+from utils.templates import Template
+from utils.topk import TopK
+
+# Записей в каждом разделе дайджеста
+DIGEST_TOP = 5
+
+DIGEST_HEADER = Template("📰 ДАЙДЖЕСТ С {since:%H:%M} ПО {until:%H:%M} UTC")
+DEAL_LINE = Template("{place}. @{username} — {label}: ${amount:,.2f}")
+LEVEL_LINE = Template("{place}. @{username} — уровень {level}")
+ACHIEVEMENT_LINE = Template("{place}. @{username} — {name}")
+MOVER_LINE = Template("{icon} {symbol} {change:+.2f}% (${price:,.2f}, объем за сутки {volume:,})")
+
+
+@dataclass(frozen=True)
+class Deal:
+    username: str
+    label: str
+    amount: float
+
+
+class ChannelDigest:
+    """Сводка событий канала за окно
+
+    По каждому разделу хранится только TopK лучших записей и счетчик,
+    поэтому память и размер итогового поста не зависят от числа
+    событий: за окно публикуется один пост. Для движения рынка
+    запоминаются цены на начало окна, текущие цены и объемы берутся
+    из аналитики рынка.
+    """
+
+    def __init__(self, top: int = DIGEST_TOP, analytics: MarketAnalytics = market_analytics):
+        self.top = top
+        self.analytics = analytics
+        self.deals: TopK[Deal] = TopK(top)
+        self.level_ups: TopK[str] = TopK(top)
+        self.achievements: TopK[Tuple[str, str]] = TopK(top)
+        self.since = datetime.utcnow()
+        self._open: Dict[str, float] = analytics.prices()
+
+    def add_deal(self, username: str, label: str, amount: float):
+        self.deals.push(amount, Deal(username, label, amount))
+
+    def add_level_up(self, username: str, level: int):
+        self.level_ups.push(level, username)
+
+    def add_achievement(self, username: str, name: str, reward: float = 0.0):
+        self.achievements.push(reward, (username, name))
+
+    def movers(self, limit: int) -> List[Tuple[str, float, float, int]]:
+        """Акции с наибольшим изменением цены за окно: (символ, %, цена, объем)"""
+        movers: TopK[Tuple[str, float, float, int]] = TopK(limit)
+        for symbol, stats in self.analytics.all().items():
+            # Акция, появившаяся во время окна, отсчитывается от первой цены
+            opened = self._open.setdefault(symbol, stats.price)
+            if opened > 0 and stats.price != opened:
+                change = (stats.price - opened) / opened * 100
+                movers.push(abs(change), (symbol, change, stats.price, stats.volume))
+        return [item for _, item in movers.items()]
+
+    @property
+    def empty(self) -> bool:
+        return not (self.deals.count or self.level_ups.count or self.achievements.count or self.movers(1))
+
+    def render(self, until: datetime) -> str:
+        parts = [DIGEST_HEADER.render({'since': self.since, 'until': until})]
+
+        if self.deals.count:
+            parts.append(f"\n💰 Крупные сделки (всего {self.deals.count}):")
+            parts.extend(
+                DEAL_LINE.render({'place': i, 'username': deal.username, 'label': deal.label, 'amount': deal.amount})
+                for i, (_, deal) in enumerate(self.deals.items(), 1)
+            )
+
+        if self.level_ups.count:
+            parts.append(f"\n🚀 Новые уровни (всего {self.level_ups.count}):")
+            parts.extend(
+                LEVEL_LINE.render({'place': i, 'username': username, 'level': int(level)})
+                for i, (level, username) in enumerate(self.level_ups.items(), 1)
+            )
+
+        if self.achievements.count:
+            parts.append(f"\n🏆 Достижения (всего {self.achievements.count}):")
+            parts.extend(
+                ACHIEVEMENT_LINE.render({'place': i, 'username': username, 'name': name})
+                for i, (_, (username, name)) in enumerate(self.achievements.items(), 1)
+            )
+
+        movers = self.movers(self.top)
+        if movers:
+            parts.append("\n📊 Движение рынка:")
+            parts.extend(
+                MOVER_LINE.render({
+                    'icon': "📈" if change > 0 else "📉",
+                    'symbol': symbol,
+                    'change': change,
+                    'price': price,
+                    'volume': volume
+                })
+                for symbol, change, price, volume in movers
+            )
+
+        return "\n".join(parts)
+
+    def reset(self, now: datetime):
+        """Начало нового окна: цены на его начало - последние известные"""
+        self.deals.clear()
+        self.level_ups.clear()
+        self.achievements.clear()
+        self._open = self.analytics.prices()
+        self.since = now
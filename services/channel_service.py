@@ -1,20 +1,109 @@
 from aiogram import Bot
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Optional
+from services.channel_digest import ChannelDigest
+from services.notification_service import LOW, NotificationService
+from utils.templates import Template, pack
 from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOTTERY_HEADER = "🎉 РЕЗУЛЬТАТЫ ЕЖЕНЕДЕЛЬНОГО РОЗЫГРЫША\n\n"
+LOTTERY_WINNER = Template("{place}. @{username}\n   Приз: {prize}\n   Сумма: ${amount:,.2f}\n\n")
+LOTTERY_FOOTER = "Поздравляем победителей! 🎊"
+
+ACHIEVEMENT_POST = Template(
+    "🏆 НОВОЕ ДОСТИЖЕНИЕ!\n\n"
+    "👤 Игрок: @{username}\n"
+    "🎯 Достижение: {achievement_name}\n"
+    "📝 Описание: {description}\n\n"
+    "Поздравляем! 👏"
+)
+
+# Разделитель событий внутри общего поста
+BATCH_SEPARATOR = "\n\n〰️〰️〰️\n\n"
+
 
 class ChannelService:
-    def __init__(self, bot: Bot):
+    """Публикации в канал
+
+    Крупные сообщения (итоги розыгрыша, топ игроков) уходят сразу.
+    Мелкие события (сделки, уровни, достижения) через post() копятся
+    в буфере, а flush() раз в интервал склеивает их в как можно меньше
+    постов в пределах длины сообщения Telegram.
+
+    В режиме дайджеста (digest задан) события вместо текста попадают
+    в сводку, и publish_digest() публикует один пост за окно при любом
+    числе событий.
+    """
+
+    def __init__(self, bot: Bot, notifications: Optional[NotificationService] = None,
+                 digest: Optional[ChannelDigest] = None):
         self.bot = bot
+        self.notifications = notifications
+        self.digest = digest
+        self._pending: List[str] = []
+    
+    def post(self, message: str):
+        """Событие в очередь ближайшего общего поста"""
+        self._pending.append(message)
+    
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+    
+    async def flush(self) -> int:
+        """Публикация накопленных событий, возвращает число постов"""
+        messages, self._pending = self._pending, []
+        if not messages:
+            return 0
+        
+        posts = pack(messages, config.MESSAGE_LIMIT, BATCH_SEPARATOR)
+        for text in posts:
+            await self.publish_to_channel(text)
+        
+        if len(messages) > 1:
+            logger.debug(f"Published {len(messages)} channel events in {len(posts)} posts")
+        return len(posts)
+    
+    async def publish_digest(self) -> bool:
+        """Публикация сводки за окно и начало нового окна
+
+        Если пост не принят к отправке (очередь полна, канал не задан),
+        окно не сбрасывается и войдет в следующую сводку.
+        """
+        if self.digest is None or self.digest.empty or not config.CHANNEL_ID:
+            return False
+        
+        now = datetime.utcnow()
+        message = self.digest.render(now)
+        if len(message) > config.MESSAGE_LIMIT:
+            message = message[:config.MESSAGE_LIMIT - 1] + "…"
+        
+        published = await self.publish_to_channel(message)
+        if published:
+            self.digest.reset(now)
+        else:
+            logger.warning("Channel digest was not accepted for sending, keeping the window")
+        return published
     
     async def publish_to_channel(self, message: str):
-        """Публикация сообщения в канал"""
+        """Публикация сообщения в канал
+
+        С очередью уведомлений сообщение только ставится в очередь, и
+        True означает, что оно принято к отправке.
+        """
+        if self.notifications is not None:
+            return self.notifications.notify(config.CHANNEL_ID, message, LOW)
+        
         try:
             if config.CHANNEL_ID:
                 await self.bot.send_message(config.CHANNEL_ID, message)
                 return True
             return False
         except Exception as e:
-            print(f"Error publishing to channel: {e}")
+            logger.exception(f"Error publishing to channel: {e}")
             return False
     
     async def publish_lottery_results(self, winners: List[Dict]):
@@ -22,26 +111,24 @@ class ChannelService:
         if not winners:
             return
         
-        message = "🎉 РЕЗУЛЬТАТЫ ЕЖЕНЕДЕЛЬНОГО РОЗЫГРЫША\n\n"
-        
-        for i, winner_info in enumerate(winners, 1):
-            user = winner_info['user']
-            message += f"{i}. @{user.username or user.full_name or f'Игрок_{user.id}'}\n"
-            message += f"   Приз: {winner_info['prize']}\n"
-            message += f"   Сумма: ${winner_info['amount']:,.2f}\n\n"
-        
-        message += "Поздравляем победителей! 🎊"
+        parts = [LOTTERY_HEADER]
+        parts.extend(
+            LOTTERY_WINNER.render({**winner_info, 'place': i})
+            for i, winner_info in enumerate(winners, 1)
+        )
+        parts.append(LOTTERY_FOOTER)
         
-        await self.publish_to_channel(message)
+        await self.publish_to_channel("".join(parts))
     
-    async def publish_achievement(self, username: str, achievement_name: str, description: str):
-        """Публикация достижения"""
-        message = (
-            f"🏆 НОВОЕ ДОСТИЖЕНИЕ!\n\n"
-            f"👤 Игрок: @{username}\n"
-            f"🎯 Достижение: {achievement_name}\n"
-            f"📝 Описание: {description}\n\n"
-            f"Поздравляем! 👏"
-        )
+    async def publish_achievement(self, username: str, achievement_name: str, description: str,
+                                  reward: float = 0.0):
+        """Публикация достижения (в ближайшем общем посте или в дайджесте)"""
+        if self.digest is not None:
+            self.digest.add_achievement(username, achievement_name, reward)
+            return
         
-        await self.publish_to_channel(message)
\ No newline at end of file
+        self.post(ACHIEVEMENT_POST.render({
+            'username': username,
+            'achievement_name': achievement_name,
+            'description': description
+        }))
\ No newline at end of file
@@ -0,0 +1,56 @@
+from typing import Optional
+from aiogram import Bot
+from services.bonus_service import BonusService
+from services.business_service import BusinessService
+from services.channel_digest import ChannelDigest
+from services.channel_service import ChannelService
+from services.economy_service import EconomyService
+from services.event_service import EventService
+from services.exchange_service import ExchangeService
+from services.job_market_service import JobMarketService
+from services.job_runner import JobRunner
+from services.notification_service import NotificationService
+from services.payroll_service import PayrollService
+from services.stock_service import StockService
+from utils.lazy import Lazy
+from config import config
+
+
+class ServiceContainer:
+    """Общие экземпляры сервисов бота
+
+    Каждый сервис создается один раз при первом обращении и дальше
+    используется и хендлерами, и планировщиком, поэтому конфиги
+    читаются однократно, а состояние (например, тренд рынка) одно на
+    весь бот. Сервисам, которым нужен бот, он передается через bind_bot().
+    """
+
+    def __init__(self):
+        self._bot: Optional[Bot] = None
+        # Пул потоков для блокирующей работы с БД (хендлеры и планировщик)
+        self.jobs = Lazy(JobRunner)
+        self.bonuses = Lazy(BonusService)
+        self.economy = Lazy(lambda: EconomyService(self.bonuses))
+        self.business = Lazy(BusinessService)
+        self.stocks = Lazy(StockService)
+        self.exchange = Lazy(lambda: ExchangeService(self.stocks))
+        self.job_market = Lazy(JobMarketService)
+        self.payroll = Lazy(PayrollService)
+        self.notifications = Lazy(lambda: NotificationService(self.bot))
+        self.events = Lazy(lambda: EventService(self.bot, self.notifications, self.channel))
+        self.channel = Lazy(lambda: ChannelService(
+            self.bot, self.notifications, ChannelDigest() if config.CHANNEL_DIGEST else None
+        ))
+
+    def bind_bot(self, bot: Bot):
+        self._bot = bot
+
+    @property
+    def bot(self) -> Bot:
+        if self._bot is None:
+            raise RuntimeError("Бот не привязан к контейнеру сервисов")
+        return self._bot
+
+
+# Общий контейнер сервисов
+container = ServiceContainer()
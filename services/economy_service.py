@@ -1,35 +1,36 @@
-import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session # type: ignore
-from sqlalchemy import func, desc # type: ignore
+from sqlalchemy import func, desc, update # type: ignore
 from models.user import User
 from models.transaction import Transaction
-from config import config
+from configs.registry import LevelRequirement, config_registry
+from services.achievement_service import BALANCE, AchievementEvent, achievement_engine
+from services.bonus_service import BonusService
 
 class EconomyService:
-    def __init__(self):
-        self.levels_config = self._load_levels_config()
+    def __init__(self, bonus_service: Optional[BonusService] = None):
+        self.bonus_service = bonus_service or BonusService()
     
-    def _load_levels_config(self) -> Dict:
-        """Загрузка конфигурации уровней из JSON"""
-        with open(config.LEVELS_CONFIG, 'r', encoding='utf-8') as f:
-            return json.load(f)
+    @property
+    def level_requirements(self) -> Tuple[LevelRequirement, ...]:
+        """Требования уровней из текущей версии конфигов"""
+        return config_registry.current.levels.requirements
     
     def calculate_level(self, experience: float) -> int:
         """Расчет уровня на основе опыта"""
-        for level_req in reversed(self.levels_config['level_up_requirements']):
-            if experience >= level_req['exp_required']:
-                return level_req['level']
+        for level_req in reversed(self.level_requirements):
+            if experience >= level_req.exp_required:
+                return level_req.level
         return 1
     
     def get_exp_for_next_level(self, current_level: int) -> float:
         """Получение опыта до следующего уровня"""
-        for i, level_req in enumerate(self.levels_config['level_up_requirements']):
-            if level_req['level'] == current_level:
-                if i + 1 < len(self.levels_config['level_up_requirements']):
-                    next_level = self.levels_config['level_up_requirements'][i + 1]
-                    return next_level['exp_required']
+        requirements = self.level_requirements
+        for i, level_req in enumerate(requirements):
+            if level_req.level == current_level:
+                if i + 1 < len(requirements):
+                    return requirements[i + 1].exp_required
         return 0
     
     def get_exp_progress(self, experience: float) -> tuple[float, float, float]:
@@ -49,9 +50,9 @@ class EconomyService:
     
     def get_exp_for_level(self, level: int) -> float:
         """Получение опыта, необходимого для достижения уровня"""
-        for level_req in self.levels_config['level_up_requirements']:
-            if level_req['level'] == level:
-                return level_req['exp_required']
+        for level_req in self.level_requirements:
+            if level_req.level == level:
+                return level_req.exp_required
         return 0
     
     def check_level_up(self, session: Session, user_id: int) -> tuple[bool, Optional[int]]:
@@ -71,59 +72,8 @@ class EconomyService:
         return False, None
     
     def get_daily_bonus(self, session: Session, user_id: int) -> tuple[bool, str, float]:
-        """Получение ежедневного бонуса"""
-        user = session.query(User).filter(User.id == user_id).first()
-        if not user:
-            return False, "Пользователь не найден", 0.0
-        
-        now = datetime.utcnow()
-        
-        # Проверяем, получал ли пользователь бонус сегодня
-        if user.last_daily:
-            last_daily_date = user.last_daily.date()
-            today = now.date()
-            
-            if last_daily_date == today:
-                return False, "Вы уже получали бонус сегодня", 0.0
-            
-            # Проверяем серию дней
-            yesterday = today - timedelta(days=1)
-            if last_daily_date == yesterday:
-                user.daily_streak += 1
-            else:
-                user.daily_streak = 1
-        else:
-            user.daily_streak = 1
-        
-        # Расчет бонуса
-        base_bonus = config.DAILY_BONUS_BASE
-        streak_multiplier = 1 + (user.daily_streak * 0.1)  # +10% за каждый день серии
-        level_multiplier = 1 + (user.level * 0.05)  # +5% за каждый уровень
-        
-        bonus = base_bonus * streak_multiplier * level_multiplier
-        bonus = round(bonus, 2)
-        
-        # Начисляем бонус
-        user.balance += bonus
-        user.total_earned += bonus
-        user.last_daily = now
-        
-        # Создаем транзакцию
-        transaction = Transaction(
-            user_id=user_id,
-            transaction_type='daily_bonus',
-            amount=bonus,
-            details={
-                'streak': user.daily_streak,
-                'streak_multiplier': streak_multiplier,
-                'level_multiplier': level_multiplier
-            }
-        )
-        session.add(transaction)
-        
-        session.commit()
-        
-        return True, f"🎁 Ежедневный бонус! Серия: {user.daily_streak} дней", bonus
+        """Получение ежедневного бонуса (расчет по configs/bonuses.json)"""
+        return self.bonus_service.claim(session, user_id)
     
     def get_economy_stats(self, session: Session) -> Dict:
         """Получение статистики экономики"""
@@ -169,7 +119,12 @@ class EconomyService:
         return stats
     
     def transfer_money(self, session: Session, from_user_id: int, to_user_id: int, amount: float) -> tuple[bool, str]:
-        """Перевод денег между пользователями"""
+        """Перевод денег между пользователями
+
+        Балансы меняют и задачи планировщика в пуле потоков, поэтому
+        перевод проводится SQL-выражениями от текущих значений в БД,
+        а списание - только при достаточном балансе на момент записи.
+        """
         if amount <= 0:
             return False, "Сумма должна быть больше 0"
         
@@ -190,8 +145,21 @@ class EconomyService:
         net_amount = amount - fee
         
         # Выполняем перевод
-        from_user.balance -= amount
-        to_user.balance += net_amount
+        debited = session.execute(
+            update(User).where(
+                User.id == from_user_id,
+                User.balance >= amount
+            ).values(balance=User.balance - amount).execution_options(synchronize_session=False)
+        ).rowcount
+        if not debited:
+            session.rollback()
+            return False, "Недостаточно средств для перевода"
+        session.execute(
+            update(User).where(User.id == to_user_id).values(
+                balance=User.balance + net_amount
+            ).execution_options(synchronize_session=False)
+        )
+        achievement_engine.record(session, [AchievementEvent(to_user_id, BALANCE)])
         
         # Записываем транзакции
         transaction_out = Transaction(
@@ -1,104 +1,143 @@
-import json
-from typing import Dict, List, Optional
+from typing import List, Optional
 from sqlalchemy.orm import Session # type: ignore
 from aiogram import Bot
 from models.transaction import Transaction
 from models.user import User
 from database.database import db
+from configs.registry import ConfigSnapshot, EventConfig, config_registry
+from services.channel_digest import ChannelDigest
+from services.channel_service import ChannelService
+from services.notification_service import LOW, NotificationService
 from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Типы сделок и события, к которым они относятся
+TRANSACTION_EVENTS = {
+    'buy_business': ('business_purchase', "Покупка бизнеса"),
+    'upgrade_business': ('business_purchase', "Улучшение бизнеса"),
+    'buy_stock': ('stock_purchase', "Покупка"),
+    'sell_stock': ('stock_purchase', "Продажа"),
+}
+
+# Пороги по умолчанию, если в events.json они не заданы
+DEFAULT_MIN_AMOUNT = {'business_purchase': 10000, 'stock_purchase': 5000}
+DEFAULT_MIN_LEVEL = 10
+
+
+def _display_name(user: User) -> str:
+    return user.username or user.full_name or f"Игрок_{user.id}"
+
 
 class EventService:
-    def __init__(self, bot: Bot):
+    """Сообщения о событиях игры для канала
+
+    Шаблоны событий компилируются и проверяются реестром конфигов при
+    загрузке, здесь остается только проверить порог и подставить
+    значения. С сервисом канала сообщения уходят в общий пост интервала,
+    а в режиме дайджеста события попадают в сводку без рендеринга.
+    """
+
+    def __init__(self, bot: Bot, notifications: Optional[NotificationService] = None,
+                 channel: Optional[ChannelService] = None):
         self.bot = bot
-        self.events_config = self._load_events_config()
+        self.notifications = notifications
+        self.channel = channel
     
-    def _load_events_config(self) -> Dict:
-        """Загрузка конфигурации событий"""
-        try:
-            with open(config.EVENTS_CONFIG, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {"events": {}}
+    @staticmethod
+    def _event(snapshot: ConfigSnapshot, name: str) -> EventConfig:
+        """Настройки события из версии конфигов"""
+        return snapshot.events.get(name) or EventConfig()
     
-    async def publish_large_transaction(self, transaction: Transaction):
-        """Публикация информации о крупной сделке"""
+    async def publish_large_transaction(self, transaction: Transaction, user: Optional[User] = None):
+        """Публикация информации о крупной сделке
+        
+        Планировщик передает уже загруженного автора сделки, чтобы
+        не обращаться к БД из цикла событий.
+        """
         try:
-            with db.get_session() as session:
-                user = session.query(User).filter(User.id == transaction.user_id).first()
-                if not user:
-                    return
-                
-                amount = abs(transaction.amount)
-                transaction_type = transaction.transaction_type
-                
-                # Определяем тип события
-                if transaction_type in ['buy_business', 'upgrade_business']:
-                    event_config = self.events_config.get('events', {}).get('business_purchase', {})
-                    min_amount = event_config.get('min_amount', 10000)
-                    
-                    if amount >= min_amount:
-                        details = transaction.details or {}
-                        business_name = details.get('business_name', 'Неизвестный бизнес')
-                        
-                        message = event_config.get('message_template', 
-                            "🎉 КРУПНАЯ СДЕЛКА!\n\n👤 Игрок: {username}\n💼 Тип: {type}\n💰 Сумма: ${amount:,.2f}")
-                        
-                        formatted = message.format(
-                            username=user.username or user.full_name or f"Игрок_{user.id}",
-                            type="Покупка бизнеса" if transaction_type == 'buy_business' else "Улучшение бизнеса",
-                            business_name=business_name,
-                            amount=amount
-                        )
-                        
-                        await self._send_to_channel(formatted)
-                
-                elif transaction_type in ['buy_stock', 'sell_stock']:
-                    event_config = self.events_config.get('events', {}).get('stock_purchase', {})
-                    min_amount = event_config.get('min_amount', 5000)
-                    
-                    if amount >= min_amount:
-                        details = transaction.details or {}
-                        stock_name = details.get('stock_name', 'Неизвестная акция')
-                        
-                        message = event_config.get('message_template',
-                            "📈 КРУПНАЯ СДЕЛКА С АКЦИЯМИ!\n\n👤 Игрок: {username}\n🏦 Акция: {stock_name}\n💼 Тип: {type}\n💰 Сумма: ${amount:,.2f}")
-                        
-                        formatted = message.format(
-                            username=user.username or user.full_name or f"Игрок_{user.id}",
-                            stock_name=stock_name,
-                            type="Покупка" if transaction_type == 'buy_stock' else "Продажа",
-                            amount=amount
-                        )
-                        
-                        await self._send_to_channel(formatted)
+            kind = TRANSACTION_EVENTS.get(transaction.transaction_type)
+            if kind is None:
+                return
+            name, type_label = kind
+            
+            snapshot = config_registry.current
+            event_config = self._event(snapshot, name)
+            min_amount = event_config.min_amount
+            if min_amount is None:
+                min_amount = DEFAULT_MIN_AMOUNT[name]
+            
+            amount = abs(transaction.amount)
+            if amount < min_amount:
+                return
+            
+            if user is None:
+                with db.get_session() as session:
+                    user = session.query(User).filter(User.id == transaction.user_id).first()
+            if not user:
+                return
+            
+            details = transaction.details or {}
+            if self._digest is not None:
+                subject = details.get('business_name') or details.get('stock_name')
+                label = f"{type_label} «{subject}»" if subject else type_label
+                self._digest.add_deal(_display_name(user), label, amount)
+                return
+            
+            message = snapshot.event_templates[name].render({
+                'username': _display_name(user),
+                'type': type_label,
+                'business_name': details.get('business_name', 'Неизвестный бизнес'),
+                'stock_name': details.get('stock_name', 'Неизвестная акция'),
+                'amount': amount
+            })
+            
+            await self._send_to_channel(message)
         
         except Exception as e:
-            print(f"Error publishing transaction event: {e}")
+            logger.exception(f"Error publishing transaction event: {e}")
     
     async def publish_level_up(self, user: User, new_level: int):
         """Публикация информации о повышении уровня"""
         try:
-            event_config = self.events_config.get('events', {}).get('level_up', {})
-            min_level = event_config.get('min_level', 10)
+            snapshot = config_registry.current
+            event_config = self._event(snapshot, 'level_up')
+            min_level = event_config.min_level if event_config.min_level is not None else DEFAULT_MIN_LEVEL
+            
+            if new_level < min_level:
+                return
             
-            if new_level >= min_level:
-                message = event_config.get('message_template',
-                    "🚀 НОВЫЙ УРОВЕНЬ!\n\n👤 Игрок: {username}\n🎯 Достиг уровня: {level}")
-                
-                formatted = message.format(
-                    username=user.username or user.full_name or f"Игрок_{user.id}",
-                    level=new_level
-                )
-                
-                await self._send_to_channel(formatted)
+            if self._digest is not None:
+                self._digest.add_level_up(_display_name(user), new_level)
+                return
+            
+            message = snapshot.event_templates['level_up'].render({
+                'username': _display_name(user),
+                'level': new_level
+            })
+            
+            await self._send_to_channel(message)
         
         except Exception as e:
-            print(f"Error publishing level up event: {e}")
+            logger.exception(f"Error publishing level up event: {e}")
+    
+    @property
+    def _digest(self) -> Optional[ChannelDigest]:
+        return self.channel.digest if self.channel is not None else None
     
     async def _send_to_channel(self, message: str):
-        """Отправка сообщения в канал"""
+        """Отправка сообщения в канал: в общий пост, в очередь уведомлений или сразу"""
+        if self.channel is not None:
+            self.channel.post(message)
+            return
+        
+        if self.notifications is not None:
+            self.notifications.notify(config.CHANNEL_ID, message, LOW)
+            return
+        
         try:
             if config.CHANNEL_ID:
                 await self.bot.send_message(config.CHANNEL_ID, message)
         except Exception as e:
-            print(f"Error sending to channel: {e}")
\ No newline at end of file
+            logger.exception(f"Error sending to channel: {e}")
@@ -0,0 +1,400 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session # type: ignore
+from sqlalchemy import and_, bindparam, delete, update # type: ignore
+from models.stock import Stock, UserStock, StockOrder
+from models.user import User
+from services.order_book import BUY, SELL, LIMIT, MARKET, Fill, Order, Release, matching_engine
+from services.market_analytics import market_analytics
+from services.stock_service import StockService, stock_quote_cache
+from services.achievement_service import BALANCE, AchievementEvent, achievement_engine
+from services.transaction_writer import TransactionWriter
+from utils.lazy import Lazy
+from config import config
+
+# Рыночная заявка исполняется не хуже чем на 30% от текущей цены
+MARKET_PRICE_BAND = 0.3
+
+class ExchangeService:
+    """Биржа с заявками: резервирование средств и пакетный расчет сделок"""
+
+    def __init__(self, stock_service: Optional[StockService] = None):
+        self.engine = matching_engine
+        self.stock_service = stock_service or Lazy(StockService)
+
+    def load_open_orders(self, session: Session) -> int:
+        """Загрузка открытых заявок из БД в стаканы при запуске"""
+        rows = session.query(StockOrder).filter(
+            StockOrder.status == 'open'
+        ).order_by(StockOrder.id).all()
+
+        for row in rows:
+            self.engine.restore(Order(
+                id=row.id,
+                user_id=row.user_id,
+                symbol=row.symbol,
+                side=row.side,
+                order_type=row.order_type,
+                price=row.price,
+                quantity=row.quantity,
+                remaining=row.remaining,
+                escrow_price=row.escrow_price,
+                created_at=row.created_at
+            ))
+
+        return len(rows)
+
+    def place_order(self, session: Session, user_id: int, symbol: str, side: str,
+                    quantity: int, price: Optional[float] = None) -> tuple[bool, str, Optional[Order]]:
+        """Резервирование и запись заявки в БД (выполняется в пуле потоков)
+
+        Без price заявка рыночная. Деньги (для покупки) или акции (для
+        продажи) резервируются сразу, поэтому расчет сделок позже не
+        может уйти в минус. Расчет, зарплаты и лотерея меняют те же строки
+        из потоков, поэтому резерв списывается SQL-выражением с проверкой
+        остатка на момент записи. В стакан заявку ставит submit_order().
+        """
+        if side not in (BUY, SELL):
+            return False, "Неизвестное направление заявки", None
+
+        if quantity <= 0:
+            return False, "Количество должно быть больше 0", None
+
+        if price is not None and price <= 0:
+            return False, "Цена должна быть больше 0", None
+
+        stock = self.stock_service.get_stock_by_symbol(session, symbol)
+        if not stock:
+            return False, "Акция не найдена", None
+
+        user = session.query(User).filter(User.id == user_id).first()
+        if not user:
+            return False, "Пользователь не найден", None
+
+        order_type = LIMIT if price is not None else MARKET
+        if price is None:
+            band = 1 + MARKET_PRICE_BAND if side == BUY else 1 - MARKET_PRICE_BAND
+            price = round(stock.current_price * band, 2)
+
+        if side == BUY:
+            escrow_price = price
+            reserve = escrow_price * quantity
+            reserved = session.execute(
+                update(User).where(
+                    User.id == user_id,
+                    User.balance >= reserve
+                ).values(balance=User.balance - reserve).execution_options(synchronize_session=False)
+            ).rowcount
+            if not reserved:
+                session.rollback()
+                return False, f"Недостаточно средств. Нужно: ${reserve:.2f}", None
+        else:
+            user_stock = session.query(UserStock).filter(
+                and_(UserStock.user_id == user_id, UserStock.stock_id == stock.id)
+            ).first()
+            if not user_stock or user_stock.quantity < quantity:
+                available = user_stock.quantity if user_stock else 0
+                return False, f"У вас только {available} акций", None
+
+            escrow_price = user_stock.average_price
+            reserved = session.execute(
+                update(UserStock).where(
+                    UserStock.id == user_stock.id,
+                    UserStock.quantity >= quantity
+                ).values(quantity=UserStock.quantity - quantity).execution_options(synchronize_session=False)
+            ).rowcount
+            if not reserved:
+                session.rollback()
+                return False, "Недостаточно акций для продажи", None
+            session.execute(
+                delete(UserStock).where(
+                    UserStock.id == user_stock.id,
+                    UserStock.quantity <= 0
+                ).execution_options(synchronize_session=False)
+            )
+
+        row = StockOrder(
+            user_id=user_id,
+            symbol=symbol,
+            side=side,
+            order_type=order_type,
+            price=price,
+            quantity=quantity,
+            remaining=quantity,
+            escrow_price=escrow_price,
+            status='open',
+            created_at=datetime.utcnow()
+        )
+        session.add(row)
+        session.commit()
+
+        order = Order(
+            id=row.id,
+            user_id=user_id,
+            symbol=symbol,
+            side=side,
+            order_type=order_type,
+            price=price,
+            quantity=quantity,
+            remaining=quantity,
+            escrow_price=escrow_price,
+            created_at=row.created_at
+        )
+        return True, "", order
+
+    def submit_order(self, order: Order) -> tuple[str, List[Fill]]:
+        """Постановка записанной заявки в стакан (только в цикле событий)
+
+        Стаканы меняются и читаются планировщиком и хендлерами в цикле
+        событий, поэтому движок не вызывается из потоков.
+        """
+        fills = self.engine.submit(order)
+
+        filled = sum(f.quantity for f in fills)
+        if order.active:
+            message = f"✅ Заявка #{order.id} выставлена. Исполнено сразу: {filled} из {order.quantity}"
+        elif filled:
+            message = f"✅ Заявка #{order.id} исполнена: {filled} из {order.quantity}"
+        else:
+            message = f"⚠️ Заявка #{order.id} не нашла встречных предложений и снята"
+
+        return message, fills
+
+    def cancel_order(self, user_id: int, order_id: int) -> tuple[bool, str]:
+        """Снятие заявки (резерв вернется при ближайшем расчете)"""
+        order = self.engine.cancel(user_id, order_id)
+        if not order:
+            return False, "Заявка не найдена или уже исполнена"
+        return True, f"✅ Заявка #{order_id} снята"
+
+    def settle(self, session: Session) -> int:
+        """Пакетный расчет накопленных сделок и возвратов
+
+        Все изменения балансов, позиций, заявок и цен проводятся одной
+        транзакцией и небольшим числом executemany-запросов.
+        """
+        fills, releases = self.engine.drain()
+
+        try:
+            return self.settle_batch(session, fills, releases)
+        except Exception:
+            self.engine.requeue(fills, releases)
+            raise
+
+    def settle_batch(self, session: Session, fills: List[Fill], releases: List[Release]) -> int:
+        """Расчет пачки, уже забранной из движка
+
+        При ошибке транзакция откатывается, а вернуть пачку в очередь
+        должен вызывающий (планировщик делает это в цикле событий).
+        В другом потоке пачку нужно передавать копией
+        (MatchingEngine.snapshot), снятой в цикле событий.
+        """
+        if not fills and not releases:
+            return 0
+
+        try:
+            self._settle(session, fills, releases)
+        except Exception:
+            session.rollback()
+            raise
+
+        return len(fills)
+
+    def _settle(self, session: Session, fills: List[Fill], releases: List[Release]):
+        now = datetime.utcnow()
+
+        balance = defaultdict(float)
+        earned = defaultdict(float)
+        spent = defaultdict(float)
+        experience = defaultdict(float)
+        # (user_id, symbol) -> [количество, стоимость покупки]
+        positions: Dict[Tuple[int, str], List[float]] = defaultdict(lambda: [0, 0.0])
+        last_prices: Dict[str, float] = {}
+        volumes: Dict[str, int] = defaultdict(int)
+        touched: Dict[int, Order] = {}
+        cancelled = set()
+        writer = TransactionWriter(session)
+
+        for fill in fills:
+            stock = self.stock_service.get_stock_by_symbol(session, fill.symbol)
+            total = fill.price * fill.quantity
+            tax = total * config.TAX_RATE
+            buyer = fill.buy_order
+            seller = fill.sell_order
+
+            # Покупатель резервировал по своей цене, разницу возвращаем
+            balance[buyer.user_id] += (buyer.escrow_price - fill.price) * fill.quantity
+            spent[buyer.user_id] += total
+            experience[buyer.user_id] += fill.quantity * 2
+            position = positions[(buyer.user_id, fill.symbol)]
+            position[0] += fill.quantity
+            position[1] += total
+
+            balance[seller.user_id] += total - tax
+            earned[seller.user_id] += total - tax
+            experience[seller.user_id] += fill.quantity
+
+            last_prices[fill.symbol] = fill.price
+            volumes[fill.symbol] += fill.quantity
+            touched[buyer.id] = buyer
+            touched[seller.id] = seller
+
+            writer.add(
+                buyer.user_id,
+                'buy_stock',
+                -total,
+                {
+                    'stock_symbol': fill.symbol,
+                    'stock_name': stock.name if stock else fill.symbol,
+                    'quantity': fill.quantity,
+                    'price_per_share': fill.price,
+                    'total_cost': total,
+                    'order_id': buyer.id
+                },
+                now
+            )
+            writer.add(
+                seller.user_id,
+                'sell_stock',
+                total - tax,
+                {
+                    'stock_symbol': fill.symbol,
+                    'stock_name': stock.name if stock else fill.symbol,
+                    'quantity': fill.quantity,
+                    'price_per_share': fill.price,
+                    'total_revenue': total,
+                    'tax': tax,
+                    'net_revenue': total - tax,
+                    'order_id': seller.id
+                },
+                now
+            )
+
+        for release in releases:
+            order = release.order
+            touched[order.id] = order
+            cancelled.add(order.id)
+
+            if order.side == BUY:
+                balance[order.user_id] += order.escrow_price * release.quantity
+            else:
+                # Акции возвращаются по прежней средней цене
+                position = positions[(order.user_id, order.symbol)]
+                position[0] += release.quantity
+                position[1] += order.escrow_price * release.quantity
+
+        # Балансы пользователей
+        users = User.__table__
+        user_ids = set(balance) | set(earned) | set(spent) | set(experience)
+        if user_ids:
+            session.execute(
+                update(users).where(users.c.id == bindparam('uid')).values(
+                    balance=users.c.balance + bindparam('d_balance'),
+                    total_earned=users.c.total_earned + bindparam('d_earned'),
+                    total_spent=users.c.total_spent + bindparam('d_spent'),
+                    experience=users.c.experience + bindparam('d_exp')
+                ),
+                [
+                    {
+                        'uid': uid,
+                        'd_balance': balance[uid],
+                        'd_earned': earned[uid],
+                        'd_spent': spent[uid],
+                        'd_exp': experience[uid]
+                    }
+                    for uid in user_ids
+                ]
+            )
+
+        # Позиции покупателей и возвращенные акции
+        if positions:
+            self._apply_positions(session, positions)
+
+        # Состояние заявок
+        session.execute(
+            update(StockOrder.__table__).where(StockOrder.__table__.c.id == bindparam('oid')).values(
+                remaining=bindparam('n_remaining'),
+                status=bindparam('n_status')
+            ),
+            [
+                {
+                    'oid': order.id,
+                    'n_remaining': order.remaining,
+                    'n_status': (
+                        'cancelled' if order.id in cancelled
+                        else 'filled' if order.remaining == 0
+                        else 'open'
+                    )
+                }
+                for order in touched.values()
+            ]
+        )
+
+        writer.flush()
+
+        # Пакетный update идет мимо ORM, поэтому изменения балансов для
+        # достижений передаются движку явно (уйдут в очередь после commit)
+        achievement_engine.record(session, [
+            AchievementEvent(uid, BALANCE) for uid in user_ids if balance[uid] > 0
+        ])
+
+        # Цена акции определяется последней сделкой
+        if last_prices:
+            stocks = Stock.__table__
+            session.execute(
+                update(stocks).where(stocks.c.symbol == bindparam('sym')).values(
+                    current_price=bindparam('n_price'),
+                    last_updated=now
+                ),
+                [{'sym': symbol, 'n_price': price} for symbol, price in last_prices.items()]
+            )
+
+        session.commit()
+
+        if last_prices:
+            for symbol, price in last_prices.items():
+                market_analytics.record_trade(symbol, price, volumes[symbol])
+            stock_quote_cache.refresh(session)
+
+    def _apply_positions(self, session: Session, positions: Dict[Tuple[int, str], List[float]]):
+        """Зачисление акций с пересчетом средней цены"""
+        stock_ids = {}
+        for _, symbol in positions:
+            stock = self.stock_service.get_stock_by_symbol(session, symbol)
+            if stock:
+                stock_ids[symbol] = stock.id
+
+        # Одним запросом берем все позиции участников по этим акциям,
+        # лишние пары отсеются при поиске по ключу
+        user_ids = {user_id for user_id, _ in positions}
+        existing = {
+            (us.user_id, us.stock_id): us
+            for us in session.query(UserStock).filter(
+                UserStock.user_id.in_(user_ids),
+                UserStock.stock_id.in_(set(stock_ids.values()))
+            ).all()
+        } if stock_ids else {}
+
+        for (user_id, symbol), (quantity, cost) in positions.items():
+            stock_id = stock_ids.get(symbol)
+            if stock_id is None or quantity <= 0:
+                continue
+
+            user_stock = existing.get((user_id, stock_id))
+            if user_stock:
+                total_quantity = user_stock.quantity + quantity
+                total_invested = user_stock.average_price * user_stock.quantity + cost
+                user_stock.average_price = total_invested / total_quantity
+                user_stock.quantity = total_quantity
+            else:
+                user_stock = UserStock(
+                    user_id=user_id,
+                    stock_id=stock_id,
+                    quantity=int(quantity),
+                    average_price=cost / quantity
+                )
+                session.add(user_stock)
+                existing[(user_id, stock_id)] = user_stock
+
+        session.flush()
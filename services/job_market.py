@@ -0,0 +1,151 @@
+import heapq
+import itertools
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class Offer:
+    """Открытое предложение работы"""
+    id: int
+    employer_id: int
+    salary: float  # Зарплата в час
+    duration_hours: int
+    created_at: datetime
+    seq: int = 0
+    active: bool = True
+
+
+@dataclass
+class Seeker:
+    """Игрок в очереди ищущих работу"""
+    user_id: int
+    min_salary: float
+    since: datetime
+    seq: int = 0
+    active: bool = True
+
+
+@dataclass(frozen=True)
+class Match:
+    """Пара работодатель - работник"""
+    offer: Offer
+    employee_id: int
+
+
+class JobMatcher:
+    """Очередь сопоставления предложений работы и ищущих работу
+
+    Как биржевой стакан: предложения лежат в куче по убыванию зарплаты,
+    ищущие - по возрастанию минимальной зарплаты, при равенстве раньше
+    обслуживается тот, кто встал в очередь первым. Новое предложение
+    достается самому нетребовательному подходящему игроку, новый
+    соискатель получает лучшее подходящее предложение. Снятые записи
+    удаляются из куч лениво.
+    """
+
+    def __init__(self):
+        self._offers: List[Tuple[float, int, Offer]] = []
+        self._seekers: List[Tuple[float, int, Seeker]] = []
+        self._offers_by_id: Dict[int, Offer] = {}
+        self._seekers_by_user: Dict[int, Seeker] = {}
+        self._seq = itertools.count(1)
+
+    def add_offer(self, offer: Offer) -> Optional[Match]:
+        """Новое предложение: сразу отдается ожидающему или встает в очередь"""
+        offer.seq = next(self._seq)
+        seeker = self._pop_best(
+            self._seekers,
+            fits=lambda s: s.min_salary <= offer.salary,
+            own=lambda s: s.user_id == offer.employer_id
+        )
+        if seeker is not None:
+            del self._seekers_by_user[seeker.user_id]
+            offer.active = False
+            return Match(offer=offer, employee_id=seeker.user_id)
+
+        self.restore(offer)
+        return None
+
+    def restore(self, offer: Offer):
+        """Постановка предложения в очередь (в том числе после перезапуска)"""
+        if not offer.seq:
+            offer.seq = next(self._seq)
+        heapq.heappush(self._offers, (-offer.salary, offer.seq, offer))
+        self._offers_by_id[offer.id] = offer
+
+    def add_seeker(self, seeker: Seeker) -> Optional[Match]:
+        """Новый соискатель: получает лучшее предложение или встает в очередь"""
+        self.remove_seeker(seeker.user_id)
+        seeker.seq = next(self._seq)
+        offer = self._pop_best(
+            self._offers,
+            fits=lambda o: o.salary >= seeker.min_salary,
+            own=lambda o: o.employer_id == seeker.user_id
+        )
+        if offer is not None:
+            del self._offers_by_id[offer.id]
+            offer.active = False
+            return Match(offer=offer, employee_id=seeker.user_id)
+
+        heapq.heappush(self._seekers, (seeker.min_salary, seeker.seq, seeker))
+        self._seekers_by_user[seeker.user_id] = seeker
+        return None
+
+    @staticmethod
+    def _pop_best(heap, fits, own):
+        """Снятие с вершины кучи лучшей подходящей чужой записи"""
+        skipped = []
+        found = None
+        while heap:
+            entry = heap[0]
+            item = entry[2]
+            if not item.active:
+                heapq.heappop(heap)
+                continue
+            if not fits(item):
+                break
+            heapq.heappop(heap)
+            if own(item):
+                # Свои записи пропускаем, но оставляем в очереди
+                skipped.append(entry)
+                continue
+            found = item
+            break
+
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return found
+
+    def remove_offer(self, offer_id: int) -> Optional[Offer]:
+        offer = self._offers_by_id.pop(offer_id, None)
+        if offer is not None:
+            offer.active = False
+        return offer
+
+    def remove_seeker(self, user_id: int) -> Optional[Seeker]:
+        seeker = self._seekers_by_user.pop(user_id, None)
+        if seeker is not None:
+            seeker.active = False
+        return seeker
+
+    def is_seeking(self, user_id: int) -> bool:
+        return user_id in self._seekers_by_user
+
+    def user_offer_count(self, employer_id: int) -> int:
+        return sum(1 for o in self._offers_by_id.values() if o.employer_id == employer_id)
+
+    def expire_seekers(self, before: datetime) -> List[int]:
+        """Снятие соискателей, ждущих дольше срока"""
+        expired = [s.user_id for s in self._seekers_by_user.values() if s.since < before]
+        for user_id in expired:
+            self.remove_seeker(user_id)
+        return expired
+
+    def stats(self) -> Dict[str, int]:
+        return {'offers': len(self._offers_by_id), 'seekers': len(self._seekers_by_user)}
+
+
+# Общая очередь рынка труда для хендлеров и планировщика
+job_matcher = JobMatcher()
@@ -0,0 +1,233 @@
+import math
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import update # type: ignore
+from sqlalchemy.orm import Session, joinedload # type: ignore
+from models.job_offer import JobOffer
+from models.user import User
+from services.job_market import Offer, Seeker, job_matcher
+from config import config
+
+# Размер пачки при очистке просроченных предложений
+EXPIRE_BATCH_SIZE = 500
+
+
+class JobMarketService:
+    """Рынок труда: предложения работы и контракты
+
+    Открытые предложения дублируются в памяти (JobMatcher), где с ними
+    сопоставляются ищущие работу игроки. В БД списки строятся только
+    по индексам (status, salary) и (status, created_at), поэтому тысячи
+    открытых предложений не приводят к полному просмотру таблицы.
+    Очередь соискателей в БД не сохраняется: после перезапуска бота
+    игрокам нужно встать в нее заново, о чем им сообщает seek_job.
+    """
+
+    def __init__(self):
+        self.matcher = job_matcher
+
+    def load_open_offers(self, session: Session) -> int:
+        """Загрузка открытых предложений в очередь при запуске"""
+        rows = session.query(JobOffer).filter(
+            JobOffer.status == 'open'
+        ).order_by(JobOffer.created_at).all()
+
+        for row in rows:
+            self.matcher.restore(self._to_offer(row))
+
+        return len(rows)
+
+    @staticmethod
+    def _to_offer(row: JobOffer) -> Offer:
+        return Offer(
+            id=row.id,
+            employer_id=row.employer_id,
+            salary=row.salary,
+            duration_hours=row.duration_hours,
+            created_at=row.created_at
+        )
+
+    def post_offer(self, session: Session, employer_id: int, salary: float,
+                   duration_hours: int) -> tuple[bool, str, Optional[JobOffer]]:
+        """Публикация предложения работы
+
+        Если в очереди есть подходящий соискатель, контракт заключается
+        сразу, и возвращенное предложение уже принято.
+        """
+        if not math.isfinite(salary) or salary <= 0:
+            return False, "Зарплата должна быть положительным числом", None
+
+        if duration_hours not in config.JOB_DURATIONS:
+            return False, "Недопустимая длительность контракта", None
+
+        employer = session.query(User).filter(User.id == employer_id).first()
+        if not employer:
+            return False, "Пользователь не найден", None
+
+        total = salary * duration_hours
+        if employer.balance < total:
+            return False, f"Недостаточно средств на весь контракт. Нужно: ${total:,.2f}", None
+
+        if self.matcher.user_offer_count(employer_id) >= config.MAX_OPEN_JOB_OFFERS:
+            return False, f"У вас уже {config.MAX_OPEN_JOB_OFFERS} открытых предложений", None
+
+        row = JobOffer(
+            employer_id=employer_id,
+            salary=salary,
+            duration_hours=duration_hours,
+            status='open',
+            created_at=datetime.utcnow()
+        )
+        session.add(row)
+        session.commit()
+
+        match = self.matcher.add_offer(self._to_offer(row))
+        if match and self._accept(session, match.offer.id, match.employee_id):
+            session.refresh(row)
+            return True, f"🤝 Предложение #{row.id} сразу принято игроком из очереди!", row
+
+        if match:
+            # Предложение не удалось закрепить в БД - возвращаем его в очередь
+            self.matcher.restore(self._to_offer(row))
+
+        return True, f"✅ Предложение #{row.id} опубликовано", row
+
+    def seek_job(self, session: Session, user_id: int,
+                 min_salary: float = 0.0) -> tuple[bool, str, Optional[JobOffer]]:
+        """Поиск работы: лучшее подходящее предложение или место в очереди"""
+        if not math.isfinite(min_salary) or min_salary < 0:
+            return False, "Зарплата должна быть неотрицательным числом", None
+
+        if self.get_active_contract(session, user_id):
+            return False, "У вас уже есть активный контракт", None
+
+        while True:
+            match = self.matcher.add_seeker(Seeker(user_id=user_id, min_salary=min_salary, since=datetime.utcnow()))
+            if match is None:
+                # Очередь соискателей хранится только в памяти процесса
+                return True, (
+                    "⏳ Подходящих предложений пока нет. Вы в очереди - мы сообщим о работе.\n"
+                    f"Очередь действует {config.JOB_OFFER_TTL_HOURS} ч и сбрасывается при перезапуске бота"
+                ), None
+
+            if self._accept(session, match.offer.id, user_id):
+                return True, f"🤝 Вы приняты на работу по предложению #{match.offer.id}", self._load(session, match.offer.id)
+            # Предложение уже закрыто в БД (отменено или просрочено) - ищем следующее
+
+    def accept_offer(self, session: Session, user_id: int, offer_id: int) -> tuple[bool, str, Optional[JobOffer]]:
+        """Принятие конкретного предложения из списка"""
+        if self.get_active_contract(session, user_id):
+            return False, "У вас уже есть активный контракт", None
+
+        if not self._accept(session, offer_id, user_id):
+            return False, "Предложение недоступно", None
+
+        self.matcher.remove_offer(offer_id)
+        self.matcher.remove_seeker(user_id)
+        return True, f"🤝 Вы приняты на работу по предложению #{offer_id}", self._load(session, offer_id)
+
+    def cancel_offer(self, session: Session, employer_id: int, offer_id: int) -> tuple[bool, str]:
+        """Отмена своего открытого предложения"""
+        offers = JobOffer.__table__
+        result = session.execute(
+            update(offers)
+            .where(
+                offers.c.id == offer_id,
+                offers.c.employer_id == employer_id,
+                offers.c.status == 'open'
+            )
+            .values(status='cancelled')
+        )
+        session.commit()
+
+        if not result.rowcount:
+            return False, "Предложение не найдено или уже закрыто"
+
+        self.matcher.remove_offer(offer_id)
+        return True, f"✅ Предложение #{offer_id} отменено"
+
+    def _accept(self, session: Session, offer_id: int, employee_id: int) -> bool:
+        """Закрепление контракта условным UPDATE (только пока предложение открыто)"""
+        offers = JobOffer.__table__
+        result = session.execute(
+            update(offers)
+            .where(
+                offers.c.id == offer_id,
+                offers.c.status == 'open',
+                offers.c.employer_id != employee_id
+            )
+            .values(status='accepted', employee_id=employee_id, accepted_at=datetime.utcnow())
+        )
+        session.commit()
+        return bool(result.rowcount)
+
+    @staticmethod
+    def _load(session: Session, offer_id: int) -> Optional[JobOffer]:
+        return session.query(JobOffer).options(
+            joinedload(JobOffer.employer), joinedload(JobOffer.employee)
+        ).filter(JobOffer.id == offer_id).first()
+
+    def get_open_offers(self, session: Session, limit: int = 10, offset: int = 0) -> List[JobOffer]:
+        """Открытые предложения по убыванию зарплаты (индекс status, salary)"""
+        return session.query(JobOffer).options(joinedload(JobOffer.employer)).filter(
+            JobOffer.status == 'open'
+        ).order_by(JobOffer.salary.desc()).offset(offset).limit(limit).all()
+
+    def get_user_offers(self, session: Session, employer_id: int) -> List[JobOffer]:
+        """Открытые предложения и действующие контракты работодателя"""
+        return session.query(JobOffer).options(joinedload(JobOffer.employee)).filter(
+            JobOffer.employer_id == employer_id,
+            JobOffer.status.in_(['open', 'accepted'])
+        ).order_by(JobOffer.created_at.desc()).all()
+
+    def get_active_contract(self, session: Session, employee_id: int) -> Optional[JobOffer]:
+        """Действующий контракт работника"""
+        return session.query(JobOffer).options(joinedload(JobOffer.employer)).filter(
+            JobOffer.employee_id == employee_id,
+            JobOffer.status == 'accepted'
+        ).first()
+
+    def expire_offers(self, session: Session, batch_size: int = EXPIRE_BATCH_SIZE) -> List[int]:
+        """Закрытие просроченных открытых предложений
+
+        Идет по индексу (status, created_at) от самых старых пачками, так
+        что объем работы зависит только от числа просроченных предложений.
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=config.JOB_OFFER_TTL_HOURS)
+        offers = JobOffer.__table__
+        expired: List[int] = []
+
+        while True:
+            ids = [
+                row.id for row in session.query(JobOffer.id).filter(
+                    JobOffer.status == 'open',
+                    JobOffer.created_at < cutoff
+                ).order_by(JobOffer.created_at).limit(batch_size)
+            ]
+            if not ids:
+                break
+
+            session.execute(
+                update(offers)
+                .where(offers.c.id.in_(ids), offers.c.status == 'open')
+                .values(status='expired')
+            )
+            session.commit()
+            expired.extend(ids)
+
+            if len(ids) < batch_size:
+                break
+
+        return expired
+
+    def expire_queue(self, expired_offer_ids: List[int]) -> List[int]:
+        """Очистка очереди в памяти: просроченные предложения и соискатели
+
+        Вызывается в цикле событий, где с очередью работают хендлеры.
+        Возвращает игроков, снятых из очереди соискателей.
+        """
+        for offer_id in expired_offer_ids:
+            self.matcher.remove_offer(offer_id)
+
+        cutoff = datetime.utcnow() - timedelta(hours=config.JOB_OFFER_TTL_HOURS)
+        return self.matcher.expire_seekers(cutoff)
@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+from utils.loop_monitor import loop_monitor
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    """Выполнение фоновых задач без блокировки цикла событий
+
+    Блокирующие шаги (запросы к БД, расчеты) выполняются в отдельном
+    пуле потоков через run_blocking, а в цикле остаются только
+    отправки сообщений в Telegram.
+    """
+
+    def __init__(self, max_workers: int = 4, slow_job: float = 30.0):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jobs")
+        self.slow_job = slow_job
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    async def run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполнение синхронной функции в пуле потоков задач"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def wrap(self, name: str, func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Обертка задачи планировщика: метка для монитора цикла, время, ошибки"""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                with loop_monitor.track(f"job:{name}"):
+                    return await func(*args, **kwargs)
+            except Exception as e:
+                logger.exception(f"Error in {name}: {e}")
+            finally:
+                duration = time.monotonic() - started
+                if duration > self.slow_job:
+                    logger.warning(f"Job {name} took {duration:.2f}s")
+        return wrapper
@@ -0,0 +1,146 @@
+import asyncio
+from typing import Any, Callable, Dict, Optional
+from config import config
+
+# Допустимое расхождение цены пула и котировки, после которого пул
+# перестраивается под котировку (изменение цены планировщиком или стаканом)
+RECENTER_TOLERANCE = 1e-6
+
+
+class LiquidityPool:
+    """Пул ликвидности акции по модели постоянного произведения
+
+    Резервы пула: shares акций и cash денег, их произведение k при
+    сделках не меняется. Цена акции равна cash / shares, поэтому
+    крупная покупка двигает цену вверх, а продажа - вниз.
+    """
+
+    def __init__(self, symbol: str, price: float, depth: float):
+        self.symbol = symbol
+        self.depth = depth
+        self.shares = float(depth)
+        self.cash = price * depth
+
+    @property
+    def price(self) -> float:
+        return self.cash / self.shares
+
+    def quote_buy(self, quantity: int) -> Optional[float]:
+        """Стоимость покупки quantity акций (None, если не хватает ликвидности)"""
+        if quantity >= self.shares:
+            return None
+        k = self.cash * self.shares
+        return k / (self.shares - quantity) - self.cash
+
+    def quote_sell(self, quantity: int) -> float:
+        """Выручка от продажи quantity акций (до налога)"""
+        k = self.cash * self.shares
+        return self.cash - k / (self.shares + quantity)
+
+    def buy(self, quantity: int) -> float:
+        """Исполнение покупки и сдвиг резервов"""
+        cost = self.quote_buy(quantity)
+        if cost is None:
+            raise ValueError("Недостаточно ликвидности")
+        self.cash += cost
+        self.shares -= quantity
+        return cost
+
+    def sell(self, quantity: int) -> float:
+        """Исполнение продажи и сдвиг резервов"""
+        proceeds = self.quote_sell(quantity)
+        self.cash -= proceeds
+        self.shares += quantity
+        return proceeds
+
+    def recenter(self, price: float):
+        """Перестройка пула под новую цену с исходной глубиной"""
+        self.shares = float(self.depth)
+        self.cash = price * self.depth
+
+
+class LiquidityPools:
+    """Пулы всех акций, создаются при первом обращении"""
+
+    def __init__(self, default_depth: float = config.STOCK_POOL_DEPTH):
+        self.default_depth = default_depth
+        self._pools: Dict[str, LiquidityPool] = {}
+
+    def get(self, symbol: str, current_price: float, depth: Optional[float] = None) -> LiquidityPool:
+        """Пул акции, согласованный с текущей котировкой"""
+        pool = self._pools.get(symbol)
+
+        if pool is None:
+            pool = self._pools[symbol] = LiquidityPool(symbol, current_price, depth or self.default_depth)
+        elif abs(pool.price - current_price) > RECENTER_TOLERANCE * max(current_price, 1.0):
+            pool.recenter(current_price)
+
+        return pool
+
+
+class SymbolTradeQueue:
+    """Последовательное исполнение сделок по каждой акции
+
+    Сделки по одной акции выполняются строго по очереди одним
+    обработчиком, поэтому не конкурируют за строку акции в БД и за
+    резервы пула. Сделки по разным акциям идут параллельно в потоках.
+    Очереди создаются только для акций, которые признает known, а
+    обработчик, простоявший idle секунд, завершается вместе с очередью.
+    """
+
+    def __init__(self, known: Optional[Callable[[str], bool]] = None,
+                 maxsize: int = 1000, idle: float = 60.0):
+        self.known = known
+        self.maxsize = maxsize
+        self.idle = idle
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    async def run(self, symbol: str, func: Callable[..., Any], *args) -> Any:
+        """Постановка синхронной функции в очередь акции и ожидание результата
+
+        Для неизвестной акции поднимается LookupError.
+        """
+        queue = self._queues.get(symbol)
+        if queue is None:
+            if self.known is not None and not self.known(symbol):
+                raise LookupError(f"неизвестная акция {symbol!r}")
+            queue = self._queues[symbol] = asyncio.Queue(maxsize=self.maxsize)
+
+        worker = self._workers.get(symbol)
+        if worker is None or worker.done():
+            self._workers[symbol] = asyncio.create_task(self._worker(symbol, queue))
+
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((func, args, future))
+        return await future
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    async def _worker(self, symbol: str, queue: asyncio.Queue):
+        while True:
+            try:
+                func, args, future = await asyncio.wait_for(queue.get(), self.idle)
+            except asyncio.TimeoutError:
+                if not queue.empty():
+                    continue
+                # Между проверкой и удалением переключения нет, поэтому
+                # новая сделка попадет уже в новую очередь
+                del self._queues[symbol]
+                del self._workers[symbol]
+                return
+            try:
+                result = await asyncio.to_thread(func, *args)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                queue.task_done()
+
+
+# Общие пулы (очередь сделок symbol_trades - в stock_service, рядом с котировками)
+liquidity_pools = LiquidityPools()
@@ -0,0 +1,165 @@
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from utils.topk import TopK
+from config import config
+
+# Закрытий в скользящем окне: сутки плановых обновлений цен (хотя бы одно)
+ANALYTICS_WINDOW = max(1, 24 * 60 // config.STOCK_UPDATE_INTERVAL_MINUTES)
+
+
+@dataclass(frozen=True)
+class MarketStats:
+    """Снимок показателей акции для экранов и канала"""
+    symbol: str
+    price: float
+    previous_close: Optional[float]
+    change_pct: Optional[float]  # Изменение к предыдущему закрытию, %
+    volatility: Optional[float]  # Ст. отклонение доходности за окно, %
+    volume: int                  # Акций в сделках за окно (сутки)
+
+
+class _Series:
+    """Скользящие показатели одной акции
+
+    Доходности и объемы закрытых периодов лежат в очередях длиной
+    window, а их суммы поддерживаются при добавлении и вытеснении,
+    поэтому каждое событие стоит O(1) независимо от длины истории.
+    """
+
+    __slots__ = (
+        "price", "previous_close", "period_volume",
+        "returns", "volumes", "_sum", "_sumsq", "_volume_sum"
+    )
+
+    def __init__(self, price: float, window: int):
+        self.price = price
+        self.previous_close: Optional[float] = None
+        self.period_volume = 0
+        self.returns: Deque[float] = deque(maxlen=window)
+        self.volumes: Deque[int] = deque(maxlen=window)
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._volume_sum = 0
+
+    def close(self, new_price: float):
+        """Закрытие периода по текущей цене и начало нового с new_price"""
+        if self.previous_close:
+            r = self.price / self.previous_close - 1
+            if len(self.returns) == self.returns.maxlen:
+                old = self.returns[0]
+                self._sum -= old
+                self._sumsq -= old * old
+            self.returns.append(r)
+            self._sum += r
+            self._sumsq += r * r
+
+        if len(self.volumes) == self.volumes.maxlen:
+            self._volume_sum -= self.volumes[0]
+        self.volumes.append(self.period_volume)
+        self._volume_sum += self.period_volume
+        self.period_volume = 0
+
+        self.previous_close = self.price
+        self.price = new_price
+
+    def volatility(self) -> Optional[float]:
+        n = len(self.returns)
+        if n < 2:
+            return None
+        variance = (self._sumsq - self._sum * self._sum / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0)) * 100
+
+    def snapshot(self, symbol: str) -> MarketStats:
+        previous = self.previous_close
+        return MarketStats(
+            symbol=symbol,
+            price=self.price,
+            previous_close=previous,
+            change_pct=(self.price / previous - 1) * 100 if previous else None,
+            volatility=self.volatility(),
+            volume=self._volume_sum + self.period_volume
+        )
+
+
+class MarketAnalytics:
+    """Показатели рынка, обновляемые по мере торгов
+
+    Каждое плановое обновление цен закрывает период: цена перед ним
+    становится предыдущим закрытием, а доходность и объем периода
+    попадают в скользящее окно. Сделки двигают текущую цену и объем.
+    Экраны и канал читают готовые снимки, не обращаясь к истории в БД.
+    Обновления идут из потоков хендлеров и планировщика, поэтому
+    изменения защищены блокировкой.
+    """
+
+    def __init__(self, window: int = ANALYTICS_WINDOW):
+        # Пустое окно сломало бы вытеснение в _Series.close
+        self.window = max(1, window)
+        self.version = 0
+        self._series: Dict[str, _Series] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, symbol: str, price: float) -> _Series:
+        series = self._series.get(symbol)
+        if series is None:
+            series = self._series[symbol] = _Series(price, self.window)
+        return series
+
+    def seed(self, prices: Iterable[Tuple[str, float]]):
+        """Начальные цены (при запуске) - они же первое закрытие
+
+        Изменение к закрытию считается сразу после запуска, не дожидаясь
+        планового обновления цен. Уже известные акции не меняются.
+        """
+        with self._lock:
+            for symbol, price in prices:
+                if symbol not in self._series:
+                    self._get(symbol, price).previous_close = price
+            self.version += 1
+
+    def record_close(self, prices: Iterable[Tuple[str, float]]):
+        """Плановое обновление цен: закрытие периода по каждой акции"""
+        with self._lock:
+            for symbol, price in prices:
+                series = self._series.get(symbol)
+                if series is None:
+                    self._get(symbol, price)
+                else:
+                    series.close(price)
+            self.version += 1
+
+    def record_trade(self, symbol: str, price: float, quantity: int):
+        """Сделка: новая цена и объем текущего периода"""
+        with self._lock:
+            series = self._get(symbol, price)
+            series.price = price
+            series.period_volume += quantity
+            self.version += 1
+
+    def get(self, symbol: str) -> Optional[MarketStats]:
+        with self._lock:
+            series = self._series.get(symbol)
+            return series.snapshot(symbol) if series is not None else None
+
+    def all(self) -> Dict[str, MarketStats]:
+        with self._lock:
+            return {symbol: series.snapshot(symbol) for symbol, series in self._series.items()}
+
+    def prices(self) -> Dict[str, float]:
+        with self._lock:
+            return {symbol: series.price for symbol, series in self._series.items()}
+
+    def top_movers(self, limit: int) -> List[MarketStats]:
+        """Акции с наибольшим по модулю изменением к предыдущему закрытию"""
+        movers: TopK[MarketStats] = TopK(limit)
+        for stats in self.all().values():
+            if stats.change_pct:
+                movers.push(abs(stats.change_pct), stats)
+        return [stats for _, stats in movers.items()]
+
+
+# Общие показатели рынка для сервисов, хендлеров и канала
+market_analytics = MarketAnalytics()
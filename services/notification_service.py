@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Union
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
+from middlewares.throttling import MemoryBucketStorage
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты уведомлений (меньше - раньше)
+HIGH = 0    # Личные сообщения о деньгах: призы, зарплата, контракты
+NORMAL = 1  # Прочие личные сообщения
+LOW = 2     # Публикации в канал
+
+# Лимиты Telegram: около 30 сообщений в секунду на бота и 1 в секунду в один чат
+GLOBAL_RATE = 25.0
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+
+MAX_ATTEMPTS = 3
+
+
+@dataclass(order=True)
+class Notification:
+    """Сообщение в очереди отправки"""
+    priority: int
+    seq: int
+    chat_id: Union[int, str] = field(compare=False)
+    text: str = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class NotificationService:
+    """Фоновая отправка уведомлений
+
+    notify() только ставит сообщение в ограниченную очередь с приоритетом
+    и сразу возвращается, поэтому задачи планировщика и хендлеры не ждут
+    Telegram. Несколько отправителей разбирают очередь параллельно,
+    соблюдая общий лимит бота и лимит на чат. Сообщение с уже
+    встречавшимся dedup_key в течение dedup_ttl секунд отбрасывается.
+
+    Отправитель не ждет лимита конкретного чата: если ведро чата пусто,
+    сообщение откладывается и возвращается в очередь позже, а
+    отправитель берет следующее. Поэтому поток постов в один канал не
+    занимает всех отправителей и не задерживает личные сообщения.
+    """
+
+    def __init__(self, bot: Bot, workers: int = 4, max_size: int = 10000,
+                 rate: float = GLOBAL_RATE, chat_rate: float = CHAT_RATE,
+                 dedup_ttl: float = 3600.0):
+        self.bot = bot
+        self.workers = workers
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.dedup_ttl = dedup_ttl
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=max_size)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.duplicates = 0
+
+        self._buckets = MemoryBucketStorage()
+        self._seen: Dict[str, float] = {}
+        self._next_sweep = time.monotonic() + dedup_ttl
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._deferred: Set[asyncio.TimerHandle] = set()
+
+    def notify(self, chat_id: Union[int, str], text: str, priority: int = NORMAL,
+               dedup_key: Optional[str] = None) -> bool:
+        """Постановка сообщения в очередь (False - дубликат или очередь полна)"""
+        if not chat_id:
+            return False
+
+        if dedup_key is not None and self._is_duplicate(dedup_key):
+            self.duplicates += 1
+            return False
+
+        try:
+            self.queue.put_nowait(Notification(priority, next(self._seq), chat_id, text))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Notification queue is full, dropped message to {chat_id}")
+            return False
+
+        return True
+
+    def _is_duplicate(self, key: str) -> bool:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._seen = {k: expires for k, expires in self._seen.items() if expires > now}
+            self._next_sweep = now + self.dedup_ttl
+
+        expires = self._seen.get(key)
+        if expires is not None and expires > now:
+            return True
+
+        self._seen[key] = now + self.dedup_ttl
+        return False
+
+    def start(self):
+        """Запуск отправителей в текущем цикле событий"""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"notifications-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float = 5.0):
+        """Остановка: очередь дописывается не дольше timeout секунд"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            lost = self.queue.qsize() + len(self._deferred)
+            logger.warning(f"Notification queue not drained on shutdown, {lost} messages lost")
+        for handle in self._deferred:
+            handle.cancel()
+        self._deferred.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _drain(self):
+        """Ожидание, пока очередь и отложенные сообщения не будут отправлены"""
+        while True:
+            await self.queue.join()
+            if not self._deferred:
+                return
+            await asyncio.sleep(1 / self.chat_rate)
+
+    def _defer(self, notification: Notification, delay: float):
+        """Возврат сообщения в очередь через delay секунд"""
+        def requeue():
+            self._deferred.discard(handle)
+            try:
+                self.queue.put_nowait(notification)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._deferred.add(handle)
+
+    async def _worker(self):
+        while True:
+            notification = await self.queue.get()
+            try:
+                await self._send(notification)
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Error sending notification to {notification.chat_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _send(self, notification: Notification):
+        # Сначала лимит чата: без токена сообщение откладывается, а не
+        # занимает отправителя и общий токен
+        if not await self._buckets.consume(("chat", notification.chat_id), self.chat_rate, CHAT_BURST):
+            self._defer(notification, 1 / self.chat_rate)
+            return
+        await self._acquire(("global",), self.rate, max(1, int(self.rate)))
+
+        try:
+            await self.bot.send_message(notification.chat_id, notification.text)
+            self.sent += 1
+        except TelegramRetryAfter as e:
+            # Telegram просит подождать - сообщение вернется в очередь после паузы
+            notification.attempts += 1
+            if notification.attempts >= MAX_ATTEMPTS:
+                raise
+            self._defer(notification, e.retry_after)
+        except (TelegramForbiddenError, TelegramNotFound) as e:
+            # Игрок заблокировал бота или чат удален - повтор бесполезен
+            self.failed += 1
+            logger.debug(f"Notification to {notification.chat_id} rejected: {e}")
+
+    async def _acquire(self, key, rate: float, burst: int):
+        while not await self._buckets.consume(key, rate, burst):
+            await asyncio.sleep(1 / rate)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': self.queue.qsize(),
+            'deferred': len(self._deferred),
+            'sent': self.sent,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'duplicates': self.duplicates,
+        }
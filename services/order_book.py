@@ -0,0 +1,255 @@
+import heapq
+import itertools
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+BUY = 'buy'
+SELL = 'sell'
+
+LIMIT = 'limit'
+MARKET = 'market'
+
+
+@dataclass
+class Order:
+    """Заявка в стакане"""
+    id: int
+    user_id: int
+    symbol: str
+    side: str
+    order_type: str
+    price: float  # Для рыночных заявок - предельная цена исполнения
+    quantity: int
+    remaining: int
+    escrow_price: float  # Зарезервированная цена за акцию (деньги или средняя цена акций)
+    seq: int = 0
+    created_at: Optional[datetime] = None
+    active: bool = True
+
+
+@dataclass(frozen=True)
+class Fill:
+    """Сделка между двумя заявками"""
+    symbol: str
+    price: float
+    quantity: int
+    buy_order: Order
+    sell_order: Order
+
+
+@dataclass(frozen=True)
+class Release:
+    """Возврат зарезервированного по снятой заявке"""
+    order: Order
+    quantity: int
+
+
+class OrderBook:
+    """Стакан одной акции с приоритетом цена-время
+
+    Заявки хранятся в двух кучах: покупки по убыванию цены, продажи по
+    возрастанию. Снятые заявки удаляются из кучи лениво, при выходе на
+    вершину.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.last_price: Optional[float] = None
+        self._bids: List[Tuple[float, int, Order]] = []
+        self._asks: List[Tuple[float, int, Order]] = []
+
+    def match(self, order: Order, releases: List[Release]) -> List[Fill]:
+        """Исполнение входящей заявки против встречных"""
+        fills = []
+        book = self._asks if order.side == BUY else self._bids
+
+        while order.remaining > 0 and book:
+            _, _, resting = book[0]
+
+            if not resting.active or resting.remaining == 0:
+                heapq.heappop(book)
+                continue
+
+            if order.side == BUY and resting.price > order.price:
+                break
+            if order.side == SELL and resting.price < order.price:
+                break
+
+            # Самому себе не продаем: снимаем старую встречную заявку
+            if resting.user_id == order.user_id:
+                heapq.heappop(book)
+                resting.active = False
+                releases.append(Release(order=resting, quantity=resting.remaining))
+                resting.remaining = 0
+                continue
+
+            quantity = min(order.remaining, resting.remaining)
+            order.remaining -= quantity
+            resting.remaining -= quantity
+            self.last_price = resting.price
+
+            if order.side == BUY:
+                fills.append(Fill(self.symbol, resting.price, quantity, order, resting))
+            else:
+                fills.append(Fill(self.symbol, resting.price, quantity, resting, order))
+
+            if resting.remaining == 0:
+                resting.active = False
+                heapq.heappop(book)
+
+        return fills
+
+    def rest(self, order: Order):
+        """Постановка остатка лимитной заявки в стакан"""
+        if order.side == BUY:
+            heapq.heappush(self._bids, (-order.price, order.seq, order))
+        else:
+            heapq.heappush(self._asks, (order.price, order.seq, order))
+
+    def best_bid(self) -> Optional[float]:
+        self._drop_inactive(self._bids)
+        return -self._bids[0][0] if self._bids else None
+
+    def best_ask(self) -> Optional[float]:
+        self._drop_inactive(self._asks)
+        return self._asks[0][0] if self._asks else None
+
+    def depth(self, levels: int = 5) -> Dict[str, List[Tuple[float, int]]]:
+        """Агрегированный стакан по ценовым уровням"""
+        return {
+            BUY: self._aggregate(self._bids, levels, sign=-1),
+            SELL: self._aggregate(self._asks, levels, sign=1),
+        }
+
+    @staticmethod
+    def _aggregate(book, levels: int, sign: int) -> List[Tuple[float, int]]:
+        volumes: Dict[float, int] = {}
+        for key, _, order in book:
+            if order.active and order.remaining > 0:
+                price = key * sign
+                volumes[price] = volumes.get(price, 0) + order.remaining
+        prices = sorted(volumes, reverse=(sign < 0))[:levels]
+        return [(price, volumes[price]) for price in prices]
+
+    @staticmethod
+    def _drop_inactive(book):
+        while book and (not book[0][2].active or book[0][2].remaining == 0):
+            heapq.heappop(book)
+
+
+class MatchingEngine:
+    """Биржевой движок: стаканы всех акций и очередь сделок к расчету
+
+    Движок работает только в памяти. Сделки и возвраты копятся до
+    вызова drain(), после чего ExchangeService проводит их в БД одной
+    пачкой.
+    """
+
+    def __init__(self):
+        self.books: Dict[str, OrderBook] = {}
+        self._orders: Dict[int, Order] = {}
+        self._seq = itertools.count(1)
+        self._fills: List[Fill] = []
+        self._releases: List[Release] = []
+
+    def book(self, symbol: str) -> OrderBook:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+        return book
+
+    def submit(self, order: Order) -> List[Fill]:
+        """Прием заявки: исполнение и постановка остатка в стакан"""
+        order.seq = next(self._seq)
+        book = self.book(order.symbol)
+
+        released_before = len(self._releases)
+        fills = book.match(order, self._releases)
+        self._fills.extend(fills)
+
+        for fill in fills:
+            resting = fill.sell_order if order.side == BUY else fill.buy_order
+            if resting.remaining == 0:
+                self._orders.pop(resting.id, None)
+
+        for release in self._releases[released_before:]:
+            self._orders.pop(release.order.id, None)
+
+        if order.remaining > 0:
+            if order.order_type == LIMIT:
+                book.rest(order)
+                self._orders[order.id] = order
+            else:
+                # Неисполненный остаток рыночной заявки снимается
+                self._releases.append(Release(order=order, quantity=order.remaining))
+                order.remaining = 0
+                order.active = False
+        else:
+            order.active = False
+
+        return fills
+
+    def restore(self, order: Order):
+        """Возврат открытой заявки в стакан после перезапуска"""
+        order.seq = next(self._seq)
+        self.book(order.symbol).rest(order)
+        self._orders[order.id] = order
+
+    def cancel(self, user_id: int, order_id: int) -> Optional[Order]:
+        """Снятие заявки пользователя"""
+        order = self._orders.get(order_id)
+        if not order or order.user_id != user_id or not order.active:
+            return None
+
+        order.active = False
+        self._releases.append(Release(order=order, quantity=order.remaining))
+        order.remaining = 0
+        del self._orders[order_id]
+        return order
+
+    def user_orders(self, user_id: int) -> List[Order]:
+        """Открытые заявки пользователя"""
+        return sorted(
+            (o for o in self._orders.values() if o.user_id == user_id and o.active),
+            key=lambda o: o.seq
+        )
+
+    def drain(self) -> Tuple[List[Fill], List[Release]]:
+        """Забрать накопленные сделки и возвраты для расчета"""
+        fills, self._fills = self._fills, []
+        releases, self._releases = self._releases, []
+        return fills, releases
+
+    @staticmethod
+    def snapshot(fills: List[Fill], releases: List[Release]) -> Tuple[List[Fill], List[Release]]:
+        """Копии сделок и возвратов с копиями заявок на текущий момент
+
+        Движок продолжает менять заявки (остаток, активность), пока
+        пачка рассчитывается в другом потоке, поэтому расчету передаются
+        копии, снятые в цикле событий. Каждая заявка копируется один раз.
+        """
+        copies: Dict[int, Order] = {}
+
+        def copy(order: Order) -> Order:
+            snapshot = copies.get(order.id)
+            if snapshot is None:
+                snapshot = copies[order.id] = replace(order)
+            return snapshot
+
+        return (
+            [replace(f, buy_order=copy(f.buy_order), sell_order=copy(f.sell_order)) for f in fills],
+            [replace(r, order=copy(r.order)) for r in releases]
+        )
+
+    def requeue(self, fills: List[Fill], releases: List[Release]):
+        """Вернуть сделки в очередь, если расчет не удался"""
+        self._fills[:0] = fills
+        self._releases[:0] = releases
+
+    def has_pending(self) -> bool:
+        return bool(self._fills or self._releases)
+
+
+# Общий движок для хендлеров и планировщика
+matching_engine = MatchingEngine()
@@ -0,0 +1,211 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import bindparam, select, update # type: ignore
+from sqlalchemy.exc import IntegrityError # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from models.job_offer import JobOffer
+from models.user import User
+from services.achievement_service import BALANCE, AchievementEvent, achievement_engine
+from services.transaction_writer import TransactionWriter
+
+logger = logging.getLogger(__name__)
+
+# Контрактов в одной транзакции расчета
+PAYROLL_CHUNK_SIZE = 500
+
+# Счетчики статистики расчета
+PAYROLL_STATS = ('contracts', 'hours', 'paid', 'completed', 'terminated')
+
+# Попыток пересчитать пачку, если балансы работодателей изменились во время расчета
+PAYROLL_RETRIES = 3
+
+
+class BalanceChanged(Exception):
+    """Баланс работодателя уменьшился между чтением и списанием"""
+
+
+class PayrollService:
+    """Почасовая выплата зарплат по принятым контрактам
+
+    Контракты обрабатываются пачками по первичному ключу, каждая пачка -
+    одна короткая транзакция: executemany-обновления балансов и
+    контрактов и пакетная вставка транзакций. Каждая выплата получает
+    ключ идемпотентности "payroll:<контракт>:<первый оплачиваемый час>",
+    поэтому повторный или параллельный запуск не проведет ее дважды,
+    а прерванный расчет просто продолжится со следующей пачки.
+    Списание с работодателя условное (баланс не ниже выплаты): если
+    он успел потратить деньги после чтения, пачка пересчитывается.
+    """
+
+    def __init__(self, chunk_size: int = PAYROLL_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def run(self, session: Session) -> Dict[str, float]:
+        """Расчет всех контрактов, по которым наступила выплата"""
+        now = datetime.utcnow()
+        stats = dict.fromkeys(PAYROLL_STATS, 0)
+        last_id = 0
+
+        while True:
+            contracts = session.execute(
+                select(
+                    JobOffer.id, JobOffer.employer_id, JobOffer.employee_id, JobOffer.salary,
+                    JobOffer.duration_hours, JobOffer.accepted_at, JobOffer.paid_hours
+                ).where(
+                    JobOffer.status == 'accepted',
+                    JobOffer.id > last_id
+                ).order_by(JobOffer.id).limit(self.chunk_size)
+            ).all()
+            if not contracts:
+                break
+            last_id = contracts[-1].id
+
+            for _ in range(PAYROLL_RETRIES):
+                try:
+                    chunk_stats = self._settle_chunk(session, contracts, now)
+                except BalanceChanged:
+                    # Работодатель успел потратить деньги - пересчитываем
+                    # пачку по свежим балансам
+                    session.rollback()
+                    continue
+                except IntegrityError:
+                    # Эти выплаты уже провел другой запуск: пачка откатывается,
+                    # контракты будут перечитаны при следующем расчете
+                    session.rollback()
+                    logger.warning(f"Payroll chunk from contract {contracts[0].id} was already settled by another run, skipping")
+                    break
+                for key, value in chunk_stats.items():
+                    stats[key] += value
+                break
+            else:
+                logger.warning(f"Payroll chunk from contract {contracts[0].id} skipped: employer balances kept changing")
+
+            if len(contracts) < self.chunk_size:
+                break
+
+        return stats
+
+    def _settle_chunk(self, session: Session, contracts, now: datetime) -> Dict[str, float]:
+        """Расчет одной пачки контрактов, возвращает статистику пачки"""
+        stats = dict.fromkeys(PAYROLL_STATS, 0)
+        # Часы к оплате по каждому контракту
+        due: List[Tuple[object, int]] = []
+        for contract in contracts:
+            if contract.accepted_at is None:
+                continue
+            worked = int((now - contract.accepted_at).total_seconds() // 3600)
+            hours = min(worked, contract.duration_hours) - (contract.paid_hours or 0)
+            if hours > 0:
+                due.append((contract, hours))
+
+        if not due:
+            return stats
+
+        employer_ids = {contract.employer_id for contract, _ in due}
+        balances = dict(session.execute(
+            select(User.id, User.balance).where(User.id.in_(employer_ids))
+        ).all())
+
+        earned: Dict[int, float] = defaultdict(float)
+        spent: Dict[int, float] = defaultdict(float)
+        contract_updates = []
+        writer = TransactionWriter(session)
+
+        for contract, hours in due:
+            paid_hours = contract.paid_hours or 0
+            available = balances.get(contract.employer_id, 0.0)
+            # Работодатель платит столько часов, сколько может; если не может
+            # оплатить ни часа, контракт расторгается
+            affordable = min(hours, int(available // contract.salary)) if contract.salary > 0 else hours
+            status = 'accepted'
+
+            if affordable > 0:
+                amount = round(affordable * contract.salary, 2)
+                balances[contract.employer_id] = available - amount
+                spent[contract.employer_id] += amount
+                earned[contract.employee_id] += amount
+
+                key = f"payroll:{contract.id}:{paid_hours}"
+                details = {
+                    'contract_id': contract.id,
+                    'hours': affordable,
+                    'from_hour': paid_hours,
+                    'salary': contract.salary
+                }
+                writer.add(
+                    contract.employer_id, 'salary_payment', -amount,
+                    {**details, 'employee_id': contract.employee_id},
+                    created_at=now, idempotency_key=f"{key}:out"
+                )
+                writer.add(
+                    contract.employee_id, 'salary', amount,
+                    {**details, 'employer_id': contract.employer_id},
+                    created_at=now, idempotency_key=f"{key}:in"
+                )
+
+                stats['hours'] += affordable
+                stats['paid'] += amount
+                paid_hours += affordable
+
+            if paid_hours >= contract.duration_hours:
+                status = 'completed'
+                stats['completed'] += 1
+            elif affordable < hours:
+                status = 'terminated'
+                stats['terminated'] += 1
+
+            contract_updates.append({
+                'cid': contract.id,
+                'old_paid': contract.paid_hours or 0,
+                'n_paid': paid_hours,
+                'n_status': status
+            })
+            stats['contracts'] += 1
+
+        # Транзакции вставляются первыми: конфликт ключа идемпотентности
+        # прерывает пачку до изменения балансов
+        writer.flush()
+
+        users = User.__table__
+        if spent:
+            # Списание проходит, только если баланс все еще покрывает выплату:
+            # расчет доступных часов шел по балансам, прочитанным до записи
+            debited = session.execute(
+                update(users).where(
+                    users.c.id == bindparam('uid'),
+                    users.c.balance >= bindparam('need')
+                ).values(
+                    balance=users.c.balance - bindparam('need'),
+                    total_spent=users.c.total_spent + bindparam('need')
+                ),
+                [{'uid': uid, 'need': amount} for uid, amount in spent.items()]
+            ).rowcount
+            if debited != len(spent):
+                raise BalanceChanged()
+
+        if earned:
+            session.execute(
+                update(users).where(users.c.id == bindparam('uid')).values(
+                    balance=users.c.balance + bindparam('d_earned'),
+                    total_earned=users.c.total_earned + bindparam('d_earned')
+                ),
+                [{'uid': uid, 'd_earned': amount} for uid, amount in earned.items()]
+            )
+
+        offers = JobOffer.__table__
+        session.execute(
+            update(offers).where(
+                offers.c.id == bindparam('cid'),
+                offers.c.paid_hours == bindparam('old_paid')
+            ).values(
+                paid_hours=bindparam('n_paid'),
+                status=bindparam('n_status')
+            ),
+            contract_updates
+        )
+
+        achievement_engine.record(session, [AchievementEvent(uid, BALANCE) for uid in earned])
+        session.commit()
+        return stats
@@ -2,211 +2,390 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from sqlalchemy import bindparam, func, select, update # type: ignore
 from sqlalchemy.orm import Session # type: ignore
 from database.database import db
-from services.stock_service import StockService
-from services.event_service import EventService
-from services.channel_service import ChannelService
+from config import config
+from services.container import ServiceContainer
+from services.achievement_service import BALANCE, AchievementEvent, achievement_engine
+from services.transaction_writer import TransactionWriter
+from services.notification_service import HIGH, NORMAL
 import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 class SchedulerService:
-    def __init__(self, bot):
+    def __init__(self, bot, services: ServiceContainer):
         self.bot = bot
         self.scheduler = AsyncIOScheduler()
-        self.stock_service = StockService()
-        self.event_service = EventService(bot)
-        self.channel_service = ChannelService(bot)
+        # Те же экземпляры сервисов, что и у хендлеров
+        self.services = services
+        self.stock_service = services.stocks
+        self.event_service = services.events
+        self.channel_service = services.channel
+        self.exchange_service = services.exchange
+        self.notifications = services.notifications
+        # Блокирующие шаги задач выполняются в пуле потоков, а не в цикле событий
+        self.jobs = services.jobs
     
     def start(self):
         """Запуск всех планировщиков"""
         # Обновление цен акций каждые 15 минут
         self.scheduler.add_job(
-            self.update_stock_prices,
+            self.jobs.wrap('update_stocks', self.update_stock_prices),
             IntervalTrigger(minutes=15),
             id='update_stocks'
         )
         
+        # Расчет сделок биржевого стакана пачками
+        self.scheduler.add_job(
+            self.jobs.wrap('settle_orders', self.settle_orders),
+            IntervalTrigger(seconds=5),
+            id='settle_orders',
+            max_instances=1
+        )
+        
+        # Выдача достижений по накопленным событиям
+        self.scheduler.add_job(
+            self.jobs.wrap('process_achievements', self.process_achievements),
+            IntervalTrigger(seconds=10),
+            id='process_achievements',
+            max_instances=1
+        )
+        
+        # Общий пост с мелкими событиями канала
+        self.scheduler.add_job(
+            self.jobs.wrap('flush_channel', self.flush_channel),
+            IntervalTrigger(seconds=config.CHANNEL_BATCH_INTERVAL_SECONDS),
+            id='flush_channel',
+            max_instances=1
+        )
+        
+        # Сводка событий канала за окно
+        if self.channel_service.digest is not None:
+            self.scheduler.add_job(
+                self.jobs.wrap('channel_digest', self.publish_channel_digest),
+                IntervalTrigger(minutes=config.CHANNEL_DIGEST_INTERVAL_MINUTES),
+                id='channel_digest',
+                max_instances=1
+            )
+        
+        # Закрытие просроченных предложений работы
+        self.scheduler.add_job(
+            self.jobs.wrap('expire_job_offers', self.expire_job_offers),
+            IntervalTrigger(minutes=5),
+            id='expire_job_offers',
+            max_instances=1
+        )
+        
+        # Выплата зарплат по контрактам рынка труда
+        self.scheduler.add_job(
+            self.jobs.wrap('payroll', self.run_payroll),
+            IntervalTrigger(minutes=10),
+            id='payroll',
+            max_instances=1
+        )
+        
         # Ежедневная статистика для админов в 00:00
         self.scheduler.add_job(
-            self.send_daily_stats,
+            self.jobs.wrap('daily_stats', self.send_daily_stats),
             CronTrigger(hour=0, minute=0),
             id='daily_stats'
         )
         
+        # Сброс прерванных серий ежедневного бонуса после полуночи
+        self.scheduler.add_job(
+            self.jobs.wrap('reset_streaks', self.reset_daily_streaks),
+            CronTrigger(hour=0, minute=1, timezone='UTC'),
+            id='reset_streaks'
+        )
+        
         # Еженедельный розыгрыш в воскресенье в 20:00
         self.scheduler.add_job(
-            self.weekly_lottery,
+            self.jobs.wrap('weekly_lottery', self.weekly_lottery),
             CronTrigger(day_of_week='sun', hour=20, minute=0),
             id='weekly_lottery'
         )
         
         # Ежечасное обновление событий
         self.scheduler.add_job(
-            self.check_events,
+            self.jobs.wrap('check_events', self.check_events),
             IntervalTrigger(hours=1),
             id='check_events'
         )
         
         # Публикация топ игроков в канал каждый день в 12:00
         self.scheduler.add_job(
-            self.publish_top_players,
+            self.jobs.wrap('publish_top_players', self.publish_top_players),
             CronTrigger(hour=12, minute=0),
             id='publish_top_players'
         )
         
         self.scheduler.start()
-        print("Scheduler started successfully")
+        logger.info("Scheduler started successfully")
     
     async def update_stock_prices(self):
         """Обновление цен акций"""
+        await self.jobs.run_blocking(self._update_stock_prices)
+        logger.info(f"Stock prices updated at {datetime.utcnow()}")
+    
+    def _update_stock_prices(self):
+        with db.get_session() as session:
+            self.stock_service.update_stock_prices(session)
+    
+    async def settle_orders(self):
+        """Расчет накопленных сделок по заявкам"""
+        engine = self.exchange_service.engine
+        if not engine.has_pending():
+            return
+        
+        # Очередь сделок забираем в цикле событий, где с движком работают хендлеры,
+        # а запись в БД проводим в потоке по копиям заявок: движок меняет
+        # заявки дальше, пока идет расчет
+        fills, releases = engine.drain()
+        snapshot = engine.snapshot(fills, releases)
+        try:
+            settled = await self.jobs.run_blocking(self._settle_orders, *snapshot)
+        except Exception:
+            engine.requeue(fills, releases)
+            raise
+        
+        if settled:
+            logger.info(f"Settled {settled} order fills at {datetime.utcnow()}")
+    
+    def _settle_orders(self, fills, releases) -> int:
+        with db.get_session() as session:
+            return self.exchange_service.settle_batch(session, fills, releases)
+    
+    async def process_achievements(self):
+        """Выдача достижений по событиям, накопленным после commit"""
+        if not achievement_engine.has_pending():
+            return
+        
+        events = achievement_engine.drain()
         try:
-            with db.get_session() as session:
-                self.stock_service.update_stock_prices(session)
-                print(f"Stock prices updated at {datetime.utcnow()}")
-        except Exception as e:
-            print(f"Error updating stock prices: {e}")
+            awards = await self.jobs.run_blocking(self._process_achievements, events)
+        except Exception:
+            achievement_engine.requeue(events)
+            raise
+        
+        for award in awards:
+            achievement = award.achievement
+            await self.channel_service.publish_achievement(
+                award.username, f"{achievement.icon} {achievement.name}", achievement.description,
+                achievement.reward
+            )
+            message = f"🏆 Новое достижение: {achievement.icon} {achievement.name}\n"
+            message += f"📝 {achievement.description}\n"
+            if achievement.reward:
+                message += f"💰 Награда: ${achievement.reward:,.2f}"
+            self.notifications.notify(
+                award.telegram_id, message, HIGH, dedup_key=f"achievement:{award.user_id}:{achievement.id}"
+            )
+        
+        if awards:
+            logger.info(f"Awarded {len(awards)} achievements from {len(events)} events")
+    
+    async def flush_channel(self):
+        """Публикация событий канала, накопленных за интервал"""
+        await self.channel_service.flush()
+    
+    async def publish_channel_digest(self):
+        """Публикация сводки событий канала за окно"""
+        await self.channel_service.publish_digest()
+    
+    def _process_achievements(self, events):
+        with db.get_session() as session:
+            return achievement_engine.process(session, events)
+    
+    async def expire_job_offers(self):
+        """Закрытие просроченных предложений работы и очистка очереди соискателей"""
+        job_market = self.services.job_market
+        expired = await self.jobs.run_blocking(self._expire_job_offers)
+        # Очередь в памяти чистим в цикле событий, где с ней работают хендлеры
+        seekers = job_market.expire_queue(expired)
+        
+        if expired or seekers:
+            logger.info(f"Expired {len(expired)} job offers and {len(seekers)} job seekers")
+    
+    def _expire_job_offers(self) -> List[int]:
+        with db.get_session() as session:
+            return self.services.job_market.expire_offers(session)
+    
+    async def run_payroll(self):
+        """Почасовые выплаты зарплат по принятым контрактам"""
+        stats = await self.jobs.run_blocking(self._run_payroll)
+        
+        if stats['hours']:
+            logger.info(
+                f"Payroll: {stats['hours']} hours paid (${stats['paid']:,.2f}) on {stats['contracts']} contracts, "
+                f"{stats['completed']} completed, {stats['terminated']} terminated"
+            )
+    
+    def _run_payroll(self) -> Dict:
+        with db.get_session() as session:
+            return self.services.payroll.run(session)
     
     async def send_daily_stats(self):
         """Отправка ежедневной статистики админам"""
-        try:
-            from config import config
-            from services.economy_service import EconomyService
-            
-            economy_service = EconomyService()
-            
-            with db.get_session() as session:
-                stats = economy_service.get_economy_stats(session)
-                
-                message = "📊 ЕЖЕДНЕВНАЯ СТАТИСТИКА\n\n"
-                message += f"👥 Всего пользователей: {stats['total_users']}\n"
-                message += f"🎯 Активных за 24ч: {stats['active_users_24h']}\n"
-                message += f"💰 Общий баланс: ${stats['total_balance']:,.2f}\n"
-                message += f"📈 Всего заработано: ${stats['total_earned']:,.2f}\n"
-                message += f"📉 Всего потрачено: ${stats['total_spent']:,.2f}\n"
-                message += f"🔄 Транзакций за 24ч: {stats['transactions_24h']}\n\n"
-                message += "🏆 ТОП-5 ИГРОКОВ:\n"
-                
-                for i, user in enumerate(stats['top_users'], 1):
-                    message += f"{i}. @{user['username']} - ${user['balance']:,.2f} (уровень {user['level']})\n"
-                
-                # Отправляем всем админам
-                for admin_id in config.ADMIN_IDS:
-                    try:
-                        await self.bot.send_message(admin_id, message)
-                    except Exception as e:
-                        print(f"Error sending stats to admin {admin_id}: {e}")
-                
-                print(f"Daily stats sent at {datetime.utcnow()}")
+        stats = await self.jobs.run_blocking(self._economy_stats)
+        
+        message = "📊 ЕЖЕДНЕВНАЯ СТАТИСТИКА\n\n"
+        message += f"👥 Всего пользователей: {stats['total_users']}\n"
+        message += f"🎯 Активных за 24ч: {stats['active_users_24h']}\n"
+        message += f"💰 Общий баланс: ${stats['total_balance']:,.2f}\n"
+        message += f"📈 Всего заработано: ${stats['total_earned']:,.2f}\n"
+        message += f"📉 Всего потрачено: ${stats['total_spent']:,.2f}\n"
+        message += f"🔄 Транзакций за 24ч: {stats['transactions_24h']}\n\n"
+        message += "🏆 ТОП-5 ИГРОКОВ:\n"
         
-        except Exception as e:
-            print(f"Error in send_daily_stats: {e}")
+        for i, user in enumerate(stats['top_users'], 1):
+            message += f"{i}. @{user['username']} - ${user['balance']:,.2f} (уровень {user['level']})\n"
+        
+        # Отправляем всем админам
+        for admin_id in config.ADMIN_IDS:
+            self.notifications.notify(admin_id, message, NORMAL)
+        
+        logger.info(f"Daily stats sent at {datetime.utcnow()}")
+    
+    def _economy_stats(self) -> Dict:
+        with db.get_session() as session:
+            return self.services.economy.get_economy_stats(session)
+    
+    async def reset_daily_streaks(self):
+        """Сброс серий игроков, пропустивших ежедневный бонус"""
+        reset = await self.jobs.run_blocking(self._reset_daily_streaks)
+        logger.info(f"Reset {reset} broken daily streaks")
+    
+    def _reset_daily_streaks(self) -> int:
+        with db.get_session() as session:
+            return self.services.bonuses.reset_broken_streaks(session)
     
     async def weekly_lottery(self):
         """Проведение еженедельного розыгрыша"""
-        try:
-            from config import config
-            from models.user import User
-            import random
-            
-            with db.get_session() as session:
-                # Получаем всех активных пользователей (за последнюю неделю)
-                week_ago = datetime.utcnow() - timedelta(days=7)
-                active_users = session.query(User).filter(
+        winners = await self.jobs.run_blocking(self._draw_lottery)
+        
+        if not winners:
+            return
+        
+        # Публикуем в канал
+        await self.channel_service.publish_lottery_results(winners)
+        
+        # Уведомления победителям уходят в фоне, задача не ждет отправки
+        draw = datetime.utcnow().strftime('%Y-%m-%d')
+        for winner_info in winners:
+            message = f"🎉 Поздравляем! Вы выиграли {winner_info['prize']} в еженедельном розыгрыше!\n"
+            message += f"💰 На ваш баланс зачислено: ${winner_info['amount']:,.2f}"
+            self.notifications.notify(
+                winner_info['telegram_id'], message, HIGH, dedup_key=f"lottery:{draw}:{winner_info['user_id']}"
+            )
+        
+        logger.info(f"Weekly lottery completed at {datetime.utcnow()}")
+    
+    def _draw_lottery(self) -> List[Dict]:
+        """Выбор победителей и начисление призов
+        
+        Возвращает простые словари, чтобы после закрытия сессии
+        отправка уведомлений не обращалась к ORM-объектам.
+        """
+        from models.user import User
+        import random
+        
+        with db.get_session() as session:
+            # Получаем всех активных пользователей (за последнюю неделю)
+            week_ago = datetime.utcnow() - timedelta(days=7)
+            active_users = session.execute(
+                select(User.id, User.telegram_id, User.username, User.full_name).where(
                     User.last_daily >= week_ago,
                     User.is_banned == False
-                ).all()
-                
-                if not active_users:
-                    print("No active users for lottery")
-                    return
-                
-                # Выбираем победителей
-                prizes = [
-                    {"name": "Главный приз", "amount": 10000, "winners": 1},
-                    {"name": "Второй приз", "amount": 5000, "winners": 2},
-                    {"name": "Третий приз", "amount": 2500, "winners": 3}
-                ]
-                
-                winners = []
-                available_users = active_users.copy()
+                )
+            ).all()
+            
+            if not active_users:
+                logger.info("No active users for lottery")
+                return []
+            
+            # Выбираем победителей
+            prizes = [
+                {"name": "Главный приз", "amount": 10000, "winners": 1},
+                {"name": "Второй приз", "amount": 5000, "winners": 2},
+                {"name": "Третий приз", "amount": 2500, "winners": 3}
+            ]
+            
+            winners = []
+            available_users = list(active_users)
+            writer = TransactionWriter(session)
+            
+            for prize in prizes:
+                if len(available_users) < prize["winners"]:
+                    break
                 
-                for prize in prizes:
-                    if len(available_users) < prize["winners"]:
-                        break
-                    
-                    prize_winners = random.sample(available_users, prize["winners"])
-                    
-                    for winner in prize_winners:
-                        # Начисляем приз
-                        winner.balance += prize["amount"]
-                        winner.total_earned += prize["amount"]
-                        
-                        winners.append({
-                            "user": winner,
-                            "prize": prize["name"],
-                            "amount": prize["amount"]
-                        })
-                        
-                        # Убираем из доступных для следующих призов
-                        available_users.remove(winner)
+                prize_winners = random.sample(available_users, prize["winners"])
                 
-                if winners:
-                    session.commit()
-                    
-                    # Публикуем в канал
-                    await self.channel_service.publish_lottery_results(winners)
+                for winner in prize_winners:
+                    writer.add(winner.id, 'lottery_prize', prize["amount"], {"prize": prize["name"]})
                     
-                    # Отправляем уведомления победителям
-                    for winner_info in winners:
-                        try:
-                            message = f"🎉 Поздравляем! Вы выиграли {winner_info['prize']} в еженедельном розыгрыше!\n"
-                            message += f"💰 На ваш баланс зачислено: ${winner_info['amount']:,.2f}"
-                            await self.bot.send_message(winner_info['user'].telegram_id, message)
-                        except Exception as e:
-                            print(f"Error notifying winner {winner_info['user'].id}: {e}")
+                    winners.append({
+                        "user_id": winner.id,
+                        "telegram_id": winner.telegram_id,
+                        "username": winner.username or winner.full_name or f"Игрок_{winner.id}",
+                        "prize": prize["name"],
+                        "amount": prize["amount"]
+                    })
                     
-                    print(f"Weekly lottery completed at {datetime.utcnow()}")
-        
-        except Exception as e:
-            print(f"Error in weekly_lottery: {e}")
+                    # Убираем из доступных для следующих призов
+                    available_users.remove(winner)
+            
+            if winners:
+                writer.flush()
+                # Призы начисляются приращением в БД: запись прочитанного
+                # раньше баланса затерла бы параллельные изменения
+                users = User.__table__
+                session.execute(
+                    update(users).where(users.c.id == bindparam('uid')).values(
+                        balance=users.c.balance + bindparam('prize'),
+                        total_earned=users.c.total_earned + bindparam('prize')
+                    ),
+                    [{'uid': w['user_id'], 'prize': w['amount']} for w in winners]
+                )
+                achievement_engine.record(session, [AchievementEvent(w['user_id'], BALANCE) for w in winners])
+                session.commit()
+            
+            return winners
     
     async def check_events(self):
         """Проверка и публикация событий"""
-        try:
-            from models.transaction import Transaction
-            from datetime import datetime, timedelta
-            
-            with db.get_session() as session:
-                # Ищем крупные сделки за последний час
-                hour_ago = datetime.utcnow() - timedelta(hours=1)
-                large_transactions = session.query(Transaction).filter(
-                    Transaction.created_at >= hour_ago,
-                    Transaction.amount.abs() >= 10000
-                ).all()
-                
-                for transaction in large_transactions:
-                    await self.event_service.publish_large_transaction(transaction)
+        events = await self.jobs.run_blocking(self._large_transactions)
         
-        except Exception as e:
-            print(f"Error in check_events: {e}")
+        for transaction, user in events:
+            await self.event_service.publish_large_transaction(transaction, user)
+    
+    def _large_transactions(self) -> List[Tuple]:
+        """Крупные сделки за последний час вместе с их авторами"""
+        from models.transaction import Transaction
+        from models.user import User
+        
+        with db.get_session() as session:
+            hour_ago = datetime.utcnow() - timedelta(hours=1)
+            rows = session.query(Transaction, User).join(
+                User, User.id == Transaction.user_id
+            ).filter(
+                Transaction.created_at >= hour_ago,
+                func.abs(Transaction.amount) >= 10000
+            ).all()
+            
+            return [(transaction, user) for transaction, user in rows]
     
     async def publish_top_players(self):
         """Публикация топ игроков в канал"""
-        try:
-            from services.economy_service import EconomyService
-            
-            economy_service = EconomyService()
-            
-            with db.get_session() as session:
-                stats = economy_service.get_economy_stats(session)
-                
-                message = "🏆 ЕЖЕДНЕВНЫЙ ТОП ИГРОКОВ\n\n"
-                
-                for i, user in enumerate(stats['top_users'], 1):
-                    message += f"{i}. @{user['username']} - ${user['balance']:,.2f}\n"
-                    message += f"   Уровень: {user['level']}\n\n"
-                
-                await self.channel_service.publish_to_channel(message)
+        stats = await self.jobs.run_blocking(self._economy_stats)
+        
+        message = "🏆 ЕЖЕДНЕВНЫЙ ТОП ИГРОКОВ\n\n"
+        
+        for i, user in enumerate(stats['top_users'], 1):
+            message += f"{i}. @{user['username']} - ${user['balance']:,.2f}\n"
+            message += f"   Уровень: {user['level']}\n\n"
         
-        except Exception as e:
-            print(f"Error in publish_top_players: {e}")
\ No newline at end of file
+        await self.channel_service.publish_to_channel(message)
\ No newline at end of file
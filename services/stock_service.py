@@ -1,54 +1,195 @@
-import json
 import random
+import threading
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from sqlalchemy.orm import Session # type: ignore
-from sqlalchemy import and_ # type: ignore
+from sqlalchemy import and_, bindparam, delete, func, select, update # type: ignore
 from models.stock import Stock, UserStock
 from models.user import User
 from models.transaction import Transaction
+from services.achievement_service import BALANCE, AchievementEvent, achievement_engine
+from services.liquidity_pool import LiquidityPool, SymbolTradeQueue, liquidity_pools
+from services.market_analytics import market_analytics
+from configs.registry import config_registry
 from config import config
 
+@dataclass(frozen=True)
+class StockQuote:
+    """Снимок котировки акции, не привязанный к сессии БД"""
+    id: int
+    symbol: str
+    name: str
+    current_price: float
+    volatility: float
+    description: Optional[str]
+    last_updated: Optional[datetime]
+    
+    @classmethod
+    def from_model(cls, stock: Stock) -> 'StockQuote':
+        return cls(
+            id=stock.id,
+            symbol=stock.symbol,
+            name=stock.name,
+            current_price=stock.current_price,
+            volatility=stock.volatility,
+            description=stock.description,
+            last_updated=stock.last_updated
+        )
+
+class StockQuoteCache:
+    """Кэш котировок в памяти процесса
+
+    Цены меняются плановым обновлением (update_stock_prices), сделками
+    с пулом ликвидности и расчетом заявок стакана; каждый из них после
+    commit обновляет кэш, поэтому меню биржи читают котировки отсюда без
+    запросов к БД. Обновления приходят из разных потоков (сделки по
+    разным акциям идут параллельно), поэтому замена содержимого и
+    обновление одной цены выполняются под блокировкой. После изменения
+    кэш подменяется целиком, а version увеличивается.
+    """
+    
+    def __init__(self):
+        self.version = 0
+        self._loaded = False
+        self._ordered: List[StockQuote] = []
+        self._by_symbol: Dict[str, StockQuote] = {}
+        self._by_id: Dict[int, StockQuote] = {}
+        self._lock = threading.Lock()
+    
+    def refresh(self, session: Session):
+        """Перезагрузка котировок из БД"""
+        stocks = session.query(Stock).order_by(Stock.symbol).all()
+        self.store([StockQuote.from_model(s) for s in stocks])
+    
+    def store(self, quotes: List[StockQuote]):
+        """Замена содержимого кэша актуальными котировками"""
+        with self._lock:
+            self._store(quotes)
+    
+    def _store(self, quotes: List[StockQuote]):
+        quotes = sorted(quotes, key=lambda q: q.symbol)
+        
+        # Собираем новые словари и подменяем целиком, чтобы читатели
+        # никогда не видели частично обновленный кэш
+        self._ordered = quotes
+        self._by_symbol = {q.symbol: q for q in quotes}
+        self._by_id = {q.id: q for q in quotes}
+        self._loaded = True
+        self.version += 1
+    
+    def update_price(self, symbol: str, price: float, last_updated: datetime):
+        """Обновление цены одной акции после сделки"""
+        # Чтение и замена под одной блокировкой: иначе параллельная сделка
+        # по другой акции запишет список без этой цены
+        with self._lock:
+            quote = self._by_symbol.get(symbol)
+            if quote is None:
+                return
+            
+            updated = replace(quote, current_price=price, last_updated=last_updated)
+            self._store([updated if q.symbol == symbol else q for q in self._ordered])
+    
+    def known(self, symbol: str) -> bool:
+        """Есть ли акция среди загруженных котировок (без запросов к БД)"""
+        return symbol in self._by_symbol
+    
+    def invalidate(self):
+        """Сброс кэша, следующее чтение загрузит котировки заново"""
+        self._loaded = False
+        self.version += 1
+    
+    def all(self, session: Session) -> List[StockQuote]:
+        if not self._loaded:
+            self.refresh(session)
+        return list(self._ordered)
+    
+    def get(self, session: Session, symbol: str) -> Optional[StockQuote]:
+        if not self._loaded:
+            self.refresh(session)
+        return self._by_symbol.get(symbol)
+    
+    def get_by_id(self, session: Session, stock_id: int) -> Optional[StockQuote]:
+        if not self._loaded:
+            self.refresh(session)
+        return self._by_id.get(stock_id)
+
+# Общий кэш для всех экземпляров StockService (хендлеры и планировщик)
+stock_quote_cache = StockQuoteCache()
+
+# Очередь сделок: покупки и продажи одной акции идут по очереди
+symbol_trades = SymbolTradeQueue(known=stock_quote_cache.known)
+
 class StockService:
+    # Выставляется после сверки акций с конфигом при запуске бота
+    stocks_ready = False
+    
     def __init__(self):
-        self.stocks_config = self._load_stocks_config()
-        self.market_trend = 0.0  -0.1 до +0.1 # type: ignore
-        
-    def _load_stocks_config(self) -> Dict:
-        """Загрузка конфигурации акций из JSON"""
-        with open(config.STOCKS_CONFIG, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        self.market_trend = 0.0  # от -0.1 до +0.1
     
     def init_stocks(self, session: Session):
-        """Инициализация акций в базе данных"""
-        existing_stocks = session.query(Stock).count()
-        if existing_stocks > 0:
+        """Инициализация акций в базе данных (однократно за время работы)"""
+        if StockService.stocks_ready:
             return
         
-        for stock_data in self.stocks_config['stocks']:
-            stock = Stock(
-                symbol=stock_data['symbol'],
-                name=stock_data['name'],
-                current_price=stock_data['base_price'],
-                volatility=stock_data['volatility'],
-                description=stock_data['description'],
-                last_updated=datetime.utcnow()
-            )
-            session.add(stock)
+        self.sync_stocks(session)
+    
+    def sync_stocks(self, session: Session) -> Dict[str, int]:
+        """Сверка акций в БД с configs/stocks.json
+
+        Добавляет новые тикеры и обновляет название, описание и
+        волатильность существующих. Текущие цены не трогает.
+        """
+        existing = {stock.symbol: stock for stock in session.query(Stock).all()}
+        added = 0
+        updated = 0
+        
+        for stock_data in config_registry.current.stocks:
+            stock = existing.get(stock_data.symbol)
+            
+            if stock is None:
+                session.add(Stock(
+                    symbol=stock_data.symbol,
+                    name=stock_data.name,
+                    current_price=stock_data.base_price,
+                    volatility=stock_data.volatility,
+                    description=stock_data.description,
+                    last_updated=datetime.utcnow()
+                ))
+                added += 1
+                continue
+            
+            if (stock.name, stock.volatility, stock.description) != (
+                stock_data.name, stock_data.volatility, stock_data.description
+            ):
+                stock.name = stock_data.name
+                stock.volatility = stock_data.volatility
+                stock.description = stock_data.description
+                updated += 1
         
         session.commit()
+        stock_quote_cache.refresh(session)
+        StockService.stocks_ready = True
+        
+        return {'added': added, 'updated': updated}
     
-    def update_stock_prices(self, session: Session):
-        """Обновление цен акций"""
-        stocks = session.query(Stock).all()
+    def update_stock_prices(self, session: Session) -> List[StockQuote]:
+        """Обновление цен акций, возвращает новые котировки
+
+        Выполняется в пуле потоков одновременно со сделками, поэтому цена
+        меняется SQL-выражением от текущего значения в БД: сделка,
+        прошедшая между чтением и записью, не затирается.
+        """
+        rows = session.execute(select(Stock.id, Stock.volatility)).all()
         
         # Обновляем рыночный тренд
         self.market_trend += random.uniform(-0.02, 0.02)
         self.market_trend = max(-0.1, min(0.1, self.market_trend))
         
-        for stock in stocks:
+        changes = []
+        for stock_id, volatility in rows:
             # Базовое изменение цены
-            change = random.uniform(-stock.volatility, stock.volatility)
+            change = random.uniform(-volatility, volatility)
             
             # Добавляем рыночный тренд
             change += self.market_trend
@@ -59,22 +200,40 @@ class StockService:
             # Ограничиваем максимальное изменение
             change = max(-0.3, min(0.3, change))
             
-            # Применяем изменение
-            new_price = stock.current_price * (1 + change)
-            
-            # Округляем до 2 знаков
-            stock.current_price = round(new_price, 2)
-            stock.last_updated = datetime.utcnow()
+            changes.append({'sid': stock_id, 'change': change})
+        
+        if changes:
+            # Применяем изменение с округлением до 2 знаков
+            stocks = Stock.__table__
+            session.execute(
+                update(stocks).where(stocks.c.id == bindparam('sid')).values(
+                    current_price=func.round(stocks.c.current_price * (1 + bindparam('change')), 2),
+                    last_updated=datetime.utcnow()
+                ),
+                changes
+            )
         
+        # Снимок делаем до commit, иначе чтение атрибутов после него
+        # заново загрузит каждую строку из БД
+        quotes = [StockQuote.from_model(stock) for stock in session.query(Stock).populate_existing().all()]
         session.commit()
+        # Аналитика обновляется раньше кэша: по новой версии кэша экраны
+        # уже видят новое изменение цены
+        market_analytics.record_close((q.symbol, q.current_price) for q in quotes)
+        stock_quote_cache.store(quotes)
+        return quotes
     
-    def get_all_stocks(self, session: Session) -> List[Stock]:
+    def get_all_stocks(self, session: Session) -> List[StockQuote]:
         """Получение всех акций"""
-        return session.query(Stock).order_by(Stock.symbol).all()
+        return stock_quote_cache.all(session)
     
-    def get_stock_by_symbol(self, session: Session, symbol: str) -> Optional[Stock]:
+    def get_stock_by_symbol(self, session: Session, symbol: str) -> Optional[StockQuote]:
         """Получение акции по символу"""
-        return session.query(Stock).filter(Stock.symbol == symbol).first()
+        return stock_quote_cache.get(session, symbol)
+    
+    def get_stock_by_id(self, session: Session, stock_id: int) -> Optional[StockQuote]:
+        """Получение акции по ID"""
+        return stock_quote_cache.get_by_id(session, stock_id)
     
     def get_user_stocks(self, session: Session, user_id: int) -> List[UserStock]:
         """Получение акций пользователя"""
@@ -95,7 +254,7 @@ class StockService:
             )
         ).first()
     
-    def can_buy_stocks(self, session: Session, user_id: int, stock_symbol: str, quantity: int) -> tuple[bool, str, Optional[Stock]]:
+    def can_buy_stocks(self, session: Session, user_id: int, stock_symbol: str, quantity: int) -> tuple[bool, str, Optional[StockQuote]]:
         """Проверка возможности покупки акций"""
         user = session.query(User).filter(User.id == user_id).first()
         if not user:
@@ -108,41 +267,66 @@ class StockService:
         if quantity <= 0:
             return False, "Количество должно быть больше 0", None
         
-        total_cost = stock.current_price * quantity
+        total_cost = self.get_pool(stock).quote_buy(quantity)
+        if total_cost is None:
+            return False, "Недостаточно акций на рынке для такой сделки", stock
+        
         if user.balance < total_cost:
             return False, f"Недостаточно средств. Нужно: ${total_cost:.2f}", stock
         
         return True, "", stock
     
     def buy_stocks(self, session: Session, user_id: int, stock_symbol: str, quantity: int) -> tuple[bool, str]:
-        """Покупка акций"""
+        """Покупка акций
+
+        Сделки по разным акциям и задачи планировщика идут в разных
+        потоках, поэтому баланс и позиция меняются SQL-выражениями от
+        текущих значений в БД, а не записью значений, прочитанных раньше.
+        Списание проходит только при достаточном балансе на момент записи.
+        """
         can_buy, message, stock = self.can_buy_stocks(session, user_id, stock_symbol, quantity)
         if not can_buy:
             return False, message
         
-        user = session.query(User).filter(User.id == user_id).first()
-        total_cost = stock.current_price * quantity
-        
-        # Вычитаем деньги
-        user.balance -= total_cost
-        user.total_spent += total_cost
+        # Цена зависит от объема: крупная покупка сдвигает цену вверх
+        pool = self.get_pool(stock)
+        total_cost = pool.quote_buy(quantity)
+        price_per_share = total_cost / quantity
+        
+        # Вычитаем деньги и добавляем опыт
+        debited = session.execute(
+            update(User).where(
+                User.id == user_id,
+                User.balance >= total_cost
+            ).values(
+                balance=User.balance - total_cost,
+                total_spent=User.total_spent + total_cost,
+                experience=User.experience + quantity * 2
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        if not debited:
+            session.rollback()
+            return False, f"Недостаточно средств. Нужно: ${total_cost:.2f}"
         
         # Проверяем, есть ли уже такие акции у пользователя
         user_stock = self.get_user_stock(session, user_id, stock_symbol)
         
         if user_stock:
             # Обновляем существующие акции
-            total_quantity = user_stock.quantity + quantity
-            total_invested = (user_stock.average_price * user_stock.quantity) + total_cost
-            user_stock.average_price = total_invested / total_quantity
-            user_stock.quantity = total_quantity
+            session.execute(
+                update(UserStock).where(UserStock.id == user_stock.id).values(
+                    average_price=(UserStock.average_price * UserStock.quantity + total_cost)
+                    / (UserStock.quantity + quantity),
+                    quantity=UserStock.quantity + quantity
+                ).execution_options(synchronize_session=False)
+            )
         else:
             # Создаем новые акции
             user_stock = UserStock(
                 user_id=user_id,
                 stock_id=stock.id,
                 quantity=quantity,
-                average_price=stock.current_price
+                average_price=price_per_share
             )
             session.add(user_stock)
         
@@ -155,19 +339,48 @@ class StockService:
                 'stock_symbol': stock_symbol,
                 'stock_name': stock.name,
                 'quantity': quantity,
-                'price_per_share': stock.current_price,
+                'price_per_share': price_per_share,
                 'total_cost': total_cost
             }
         )
         session.add(transaction)
         
-        # Добавляем опыт
-        user.experience += quantity * 2
-        
-        session.commit()
+        self._commit_trade(session, stock, pool, quantity, lambda: pool.buy(quantity))
         
         return True, f"✅ Вы купили {quantity} акций {stock_symbol} за ${total_cost:.2f}"
     
+    def get_pool(self, stock: StockQuote) -> LiquidityPool:
+        """Пул ликвидности акции"""
+        stock_data = config_registry.current.stocks_by_symbol.get(stock.symbol)
+        depth = stock_data.liquidity if stock_data else None
+        return liquidity_pools.get(stock.symbol, stock.current_price, depth)
+    
+    def _commit_trade(self, session: Session, stock: StockQuote, pool: LiquidityPool, quantity: int, execute):
+        """Фиксация сделки с пулом и новой цены акции
+
+        Резервы пула сдвигаются только после успешного commit. Вызывающий
+        код должен выполнять сделки по одной акции последовательно
+        (см. symbol_trades), иначе котировка пула может устареть.
+        """
+        now = datetime.utcnow()
+        shares, cash = pool.shares, pool.cash
+        execute()
+        new_price = pool.price
+        
+        try:
+            session.query(Stock).filter(Stock.id == stock.id).update(
+                {Stock.current_price: new_price, Stock.last_updated: now},
+                synchronize_session=False
+            )
+            session.commit()
+        except Exception:
+            # Откатываем резервы пула вместе с транзакцией
+            pool.shares, pool.cash = shares, cash
+            raise
+        
+        market_analytics.record_trade(stock.symbol, new_price, quantity)
+        stock_quote_cache.update_price(stock.symbol, new_price, now)
+    
     def can_sell_stocks(self, session: Session, user_id: int, stock_symbol: str, quantity: int) -> tuple[bool, str, Optional[UserStock]]:
         """Проверка возможности продажи акций"""
         user_stock = self.get_user_stock(session, user_id, stock_symbol)
@@ -189,22 +402,43 @@ class StockService:
             return False, message
         
         stock = self.get_stock_by_symbol(session, stock_symbol)
-        user = session.query(User).filter(User.id == user_id).first()
         
-        total_revenue = stock.current_price * quantity
+        # Крупная продажа сдвигает цену вниз
+        pool = self.get_pool(stock)
+        total_revenue = pool.quote_sell(quantity)
+        price_per_share = total_revenue / quantity
         
         # Добавляем деньги (минус налог)
         tax = total_revenue * config.TAX_RATE
         net_revenue = total_revenue - tax
         
-        user.balance += net_revenue
-        user.total_earned += net_revenue
+        # Списываем акции, только если они еще есть на момент записи
+        removed = session.execute(
+            update(UserStock).where(
+                UserStock.id == user_stock.id,
+                UserStock.quantity >= quantity
+            ).values(quantity=UserStock.quantity - quantity).execution_options(synchronize_session=False)
+        ).rowcount
+        if not removed:
+            session.rollback()
+            return False, "Недостаточно акций для продажи"
+        session.execute(
+            delete(UserStock).where(
+                UserStock.id == user_stock.id,
+                UserStock.quantity <= 0
+            ).execution_options(synchronize_session=False)
+        )
         
-        # Обновляем или удаляем запись об акциях
-        if user_stock.quantity == quantity:
-            session.delete(user_stock)
-        else:
-            user_stock.quantity -= quantity
+        # Начисляем выручку и опыт приращением, а не записью прочитанного баланса
+        session.execute(
+            update(User).where(User.id == user_id).values(
+                balance=User.balance + net_revenue,
+                total_earned=User.total_earned + net_revenue,
+                experience=User.experience + quantity
+            ).execution_options(synchronize_session=False)
+        )
+        # Обновление идет мимо ORM, поэтому рост баланса передается движку достижений явно
+        achievement_engine.record(session, [AchievementEvent(user_id, BALANCE)])
         
         # Создаем транзакцию
         transaction = Transaction(
@@ -215,7 +449,7 @@ class StockService:
                 'stock_symbol': stock_symbol,
                 'stock_name': stock.name,
                 'quantity': quantity,
-                'price_per_share': stock.current_price,
+                'price_per_share': price_per_share,
                 'total_revenue': total_revenue,
                 'tax': tax,
                 'net_revenue': net_revenue
@@ -223,10 +457,7 @@ class StockService:
         )
         session.add(transaction)
         
-        # Добавляем опыт
-        user.experience += quantity * 1
-        
-        session.commit()
+        self._commit_trade(session, stock, pool, quantity, lambda: pool.sell(quantity))
         
         return True, f"✅ Вы продали {quantity} акций {stock_symbol} за ${net_revenue:.2f} (налог: ${tax:.2f})"
     
@@ -261,7 +492,7 @@ class StockService:
             user_stocks = self.get_user_stocks(session, user.id)
             
             for us in user_stocks:
-                stock = session.query(Stock).filter(Stock.id == us.stock_id).first()
+                stock = self.get_stock_by_id(session, us.stock_id)
                 if stock:
                     total_stock_value += stock.current_price * us.quantity
             
@@ -0,0 +1,92 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Column, MetaData, Table, Text, insert # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from models.transaction import Transaction
+from services.achievement_service import AchievementEvent, achievement_engine
+
+# Строк в одном INSERT
+TRANSACTION_BATCH_SIZE = 1000
+
+
+def _raw_table(table: Table) -> Table:
+    """Копия таблицы, в которой details - уже готовая JSON-строка
+
+    Тип JSON сериализует словарь на каждой строке при выполнении запроса.
+    Через эту копию details передается строкой, сериализованной заранее
+    (в момент add, в том числе в рабочем потоке), и драйвер получает
+    значения как есть.
+    """
+    return Table(
+        table.name, MetaData(),
+        *(
+            Column(c.name, Text if c.name == 'details' else c.type, primary_key=c.primary_key)
+            for c in table.columns
+        )
+    )
+
+
+_transactions = _raw_table(Transaction.__table__)
+
+
+class TransactionWriter:
+    """Пакетная запись транзакций в обход unit of work
+
+    Записи копятся в буфере и вставляются одним многострочным INSERT на
+    каждые batch_size строк. Запись идет в транзакции переданной сессии:
+    commit остается за вызывающим кодом, и до него запись вместе с
+    остальными изменениями можно откатить.
+
+    Так как ORM-хуки сессии эти строки не видят, при flush() записанные
+    транзакции передаются движку достижений (publish=False отключает).
+    """
+
+    def __init__(self, session: Session, batch_size: int = TRANSACTION_BATCH_SIZE, publish: bool = True):
+        self.session = session
+        self.batch_size = batch_size
+        self.publish = publish
+        self.written = 0
+        self._rows: List[Dict[str, Any]] = []
+        self._now = datetime.utcnow()
+
+    def add(self, user_id: int, transaction_type: str, amount: float,
+            details: Optional[Dict] = None, created_at: Optional[datetime] = None,
+            idempotency_key: Optional[str] = None):
+        """Добавление транзакции в буфер"""
+        self._rows.append({
+            'user_id': user_id,
+            'transaction_type': transaction_type,
+            'amount': amount,
+            'details': json.dumps(details) if details is not None else None,
+            'created_at': created_at or self._now,
+            'idempotency_key': idempotency_key
+        })
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Вставка накопленных транзакций, возвращает число строк"""
+        rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+
+        self.session.execute(insert(_transactions), rows)
+
+        if self.publish:
+            achievement_engine.record(self.session, [
+                AchievementEvent(row['user_id'], row['transaction_type'], row['amount']) for row in rows
+            ])
+
+        self.written += len(rows)
+        return len(rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __enter__(self) -> "TransactionWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,34 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class RequestCoalescer:
+    """Объединение одинаковых параллельных запросов
+
+    Пока вычисление по ключу выполняется, все повторные вызовы с тем же
+    ключом ждут его результат, а не запускают собственное.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Future"] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Выполнение factory() или ожидание уже запущенного вычисления"""
+        task = self._inflight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        # shield: отмена одного ожидающего не отменяет общее вычисление
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: "asyncio.Future"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
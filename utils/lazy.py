@@ -0,0 +1,42 @@
+import threading
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """Ленивый синглтон сервиса
+
+    Объект создается при первом обращении к любому его атрибуту, а не
+    при импорте модуля, поэтому импорт хендлеров не читает конфиги и
+    не строит сервисы, которые могут и не понадобиться. Создание
+    защищено блокировкой: хендлеры обращаются к сервисам и из потоков.
+    """
+
+    __slots__ = ("_factory", "_instance", "_lock")
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """Экземпляр сервиса (создается при первом вызове)"""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+                instance = self._instance
+        return instance
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+    def __repr__(self) -> str:
+        state = repr(self._instance) if self._instance is not None else "not created"
+        return f"<Lazy {getattr(self._factory, '__name__', self._factory)}: {state}>"
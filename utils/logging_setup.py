@@ -0,0 +1,190 @@
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+# Стандартные атрибуты LogRecord - все остальное попадает в JSON как extra
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_exception_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной JSON-строкой"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "func": record.funcName,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SizedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """Ротация файла лога по времени и по размеру, что наступит раньше"""
+
+    def __init__(self, filename: str, max_bytes: int = 0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+        # При ротации по размеру архивов за сутки может быть несколько,
+        # поэтому имя архива включает время с точностью до секунды
+        self.suffix = "%Y-%m-%d_%H-%M-%S"
+        self.extMatch = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(\.\w+)?$", re.ASCII)
+        self._formatted: Optional[Tuple[logging.LogRecord, str]] = None
+
+    def format(self, record: logging.LogRecord) -> str:
+        # shouldRollover и emit форматируют одну и ту же запись подряд
+        # (под блокировкой обработчика), текст считается один раз
+        cached = self._formatted
+        if cached is not None and cached[0] is record:
+            return cached[1]
+        text = super().format(record)
+        self._formatted = (record, text)
+        return text
+
+    def rotation_filename(self, default_name: str) -> str:
+        # Архив называется временем ротации, а не началом интервала
+        now = time.gmtime() if self.utc else time.localtime()
+        name = f"{self.baseFilename}.{time.strftime(self.suffix, now)}"
+        candidate, n = name, 0
+        while os.path.exists(candidate):
+            n += 1
+            candidate = f"{name}.{n}"
+        return super().rotation_filename(candidate)
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if super().shouldRollover(record):
+            return 1
+
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes:
+                return 1
+
+        return 0
+
+
+class SamplingFilter(logging.Filter):
+    """Прореживание шумных логгеров
+
+    Для логгеров из rates (и их потомков) пропускается только каждая
+    N-я запись ниже WARNING, где N = 1 / rate. Предупреждения и ошибки
+    проходят всегда.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Длинные префиксы проверяются первыми, чтобы побеждало точное правило
+        self.rules = sorted(
+            ((name, max(1, round(1 / rate)) if rate > 0 else 0) for name, rate in rates.items()),
+            key=lambda rule: -len(rule[0])
+        )
+        self._counters = {name: itertools.count() for name, _ in self.rules}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        for name, every in self.rules:
+            if record.name == name or record.name.startswith(name + "."):
+                if every == 0:
+                    return False
+                return next(self._counters[name]) % every == 0
+
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который при переполнении очереди отбрасывает записи
+
+    Поток, пишущий в лог (в том числе цикл событий), никогда не ждет
+    диска: форматирование и запись выполняет QueueListener в своем потоке.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы подставляются сразу (объекты могут измениться до записи),
+        # трейсбек сохраняется отдельно, чтобы в JSON он попал в поле exc
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = "INFO", log_file: str = "logs/bot.log",
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 7,
+                  sampling: Optional[Dict[str, float]] = None,
+                  queue_size: int = 10000) -> QueueListener:
+    """Настройка логирования через очередь
+
+    Корневой логгер получает только DroppingQueueHandler. Консольный
+    вывод и JSON-файл с ротацией обслуживает QueueListener в фоновом
+    потоке. Возвращает запущенный listener - его нужно остановить при
+    завершении, чтобы дописать очередь.
+    """
+    os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    file_handler = SizedTimedRotatingFileHandler(
+        log_file,
+        max_bytes=max_bytes,
+        when="midnight",
+        backupCount=backup_count,
+        encoding="utf-8",
+        utc=True
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, console, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,271 @@
+import asyncio
+import bisect
+import contextlib
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержки, в секундах
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LagHistogram:
+    """Гистограмма задержки цикла событий с фиксированными корзинами"""
+
+    def __init__(self, buckets=LAG_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        """Оценка перцентиля по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict:
+        """Состояние гистограммы для выгрузки в JSON"""
+        bounds = [f"le_{int(b * 1000)}ms" for b in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+@dataclass
+class Stall:
+    """Зависание цикла событий"""
+    started_at: datetime
+    activity: str
+    stack: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+
+class LoopMonitor:
+    """Монитор задержки цикла событий
+
+    Сэмплер в цикле каждые interval секунд измеряет, насколько позже
+    срока он проснулся, и складывает задержку в гистограмму. Отдельный
+    поток-сторож замечает, что сэмплер давно не отмечался, снимает стек
+    потока цикла и связывает зависание с текущей активностью - хендлером
+    aiogram или задачей планировщика, отмеченными через track().
+    """
+
+    def __init__(self, interval: float = 0.1, stall_threshold: float = 0.25,
+                 slow_callback: float = 0.0, export_path: Optional[str] = None,
+                 export_interval: float = 60.0, max_stalls: int = 50):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.slow_callback = slow_callback
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.histogram = LagHistogram()
+        self.stalls: Deque[Stall] = deque(maxlen=max_stalls)
+        self.stalls_by_activity: Counter = Counter()
+        self.slow_callbacks = 0
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._activities: Dict[asyncio.Task, str] = {}
+        self._beat = time.monotonic()
+        self._sampler: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._export: Optional[asyncio.Future] = None
+        self._export_lock = threading.Lock()
+        self._exported_at = ""
+
+    @contextlib.contextmanager
+    def track(self, label: str):
+        """Отметка активности текущей задачи (хендлер, задача планировщика)"""
+        task = asyncio.current_task()
+        if task is None:
+            yield
+            return
+
+        previous = self._activities.get(task)
+        self._activities[task] = label
+        try:
+            yield
+        finally:
+            if previous is None:
+                self._activities.pop(task, None)
+            else:
+                self._activities[task] = previous
+
+    def current_activity(self) -> str:
+        """Активность задачи, которая сейчас выполняется в цикле"""
+        if self.loop is None:
+            return "idle"
+        # current_task(loop) только читает словарь, его можно вызывать из сторожа
+        task = asyncio.current_task(self.loop)
+        if task is None:
+            return "callback"
+        return self._activities.get(task) or f"task:{task.get_name()}"
+
+    def start(self):
+        """Запуск сэмплера и сторожа в текущем цикле событий"""
+        if self._sampler is not None and not self._sampler.done():
+            return
+
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+
+        if self.slow_callback > 0:
+            # Отладочный режим asyncio сообщает о колбэках дольше порога
+            self.loop.set_debug(True)
+            self.loop.slow_callback_duration = self.slow_callback
+            logging.getLogger("asyncio").addFilter(self._count_slow_callback)
+
+        self._sampler = self.loop.create_task(self._sample(), name="loop-monitor")
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.cancel()
+        self.export()
+
+    def _count_slow_callback(self, record: logging.LogRecord) -> bool:
+        if record.getMessage().startswith("Executing "):
+            self.slow_callbacks += 1
+        return True
+
+    async def _sample(self):
+        next_export = time.monotonic() + self.export_interval
+        while True:
+            expected = self.loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, self.loop.time() - expected)
+            self.histogram.observe(lag)
+            self._beat = time.monotonic()
+
+            if self.stalls and self.stalls[-1].duration == 0.0:
+                self.stalls[-1].duration = lag
+
+            if self.export_path and self._beat >= next_export:
+                next_export = self._beat + self.export_interval
+                # Снимок берется в цикле, а запись файла идет в потоке и не
+                # ждется: замер задержки не должен сам блокировать цикл
+                if self._export is None or self._export.done():
+                    self._export = self.loop.run_in_executor(None, self._write, self.snapshot())
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            stalled = time.monotonic() - beat
+            if stalled < self.stall_threshold or beat == reported_beat:
+                continue
+
+            # Одно зависание фиксируется один раз
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stall = Stall(
+                started_at=datetime.utcnow(),
+                activity=self.current_activity(),
+                stack=traceback.format_stack(frame) if frame else []
+            )
+            self.stalls.append(stall)
+            self.stalls_by_activity[stall.activity] += 1
+            logger.warning(
+                f"Event loop blocked for {stalled * 1000:.0f}+ ms in {stall.activity}:\n"
+                + "".join(stall.stack[-8:])
+            )
+
+    def snapshot(self) -> Dict:
+        return {
+            "updated_at": datetime.utcnow().isoformat(),
+            "lag": self.histogram.snapshot(),
+            "slow_callbacks": self.slow_callbacks,
+            "stalls_by_activity": dict(self.stalls_by_activity),
+            "recent_stalls": [
+                {
+                    "started_at": s.started_at.isoformat(),
+                    "activity": s.activity,
+                    "duration_ms": round(s.duration * 1000, 1),
+                    "stack": s.stack[-8:],
+                }
+                for s in self.stalls
+            ],
+        }
+
+    def export(self):
+        """Выгрузка гистограммы и зависаний в JSON-файл (синхронно, при остановке)"""
+        if self.export_path:
+            self._write(self.snapshot())
+
+    def _write(self, stats: Dict):
+        # Фоновая запись, закончившаяся позже итоговой, не затирает ее старым снимком
+        with self._export_lock:
+            if stats["updated_at"] < self._exported_at:
+                return
+            try:
+                with open(self.export_path, "w", encoding="utf-8") as f:
+                    json.dump(stats, f, ensure_ascii=False, indent=2)
+            except OSError as e:
+                logger.warning(f"Error exporting loop stats: {e}")
+                return
+            self._exported_at = stats["updated_at"]
+
+    def report(self) -> str:
+        """Краткий текстовый отчет для админов"""
+        lag = self.histogram.snapshot()
+        text = (
+            "⏱ ЗАДЕРЖКА ЦИКЛА СОБЫТИЙ\n\n"
+            f"Замеров: {lag['count']}\n"
+            f"Средняя: {lag['mean_ms']} мс\n"
+            f"p50: {lag['p50_ms']} мс, p99: {lag['p99_ms']} мс\n"
+            f"Максимум: {lag['max_ms']} мс\n"
+            f"Медленных колбэков: {self.slow_callbacks}\n"
+        )
+
+        if self.stalls_by_activity:
+            text += "\n🐢 Зависания по источникам:\n"
+            for activity, count in self.stalls_by_activity.most_common(5):
+                text += f"• {activity}: {count}\n"
+
+        return text
+
+
+def _create_monitor() -> LoopMonitor:
+    from config import config
+    return LoopMonitor(
+        stall_threshold=config.LOOP_STALL_THRESHOLD,
+        slow_callback=config.SLOW_CALLBACK_DURATION,
+        export_path=config.LOOP_STATS_FILE
+    )
+
+
+# Общий монитор цикла событий бота
+loop_monitor = _create_monitor()
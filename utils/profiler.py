@@ -0,0 +1,133 @@
+import asyncio
+import os
+import sys
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Корень проекта: функции из этих файлов считаются "своими" в сводке
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Потоки диагностики в профиль не попадают
+SKIP_THREADS = ("profiler", "loop-watchdog")
+
+
+@dataclass
+class ProfileResult:
+    """Результат профилирования"""
+    duration: float
+    samples: int = 0         # Проходов профайлера
+    thread_samples: int = 0  # Снятых стеков (по одному на поток за проход)
+    stacks: Counter = field(default_factory=Counter)
+    project: Counter = field(default_factory=Counter)
+
+    def collapsed(self) -> str:
+        """Стеки в свернутом формате (flamegraph.pl, speedscope)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, limit: int = 10) -> str:
+        """Самые частые функции проекта на вершине стека"""
+        text = (
+            "🔬 ПРОФИЛИРОВАНИЕ\n\n"
+            f"Длительность: {self.duration:.0f} с\n"
+            f"Сэмплов: {self.samples} (стеков потоков: {self.thread_samples})\n"
+        )
+
+        if self.project:
+            # Доля от всех снятых стеков: за проход их столько, сколько потоков
+            text += "\n🔥 Функции проекта:\n"
+            for name, count in self.project.most_common(limit):
+                text += f"• {name} - {count / self.thread_samples * 100:.1f}%\n"
+        else:
+            text += "\nКод проекта в сэмплах не встретился\n"
+
+        return text
+
+
+class SamplingProfiler:
+    """Статистический профайлер работающего бота
+
+    Отдельный поток с заданным интервалом снимает стеки всех потоков
+    через sys._current_frames() и считает одинаковые стеки. Код бота
+    не инструментируется, поэтому накладные расходы малы и профилировать
+    можно прямо в продакшене.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float) -> Optional[ProfileResult]:
+        """Профилирование в течение seconds секунд (None, если уже идет другое)"""
+        if not self._lock.acquire(blocking=False):
+            return None
+
+        try:
+            result = ProfileResult(duration=seconds)
+            stop = threading.Event()
+            thread = threading.Thread(
+                target=self._sample, args=(result, stop), name="profiler", daemon=True
+            )
+            thread.start()
+            await asyncio.sleep(seconds)
+            stop.set()
+            await asyncio.to_thread(thread.join)
+            return result
+        finally:
+            self._lock.release()
+
+    def _sample(self, result: ProfileResult, stop: threading.Event):
+        labels: Dict[object, str] = {}
+
+        while not stop.wait(self.interval):
+            threads = {t.ident: t.name for t in threading.enumerate()}
+
+            for thread_id, frame in sys._current_frames().items():
+                name = threads.get(thread_id, f"thread-{thread_id}")
+                if name.startswith(SKIP_THREADS):
+                    continue
+
+                stack: List[str] = []
+                own: Optional[str] = None
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = self._label(code)
+                    stack.append(label)
+                    if own is None and self._is_project(code.co_filename):
+                        own = label
+                    frame = frame.f_back
+
+                # Потоки одного пула (jobs_0, jobs_1) сливаются в один корень
+                stack.append(name.split("_")[0])
+                stack.reverse()
+                result.stacks[";".join(stack)] += 1
+                result.thread_samples += 1
+                if own is not None:
+                    result.project[own] += 1
+
+            result.samples += 1
+
+    @staticmethod
+    def _is_project(filename: str) -> bool:
+        # Виртуальное окружение может лежать внутри проекта
+        return filename.startswith(PROJECT_ROOT) and "site-packages" not in filename
+
+    @staticmethod
+    def _label(code) -> str:
+        filename = code.co_filename
+        if SamplingProfiler._is_project(filename):
+            module = os.path.relpath(filename, PROJECT_ROOT)[:-3].replace(os.sep, ".")
+        else:
+            module = os.path.splitext(os.path.basename(filename))[0]
+        return f"{module}:{code.co_name}"
+
+
+# Общий профайлер (одновременно идет не больше одного профилирования)
+profiler = SamplingProfiler()
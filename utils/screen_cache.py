@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+from aiogram.types import InlineKeyboardMarkup, Message
+
+Screen = Tuple[str, Optional[InlineKeyboardMarkup]]
+
+
+def screen_hash(text: str, markup: Optional[InlineKeyboardMarkup]) -> str:
+    """Хэш содержимого экрана"""
+    digest = hashlib.sha1(text.encode("utf-8"))
+    if markup is not None:
+        digest.update(markup.model_dump_json(exclude_none=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def edit_screen(message: Message, text: str, markup: Optional[InlineKeyboardMarkup] = None, **kwargs) -> bool:
+    """Редактирование сообщения, только если содержимое изменилось
+
+    Telegram отвечает ошибкой "message is not modified" на редактирование
+    без изменений, поэтому такой запрос не отправляется вовсе.
+    Возвращает True, если сообщение было отредактировано.
+    """
+    current = screen_hash(message.text or "", message.reply_markup)
+    if current == screen_hash(text, markup):
+        return False
+
+    await message.edit_text(text, reply_markup=markup, **kwargs)
+    return True
+
+
+class ScreenCache:
+    """LRU-кэш отрисованных экранов (текст + клавиатура)
+
+    Ключ экрана дополняется версией кэша, поэтому после изменения
+    конфигов достаточно вызвать invalidate(), и все экраны будут
+    построены заново.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._screens: "OrderedDict[Hashable, Screen]" = OrderedDict()
+        # Экраны могут строиться и в потоках (см. asyncio.to_thread)
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Screen]) -> Screen:
+        """Получение экрана из кэша или его отрисовка"""
+        full_key = (self.version, key)
+
+        with self._lock:
+            screen = self._screens.get(full_key)
+            if screen is not None:
+                self._screens.move_to_end(full_key)
+                self.hits += 1
+                return screen
+            self.misses += 1
+
+        screen = render()
+
+        with self._lock:
+            self._screens[full_key] = screen
+            if len(self._screens) > self.maxsize:
+                self._screens.popitem(last=False)
+
+        return screen
+
+    def invalidate(self):
+        """Сброс всех экранов (например, после изменения конфигов)"""
+        with self._lock:
+            self.version += 1
+            self._screens.clear()
+
+    def __len__(self) -> int:
+        return len(self._screens)
+
+
+# Экраны, зависящие только от конфигов
+static_screens = ScreenCache(maxsize=256)
+
+# Экраны конкретных игроков (портфель и т.п.), вытесняются по LRU
+user_screens = ScreenCache(maxsize=2048)
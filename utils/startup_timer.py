@@ -0,0 +1,49 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Замер фаз запуска бота
+
+    Каждая фаза оборачивается в phase(), после запуска report() пишет
+    в лог длительность фаз и предупреждает, если запуск не уложился
+    в бюджет.
+    """
+
+    def __init__(self, budget: float, started: Optional[float] = None):
+        self.budget = budget
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def record(self, name: str, duration: float):
+        """Фаза, замеренная снаружи (например, импорты до создания таймера)"""
+        self.phases.append((name, duration))
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self) -> str:
+        total = self.total
+        lines = [f"Startup finished in {total:.2f}s (budget {self.budget:.2f}s):"]
+        for name, duration in self.phases:
+            lines.append(f"  {name:<24} {duration * 1000:8.0f} ms")
+
+        text = "\n".join(lines)
+        if total > self.budget:
+            logger.warning(text)
+        else:
+            logger.info(text)
+        return text
@@ -0,0 +1,80 @@
+import string
+from typing import AbstractSet, Any, Iterable, List, Mapping, Optional
+
+_formatter = string.Formatter()
+
+
+class Template:
+    """Шаблон сообщения, разобранный и проверенный один раз
+
+    При создании шаблон разбирается, и проверяется, что он использует
+    только разрешенные поля и содержит все обязательные. С sample шаблон
+    еще и пробно форматируется этими значениями, что ловит неверные
+    спецификаторы формата ("{amount:,.2q}"). Ошибка шаблона поднимается
+    как ValueError сразу, а не при первой отправке.
+    render() вызывает заранее связанный format_map и не разбирает
+    строку заново; шаблон без полей возвращается как есть.
+    """
+
+    __slots__ = ("text", "fields", "_render")
+
+    def __init__(self, text: str, allowed: Optional[AbstractSet[str]] = None,
+                 required: Iterable[str] = (), sample: Optional[Mapping[str, Any]] = None):
+        literals: List[str] = []
+        used = set()
+        for literal, field_name, _, _ in _formatter.parse(text):
+            literals.append(literal)
+            if field_name is not None:
+                if not field_name or field_name.isdigit():
+                    raise ValueError("позиционные поля не поддерживаются, нужны имена")
+                used.add(field_name.split(".")[0].split("[")[0])
+
+        if allowed is not None and used - allowed:
+            raise ValueError(f"неизвестные поля {sorted(used - allowed)}")
+        missing = set(required) - used
+        if missing:
+            raise ValueError(f"нет обязательных полей {sorted(missing)}")
+
+        if sample is not None:
+            try:
+                text.format_map(sample)
+            except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+                raise ValueError(f"шаблон не форматируется: {e!r}") from e
+
+        self.text = text
+        self.fields = frozenset(used)
+        # Без полей результат постоянный: "{{" и "}}" раскрываются один раз
+        self._render = text.format_map if used else "".join(literals)
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        """Подстановка значений (лишние ключи игнорируются)"""
+        render = self._render
+        if isinstance(render, str):
+            return render
+        return render(values)
+
+    def __repr__(self) -> str:
+        return f"Template({self.text!r})"
+
+
+def pack(messages: Iterable[str], limit: int, separator: str = "\n\n") -> List[str]:
+    """Склейка сообщений в как можно меньшее число текстов не длиннее limit
+
+    Порядок сохраняется; сообщение длиннее limit обрезается.
+    """
+    posts: List[str] = []
+    current: List[str] = []
+    size = 0
+    for message in messages:
+        if len(message) > limit:
+            message = message[:limit - 1] + "…"
+        extra = len(message) + (len(separator) if current else 0)
+        if current and size + extra > limit:
+            posts.append(separator.join(current))
+            current, size = [], 0
+            extra = len(message)
+        current.append(message)
+        size += extra
+    if current:
+        posts.append(separator.join(current))
+    return posts
@@ -0,0 +1,40 @@
+import heapq
+import itertools
+from typing import Generic, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class TopK(Generic[T]):
+    """k элементов потока с наибольшей оценкой
+
+    Хранится не больше k записей в куче по возрастанию оценки, поэтому
+    память постоянна, а добавление стоит O(log k) при любом объеме
+    потока. При равной оценке остается запись, пришедшая раньше.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.count = 0
+        self._heap: List[Tuple[float, int, T]] = []
+        self._seq = itertools.count()
+
+    def push(self, score: float, item: T):
+        self.count += 1
+        # -seq: среди равных оценок первой вытесняется более поздняя запись
+        entry = (score, -next(self._seq), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> List[Tuple[float, T]]:
+        """Записи по убыванию оценки"""
+        return [(score, item) for score, _, item in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+    def clear(self):
+        self.count = 0
+        self._heap = []
+
+    def __len__(self) -> int:
+        return len(self._heap)